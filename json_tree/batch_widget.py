@@ -8,6 +8,7 @@ class BatchModifyWidget(QtWidgets.QWidget):
         super(BatchModifyWidget, self).__init__(*args, **kwargs)
 
         self._search_replace_widgets = []
+        self._transform_widgets = []
 
         self.main_layout = QtWidgets.QVBoxLayout()
         self.main_layout.setContentsMargins(0, 0, 0, 0)
@@ -22,15 +23,23 @@ class BatchModifyWidget(QtWidgets.QWidget):
         self.add_search_replace_button = QtWidgets.QPushButton("+")
         self.add_search_replace_button.clicked.connect(self.add_search_replace_line)
 
+        self.add_transform_button = QtWidgets.QPushButton("+ Transform")
+        self.add_transform_button.setToolTip("Scale numbers, remove keys or convert strings in a single pass")
+        self.add_transform_button.clicked.connect(self.add_transform_line)
+
         self.search_replace_layout = QtWidgets.QVBoxLayout()
         self.search_replace_layout.setContentsMargins(0, 0, 0, 0)
+        self.transform_layout = QtWidgets.QVBoxLayout()
+        self.transform_layout.setContentsMargins(0, 0, 0, 0)
 
         default_items_layout = QtWidgets.QHBoxLayout()
         default_items_layout.setContentsMargins(0, 0, 0, 0)
         default_items_layout.addWidget(self.prefix_line_edit)
         default_items_layout.addWidget(self.suffix_line_edit)
         default_items_layout.addWidget(self.add_search_replace_button)
+        default_items_layout.addWidget(self.add_transform_button)
 
+        self.main_layout.addLayout(self.transform_layout)
         self.main_layout.addLayout(self.search_replace_layout)
         self.main_layout.addLayout(default_items_layout)
 
@@ -56,6 +65,39 @@ class BatchModifyWidget(QtWidgets.QWidget):
             )
         return "{}{}{}".format(self.prefix_line_edit.text(), output_string, self.suffix_line_edit.text())
 
+    def get_modify_text_operation(self, keys=True, values=True):
+        """Prefix, suffix and search/replace lines as a transform operation, same result as modify_string"""
+        from . import data_tree_transforms
+        return data_tree_transforms.ModifyText(
+            prefix=self.prefix_line_edit.text(),
+            suffix=self.suffix_line_edit.text(),
+            replacements=[(w.search_line.text(), w.replace_line.text()) for w in self._search_replace_widgets],
+            keys=keys,
+            values=values,
+        )
+
+    def add_transform_line(self):
+        widget = TransformWidget()
+        widget.remove_button.clicked.connect(partial(self.remove_transform_widget, widget))
+        self.transform_layout.addWidget(widget)
+        self._transform_widgets.append(widget)
+
+    def remove_transform_widget(self, widget):
+        self.transform_layout.removeWidget(widget)
+        self._transform_widgets.remove(widget)
+        widget.deleteLater()
+
+    def get_transform_operations(self):
+        """
+        :return: list of data_tree_transforms.Operation, for the transform lines that are filled in
+        """
+        operations = []
+        for transform_widget in self._transform_widgets:  # type: TransformWidget
+            operation = transform_widget.get_operation()
+            if operation is not None:
+                operations.append(operation)
+        return operations
+
 
 class SearchReplaceWidget(QtWidgets.QWidget):
     def __init__(self, *args, **kwargs):
@@ -72,3 +114,51 @@ class SearchReplaceWidget(QtWidgets.QWidget):
         self.remove_button = QtWidgets.QPushButton("-")
         main_layout.addWidget(self.remove_button)
         self.setLayout(main_layout)
+
+
+class TransformWidget(QtWidgets.QWidget):
+    operation_names = ("Scale Numbers", "Remove Keys", "Convert String Numbers")
+
+    def __init__(self, *args, **kwargs):
+        super(TransformWidget, self).__init__(*args, **kwargs)
+        main_layout = QtWidgets.QHBoxLayout()
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        self.operation_chooser = QtWidgets.QComboBox()
+        self.operation_chooser.addItems(self.operation_names)
+        self.key_pattern_line = QtWidgets.QLineEdit()
+        self.key_pattern_line.setPlaceholderText("Key Pattern, like scale* (all keys if empty)")
+        self.factor_spin_box = QtWidgets.QDoubleSpinBox()
+        self.factor_spin_box.setDecimals(6)
+        self.factor_spin_box.setRange(-1e9, 1e9)
+        self.factor_spin_box.setValue(1.0)
+        self.factor_spin_box.setPrefix("x ")
+        main_layout.addWidget(self.operation_chooser)
+        main_layout.addWidget(self.key_pattern_line)
+        main_layout.addWidget(self.factor_spin_box)
+
+        self.remove_button = QtWidgets.QPushButton("-")
+        main_layout.addWidget(self.remove_button)
+        self.setLayout(main_layout)
+
+        self.operation_chooser.currentIndexChanged.connect(self.update_operation_widgets)
+
+    def update_operation_widgets(self):
+        self.factor_spin_box.setVisible(self.operation_chooser.currentText() == "Scale Numbers")
+
+    def get_operation(self):
+        """
+        :return: data_tree_transforms.Operation, or None if the line isn't filled in
+        """
+        from . import data_tree_transforms
+        operation_name = self.operation_chooser.currentText()
+        key_pattern = self.key_pattern_line.text() or None
+
+        if operation_name == "Scale Numbers":
+            return data_tree_transforms.ScaleNumbers(self.factor_spin_box.value(), key_pattern=key_pattern)
+        if operation_name == "Remove Keys":
+            if key_pattern is None:
+                return None  # would remove everything
+            return data_tree_transforms.RemoveKeys(key_pattern)
+        if operation_name == "Convert String Numbers":
+            return data_tree_transforms.ConvertStringNumbers(key_pattern=key_pattern)
+        return None
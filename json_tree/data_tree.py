@@ -1,10 +1,12 @@
-import json
+import marshal
+import sys
 from collections import OrderedDict
 from functools import partial, wraps
 
 from . import data_tree_model
+from . import json_backends
 from . import ui_utils
-from .ui_utils import QtCore, QtWidgets
+from .ui_utils import QtCore, QtGui, QtWidgets
 
 
 class LocalConstants:
@@ -29,6 +31,12 @@ class LocalConstants:
     supports_children_type_names = list_type_names + dict_type_names
     none_type_name = str(type(None).__name__)
 
+    background_insert_item_count = 20000  # pasted data with more items than this is turned into items on a thread
+
+    # copied items for other json tree windows, see ItemMimeData
+    clipboard_mime_type = data_tree_model.lk.items_mime_type
+    clipboard_format_version = 2
+
 
 lk = LocalConstants
 
@@ -38,19 +46,42 @@ class DataTreeWidget(QtWidgets.QWidget):
         super(DataTreeWidget, self).__init__(*args, **kwargs)
 
         self.default_expand_depth = 2
+        self.key_width_sample_size = 500  # rows measured when estimating the key column width
+        self.expand_row_budget = 2000  # auto expand stops before more rows than this would be visible
+        self.expand_chunk_size = 50  # items expanded per event loop iteration
         self._root_type = None
 
-        self.tree_view = QtWidgets.QTreeView()
+        self._expand_iter = None
+        self._background_inserts = {}  # insert id: task signals, kept alive until the items are added
+        self._background_insert_count = 0
+        self._validations = {}  # validation id: task signals, see validate_tree
+        self._validation_count = 0
+        self._expand_timer = QtCore.QTimer(self)
+        self._expand_timer.setInterval(0)
+        self._expand_timer.timeout.connect(self._expand_next_chunk)
+        self._filter_text = ""
+
+        self.tree_view = DataTreeView()
         self.tree_view.setAlternatingRowColors(True)
+        self.tree_view.setUniformRowHeights(True)
+        self.tree_view.setItemDelegate(DataItemDelegate(self.tree_view))
         self.tree_view.setSelectionMode(QtWidgets.QTreeView.ExtendedSelection)
         self.tree_view.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.tree_view.customContextMenuRequested.connect(self.build_tree_context_menu)
+        self.tree_view.doubleClicked.connect(self.on_tree_double_clicked)
 
         self.tree_model = data_tree_model.DataModel(self.tree_view)
 
         self.filter_model = data_tree_model.DataSortFilterProxyModel(self.tree_view, self.tree_model)
         self.tree_view.setModel(self.filter_model)
 
+        # unsorted (file order) by default, clicking a column header sorts ascending, descending, then unsorted again
+        self._sort_state = (-1, QtCore.Qt.AscendingOrder)
+        tree_header = self.tree_view.header()
+        tree_header.setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.tree_view.setSortingEnabled(True)
+        tree_header.sortIndicatorChanged.connect(self.on_sort_indicator_changed)
+
         self.main_layout = QtWidgets.QVBoxLayout()
         self.main_layout.setContentsMargins(0, 0, 0, 0)
         self.main_layout.addWidget(self.tree_view)
@@ -58,28 +89,264 @@ class DataTreeWidget(QtWidgets.QWidget):
 
     ########################################################
     # Base Functions
-    def set_tree_data(self, data):
-        self.tree_model.set_data(data)
+    def set_tree_data(self, data, chunked=True):
+        """
+        :param data:
+        :param chunked: show the first top level items straight away and add the rest from the event loop
+        """
+        self.stop_expand()
+        self.tree_model.set_data(data, chunked=chunked)
+        self.set_tree_view_settings()
+        self.tree_model.call_when_populated(partial(self.validate_tree, data))
+
+    def update_tree_data(self, data):
+        """Change the tree to match data, keeping expanded and selected items where they're unchanged"""
+        if not self.tree_model.update_data(data):
+            self.set_tree_data(data)
+            return
+        self.validate_tree(data)
+
+    def set_tree_root_item(self, root_item):
+        self.stop_expand()
+        self.tree_model.set_root_item(root_item)
+        self.set_tree_view_settings()
+        self.validate_tree()
+
+    def set_tree_ndjson(self, ndjson_file):
+        self.stop_expand()
+        self.tree_model.set_ndjson_file(ndjson_file)
         self.set_tree_view_settings()
 
     def get_tree_data(self):
         return self.tree_model.get_data()
 
+    def set_schema(self, schema):
+        """
+        :param schema: json_schema.JsonSchema, or None to stop validating
+        """
+        self.tree_model.set_schema(schema)
+        self.validate_tree()
+
+    def validate_tree(self, data=None, on_validated=None):
+        """
+        Validate the whole tree against the schema on a worker thread, items with errors are flagged when it's done
+
+        :param data: data of the tree, if it's already available
+        :param on_validated: called with the list of (key_path, keyword, message) errors, or None if validation failed
+        """
+        schema = self.tree_model.schema
+        if schema is None or self.tree_model.ndjson_file is not None:
+            if on_validated is not None:
+                on_validated([])
+            return
+
+        if data is None:
+            data = self.tree_model.get_snapshot()  # isn't changed by edits while the validation runs
+
+        self._validation_count += 1
+        validation_id = self._validation_count
+        self._validations[validation_id] = ui_utils.run_in_background(
+            schema.validate,
+            partial(self.on_tree_validated, validation_id, schema, on_validated),
+            on_failed=partial(self.on_tree_validation_failed, validation_id, on_validated),
+            args=(data,),
+        )
+
+    def on_tree_validated(self, validation_id, schema, on_validated, errors):
+        self._validations.pop(validation_id, None)
+
+        # errors of an older validation would replace those of the tree as it is now
+        if validation_id == self._validation_count and schema is self.tree_model.schema:
+            self.tree_model.set_schema_errors(errors)
+
+        if on_validated is not None:
+            on_validated(errors)
+
+    def on_tree_validation_failed(self, validation_id, on_validated, error):
+        self._validations.pop(validation_id, None)
+        print("Schema validation failed: {}".format(error))
+        if on_validated is not None:
+            on_validated(None)
+
     ###########################################################
 
     def set_filter(self, filter_text):
+        """Show items that match filter_text, clearing the filter expands the tree to the default depth again"""
+        if filter_text == self._filter_text:
+            return  # the same filter when switching tabs, the expanded items stay as they are
+        self._filter_text = filter_text
+
+        self.stop_expand()
         self.filter_model.setFilterRegExp(
             QtCore.QRegExp(filter_text, QtCore.Qt.CaseInsensitive, QtCore.QRegExp.FixedString)
         )
         if filter_text == "":
-            self.tree_view.expandToDepth(self.default_expand_depth)
+            self.expand_to_depth(self.default_expand_depth)
 
     def set_tree_view_settings(self):
         tree_header = self.tree_view.header()
         tree_header.setStretchLastSection(False)
         tree_header.setSectionResizeMode(1, QtWidgets.QHeaderView.ResizeMode.Stretch)
-        self.tree_view.expandToDepth(self.default_expand_depth)
-        self.tree_view.resizeColumnToContents(lk.row_key)
+        self.expand_to_depth(self.default_expand_depth)
+        self.tree_view.setColumnWidth(lk.row_key, self.estimate_key_column_width())
+
+    def set_stats_visible(self, visible):
+        """Item count, json size and depth columns, computed for the whole tree when they're first shown"""
+        if visible:
+            QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+            try:
+                data_tree_model.get_item_stats(self.tree_model.root_item)
+            finally:
+                QtWidgets.QApplication.restoreOverrideCursor()
+        self.tree_model.set_show_stats(visible)
+
+    def on_sort_indicator_changed(self, column, order):
+        previous_column, previous_order = self._sort_state
+        self._sort_state = (column, order)
+        if column != -1 and column == previous_column and previous_order == QtCore.Qt.DescendingOrder:
+            self.clear_sort()
+
+    def clear_sort(self):
+        """Show items in their order in the file"""
+        self.tree_view.header().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.filter_model.sort(-1)
+
+    def expand_to_depth(self, depth):
+        """
+        Bounded replacement for QTreeView.expandToDepth
+
+        Shallower levels are expanded first and, within a level, smaller containers before larger ones.
+        Expansion stops at a level once expand_row_budget would be exceeded,
+        and runs in chunks from the event loop so the view paints straight away.
+        """
+        self.stop_expand()
+        self._expand_iter = self._iter_indices_to_expand(depth)
+        self._expand_next_chunk()
+        if self._expand_iter is not None:
+            self._expand_timer.start()
+
+    def stop_expand(self):
+        self._expand_timer.stop()
+        self._expand_iter = None
+
+    def _iter_indices_to_expand(self, depth):
+        visible_rows = self.filter_model.rowCount()
+        if visible_rows >= self.expand_row_budget:
+            return
+        level_indices = [self.filter_model.index(i, lk.row_key) for i in range(visible_rows)]
+
+        for _ in range(depth + 1):
+            candidates = []
+            for index in level_indices:
+                child_count = self.filter_model.rowCount(index)
+                if child_count:
+                    candidates.append((child_count, index))
+            candidates.sort(key=lambda candidate: candidate[0])
+
+            level_indices = []
+            for child_count, index in candidates:
+                if visible_rows + child_count > self.expand_row_budget:
+                    break  # candidates are sorted, the rest of this level won't fit either
+                visible_rows += child_count
+
+                persistent_index = QtCore.QPersistentModelIndex(index)
+                yield persistent_index
+
+                if not persistent_index.isValid():
+                    continue  # model changed while yielding
+                index = self.filter_model.index(persistent_index.row(), lk.row_key, persistent_index.parent())
+                level_indices.extend([self.filter_model.index(i, lk.row_key, index) for i in range(child_count)])
+
+    def _expand_next_chunk(self):
+        if self._expand_iter is None:
+            self._expand_timer.stop()
+            return
+
+        for _ in range(self.expand_chunk_size):
+            try:
+                persistent_index = next(self._expand_iter)
+            except StopIteration:
+                self.stop_expand()
+                return
+
+            if persistent_index.isValid():
+                index = self.filter_model.index(persistent_index.row(), lk.row_key, persistent_index.parent())
+                self.tree_view.setExpanded(index, True)
+
+    def estimate_key_column_width(self):
+        """
+        Key column width from a sample of the rows near the top of the tree.
+
+        resizeColumnToContents measures every expanded row, which is too slow on large documents.
+        """
+        font_metrics = self.tree_view.fontMetrics()
+        indentation = self.tree_view.indentation()
+        padding = 30  # expand arrow and margins
+
+        max_width = 0
+        sampled = 0
+        indices = [(self.filter_model.index(i, lk.row_key), 1) for i in range(self.filter_model.rowCount())]
+        indices.reverse()
+        while indices and sampled < self.key_width_sample_size:
+            index, depth = indices.pop()
+            sampled += 1
+
+            key_text = index.data(QtCore.Qt.DisplayRole) or ""
+            max_width = max(max_width, font_metrics.width(key_text) + indentation * depth)
+
+            if depth <= self.default_expand_depth:
+                child_count = min(self.filter_model.rowCount(index), self.key_width_sample_size - sampled)
+                indices.extend([
+                    (self.filter_model.index(i, lk.row_key, index), depth + 1) for i in reversed(range(child_count))
+                ])
+
+        return max_width + padding
+
+    def expand_to_items(self, items):
+        """Expand parents of items so they're visible in the view"""
+        for item in items:  # type: data_tree_model.DataModelItem
+            parent_item = item.parent
+            while parent_item is not None:
+                index = self.filter_model.mapFromSource(self.tree_model.get_index_from_item(parent_item))
+                if not index.isValid() or self.tree_view.isExpanded(index):
+                    break
+                self.tree_view.setExpanded(index, True)
+                parent_item = parent_item.parent
+
+    def select_items(self, items):
+        """Select items, expanding their parents and scrolling to the first one"""
+        self.expand_to_items(items)
+
+        selection = QtCore.QItemSelection()
+        first_index = None
+        for item in items:
+            index = self.filter_model.mapFromSource(self.tree_model.get_index_from_item(item))
+            if not index.isValid():
+                continue  # hidden by the filter
+            selection.select(index, index)
+            if first_index is None:
+                first_index = index
+
+        selection_model = self.tree_view.selectionModel()
+        selection_model.select(
+            selection,
+            QtCore.QItemSelectionModel.ClearAndSelect | QtCore.QItemSelectionModel.Rows,
+        )
+        if first_index is not None:
+            selection_model.setCurrentIndex(first_index, QtCore.QItemSelectionModel.NoUpdate)
+            self.tree_view.scrollTo(first_index)
+
+    def select_key_path(self, key_path):
+        """
+        Select the item at key_path, see DataModel.get_item_from_key_path
+
+        :return: False if there's no item at key_path
+        """
+        item = self.tree_model.get_item_from_key_path(key_path)
+        if item is None:
+            return False
+        self.select_items([item])
+        return True
 
     def build_tree_context_menu(self):
         action_list = list()
@@ -91,8 +358,11 @@ class DataTreeWidget(QtWidgets.QWidget):
             {"Duplicate": self.action_duplicate_selected_item},
             {"Delete": self.action_delete_selected_items},
             "-",
+            {"View Full Value": self.action_view_full_value},
+            "-",
             {"Move Up": self.action_move_selected_items_up},
             {"Move Down": self.action_move_selected_items_down},
+            {"Move To Index...": self.action_move_selected_items_to_index},
             "-",
         ])
 
@@ -143,6 +413,25 @@ class DataTreeWidget(QtWidgets.QWidget):
 
         return inner
 
+    def on_tree_double_clicked(self, filtered_index):
+        index = self.filter_model.mapToSource(filtered_index)
+        if index.column() == data_tree_model.lk.col_value and index.internalPointer().is_display_truncated():
+            self.action_view_full_value()
+
+    def action_view_full_value(self):
+        index = self.filter_model.mapToSource(self.tree_view.currentIndex())
+        if not index.isValid():
+            return
+
+        item = index.internalPointer()  # type: data_tree_model.DataModelItem
+        if item.raw_data_type in lk.supports_children_types:
+            return
+
+        dialog = ValueViewerDialog(item.get_value_text(), title=str(item.data_key), parent=self)
+        if dialog.exec_():
+            value_index = index.sibling(index.row(), data_tree_model.lk.col_value)
+            self.tree_model.setData(value_index, dialog.get_value_text(), QtCore.Qt.EditRole)  # emits dataChanged
+
     def add_item_of_type(self, add_type=str):
         data_to_add = lk.default_add_values.get(add_type, add_type())
         self.add_data_to_selected(data_to_add, merge=False)
@@ -152,18 +441,28 @@ class DataTreeWidget(QtWidgets.QWidget):
         self.action_delete_selected_items()
 
     def action_copy_selected_items(self):
-        selected_data = self.get_selected_data(as_raw_data=True)
-        json_string = json.dumps(selected_data, indent=2)
         cb = QtWidgets.QApplication.clipboard()
-        cb.setText(json_string)
+        try:
+            packed_items = data_tree_model.pack_items(self.get_selected_items())
+        except ValueError:
+            # records of a lazily loaded ndjson file that were never read
+            selected_data = self.get_selected_data(as_raw_data=True)
+            cb.setText(json_backends.dumps(selected_data, indent=2, keep_number_text=True))
+            return
+        cb.setMimeData(ItemMimeData(packed_items))
 
     def action_paste_selected_items(self):
         cb = QtWidgets.QApplication.clipboard()
+        packed_items = get_clipboard_packed_items(cb.mimeData())
+        if packed_items is not None:
+            self.add_packed_items_to_selected(packed_items)
+            return
+
         cb_text = cb.text()
 
         try:
-            clipboard_data = json.loads(cb_text, object_pairs_hook=OrderedDict)
-        except json.JSONDecodeError as e:
+            clipboard_data = json_backends.loads(cb_text, keep_number_text=True)
+        except ValueError:
             clipboard_data = None
 
         if not clipboard_data:
@@ -184,29 +483,21 @@ class DataTreeWidget(QtWidgets.QWidget):
             self.tree_view.setCurrentIndex(parent_index)
 
     def action_duplicate_selected_item(self, return_new_items=False, key_safety=True):
+        inserts = []
+        for item in self.get_selected_items():  # type: data_tree_model.DataModelItem
+            item_data = self.tree_model.get_item_data(item)
+            if item.parent.raw_data_type in lk.list_types:
+                inserts.append((item.parent, [item_data]))
+            else:
+                inserts.append((item.parent, OrderedDict([(item.data_key, item_data)])))
 
-        pre_indices = list(self.tree_model.get_all_indices(persistent=True)) if return_new_items else []
-
-        index_data_map = self.get_selected_data(as_raw_data=False)
-        index_parent_data = []
-        for index, data in index_data_map.items():
-            item_parent_index = self.filter_model.mapToSource(index.parent())
-            index_parent_data.append([item_parent_index, data])
-
-        self.tree_model.add_data_to_indices(
-            index_parent_data,
-            key_safety=key_safety,
-        )
+        new_items = self.insert_data(inserts, key_safety=key_safety, background=not return_new_items)
         if return_new_items:
-            new_items = []
-            for index in self.tree_model.get_all_indices():
-                if index not in pre_indices:
-                    new_items.append(index.internalPointer())
             return new_items
 
     def add_data_to_selected(self, data, merge=True):
-        for index in self.get_selected_indexes():
-            item = index.internalPointer()  # type: data_tree_model.DataModelItem
+        inserts = []
+        for item in self.get_selected_items():  # type: data_tree_model.DataModelItem
 
             if item.data_type not in lk.supports_children_type_names:
                 # print('Item "{}" of type "{}" does not support adding children'.format(item.data_key, item.data_type))
@@ -218,31 +509,116 @@ class DataTreeWidget(QtWidgets.QWidget):
                 if item.data_type in lk.list_type_names and isinstance(data, lk.dict_types):
                     data_to_apply = list(data.values())
 
-            self.tree_model.add_data_to_indices([[index, data_to_apply]], merge=merge)
+            inserts.append((item, data_to_apply))
+
+        self.insert_data(inserts, merge=merge)
+
+    def add_packed_items_to_selected(self, packed_items):
+        """Paste items copied with ItemMimeData, without going through json"""
+        parent_items = [
+            item for item in self.get_selected_items() if item.data_type in lk.supports_children_type_names
+        ]
+
+        def build_item_inserts():
+            return [(parent_item, data_tree_model.unpack_items(packed_items)) for parent_item in parent_items]
+
+        item_count = len(parent_items) * sum(len(packed_tree[0]) for _, packed_tree in packed_items)
+        self.insert_built_items(build_item_inserts, item_count)
+
+    def insert_data(self, inserts, merge=True, key_safety=True, background=True):
+        """
+        Add data to the end of the children of items, with one insert per parent item
+
+        :param inserts: list of (parent_item, data)
+        :param merge: add the keys or values of dicts and lists, instead of the data as a single item
+        :param key_safety: rename new items with keys that are already taken
+        :param background: create the items for large data on a worker thread, they're added once that's done
+        :return: new items, or None if they're being created in the background
+        """
+        def build_item_inserts():
+            return [(parent_item, self.tree_model.build_items(data, merge)) for parent_item, data in inserts]
+
+        item_count = sum(data_tree_model.recursive_get_data_length(data, merge) for _, data in inserts)
+        return self.insert_built_items(build_item_inserts, item_count, key_safety=key_safety, background=background)
+
+    def insert_built_items(self, build_item_inserts, item_count, key_safety=True, background=True):
+        """
+        :param build_item_inserts: function that returns a list of (parent_item, new items), it can't touch the model
+        :param item_count: number of items that will be built
+        :param key_safety: rename new items with keys that are already taken
+        :param background: build the items on a worker thread if there are a lot of them
+        :return: new items, or None if they're being created in the background
+        """
+        if not background or item_count < lk.background_insert_item_count:
+            return self.tree_model.insert_items(build_item_inserts(), key_safety=key_safety)
+
+        self._background_insert_count += 1
+        insert_id = self._background_insert_count
+        self._background_inserts[insert_id] = ui_utils.run_in_background(
+            build_item_inserts,
+            partial(self.on_background_insert_built, insert_id, key_safety),
+        )
+
+    def on_background_insert_built(self, insert_id, key_safety, item_inserts):
+        self._background_inserts.pop(insert_id, None)
+
+        # parents could have been deleted or a different file loaded while the items were created
+        item_inserts = [
+            (parent_item, items) for parent_item, items in item_inserts if self.tree_model.is_item_in_model(parent_item)
+        ]
+        self.tree_model.insert_items(item_inserts, key_safety=key_safety)
 
     def action_move_selected_items_up(self):
-        for index in self.get_selected_indexes():  # type: QtCore.QModelIndex
-            if index.row() == 0:
+        # move the item above each block of selected items to below it
+        for block_items in data_tree_model.iter_item_blocks(self.get_selected_items()):
+            first_item = block_items[0]
+            if first_item.row == 0:
                 continue
-            self.tree_model.moveRow(
-                index.parent(),
-                index.row(),
-                index.parent(),
-                index.row() - 1
-            )
+            parent_index = self.tree_model.get_index_from_item(first_item.parent)
+            self.tree_model.moveRow(parent_index, first_item.row - 1, parent_index, block_items[-1].row + 1)
 
     def action_move_selected_items_down(self):
-        for index in reversed(self.get_selected_indexes()):  # type: QtCore.QModelIndex
-            parent_max = index.internalPointer().parent.child_count()
-            if index.row() + 1 == parent_max:
+        # move the item below each block of selected items to above it
+        for block_items in data_tree_model.iter_item_blocks(self.get_selected_items()):
+            last_item = block_items[-1]
+            if last_item.row + 1 == last_item.parent.child_count():
                 continue
+            parent_index = self.tree_model.get_index_from_item(last_item.parent)
+            self.tree_model.moveRow(parent_index, last_item.row + 1, parent_index, block_items[0].row)
 
-            self.tree_model.moveRow(
-                index.parent(),
-                index.row() + 1,
-                index.parent(),
-                index.row()
-            )
+    def action_move_selected_items_to_index(self):
+        selected_items = self.get_selected_items()
+        if not selected_items:
+            return
+
+        first_item = selected_items[0]
+        index, accepted = QtWidgets.QInputDialog.getInt(
+            self,
+            "Move To Index",
+            "Index:",
+            first_item.row,
+            0,
+            first_item.parent.child_count() - 1,
+        )
+        if accepted:
+            self.move_items_to_index(selected_items, index)
+
+    def move_items_to_index(self, items, index):
+        """
+        Move items so the first of them ends up at index of its parent, items of other parents are moved in theirs
+
+        :param items: list of DataModelItem
+        :param index: row of the first moved item after the move
+        """
+        items_by_parent = OrderedDict()
+        for item in items:
+            items_by_parent.setdefault(item.parent, []).append(item)
+
+        for parent_item, parent_items in items_by_parent.items():
+            moved_items = set(parent_items)
+            remaining_items = [child for child in parent_item.children if child not in moved_items]
+            row = remaining_items[index].row if index < len(remaining_items) else parent_item.child_count()
+            self.tree_model.move_items(parent_items, parent_item, row)
 
     def get_selected_indexes(self, mapped_to_src=True, persistent=False):
         selected_indexes = self.tree_view.selectionModel().selectedRows(data_tree_model.lk.col_key)
@@ -289,3 +665,247 @@ class DataTreeWidget(QtWidgets.QWidget):
                     output_map[filtered_index] = output_obj
 
         return output_map
+
+
+class DataTreeView(QtWidgets.QTreeView):
+    """
+    Tree view that moves dragged items with DataModel.move_items.
+
+    Items dragged from other json tree windows are copied in. The view handles both itself, since the default
+    drop of QAbstractItemView inserts copies and removes the dragged rows afterwards.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(DataTreeView, self).__init__(*args, **kwargs)
+        self.setDragEnabled(True)
+        self.setAcceptDrops(True)
+        self.setDropIndicatorShown(True)
+        self.setDragDropMode(QtWidgets.QAbstractItemView.DragDrop)
+        self.setDefaultDropAction(QtCore.Qt.MoveAction)
+
+    def get_data_model(self):
+        return self.model().sourceModel()  # type: data_tree_model.DataModel
+
+    def get_selected_items(self):
+        indexes = self.selectionModel().selectedRows(data_tree_model.lk.col_key)
+        return [self.model().mapToSource(index).internalPointer() for index in indexes]
+
+    def startDrag(self, supported_actions):
+        selected_items = self.get_selected_items()
+        if not selected_items:
+            return
+        drag = QtGui.QDrag(self)
+        drag.setMimeData(ItemMimeData(source_items=selected_items))
+        drag.exec_(QtCore.Qt.MoveAction | QtCore.Qt.CopyAction, QtCore.Qt.MoveAction)
+
+    def get_drop_target(self, event):
+        """
+        :return: (parent_item, row) the dropped items go to, or None
+        """
+        tree_model = self.get_data_model()
+        index = self.indexAt(event.pos())
+        drop_position = self.dropIndicatorPosition()
+        if not index.isValid() or drop_position == QtWidgets.QAbstractItemView.OnViewport:
+            return tree_model.root_item, tree_model.root_item.child_count()
+
+        item = self.model().mapToSource(index).internalPointer()  # type: data_tree_model.DataModelItem
+        if drop_position == QtWidgets.QAbstractItemView.OnItem:
+            if item.raw_data_type not in data_tree_model.lk.supports_children_types:
+                return None
+            return item, item.child_count()
+        if drop_position == QtWidgets.QAbstractItemView.AboveItem:
+            return item.parent, item.row
+        return item.parent, item.row + 1
+
+    def dropEvent(self, event):
+        mime_data = event.mimeData()
+        if not mime_data.hasFormat(lk.clipboard_mime_type):
+            return super(DataTreeView, self).dropEvent(event)
+
+        drop_target = self.get_drop_target(event)
+        if drop_target is None:
+            event.ignore()
+            return
+        parent_item, row = drop_target
+        tree_model = self.get_data_model()
+
+        if event.source() is self and isinstance(mime_data, ItemMimeData) and mime_data.source_items is not None:
+            tree_model.move_items(mime_data.source_items, parent_item, row)
+        else:
+            packed_items = get_clipboard_packed_items(mime_data)
+            if packed_items is None:
+                event.ignore()
+                return
+            tree_model.insert_items([(parent_item, data_tree_model.unpack_items(packed_items))], row=row)
+
+        # rows were moved or copied here, a move action would make the source remove them afterwards
+        event.setDropAction(QtCore.Qt.CopyAction)
+        event.accept()
+        self.stopAutoScroll()
+        self.setState(QtWidgets.QAbstractItemView.NoState)
+        self.viewport().update()
+
+
+class ItemMimeData(QtCore.QMimeData):
+    """
+    Copied or dragged items, encoded only when a program asks for them.
+
+    Other json tree windows get the packed items, see data_tree_model.pack_items, everything else gets json text.
+    """
+
+    def __init__(self, packed_items=None, source_items=None):
+        """
+        :param packed_items: pack_items output, items are packed when they're copied so later edits don't change them
+        :param source_items: dragged items, they're only packed if they're dropped in another window
+        """
+        super(ItemMimeData, self).__init__()
+        self.packed_items = packed_items
+        self.source_items = source_items
+        self._packed_bytes = None
+        self._json_text = None
+
+    def formats(self):
+        return [lk.clipboard_mime_type, "text/plain"]
+
+    def hasFormat(self, mime_type):
+        return mime_type in self.formats()
+
+    def retrieveData(self, mime_type, preferred_type):
+        try:
+            if mime_type == lk.clipboard_mime_type:
+                return QtCore.QByteArray(self.get_packed_bytes())
+            if mime_type == "text/plain":
+                return self.get_json_text()
+        except ValueError:
+            return None  # dragged records of a lazily loaded ndjson file that were never read
+        return super(ItemMimeData, self).retrieveData(mime_type, preferred_type)
+
+    def get_packed_items(self):
+        if self.packed_items is None:
+            self.packed_items = data_tree_model.pack_items(self.source_items)
+        return self.packed_items
+
+    def get_packed_bytes(self):
+        if self._packed_bytes is None:
+            # marshal is only readable by the same python version, other versions paste the json text instead
+            self._packed_bytes = marshal.dumps(
+                (lk.clipboard_format_version, tuple(sys.version_info[:2]), self.get_packed_items())
+            )
+        return self._packed_bytes
+
+    def get_json_text(self):
+        if self._json_text is None:
+            # same layout as the text that was copied before there was a binary format
+            json_data = OrderedDict(
+                (key, data_tree_model.packed_tree_to_data(packed_tree)) for key, packed_tree in self.get_packed_items()
+            )
+            self._json_text = json_backends.dumps(json_data, indent=2, keep_number_text=True)
+        return self._json_text
+
+
+def get_clipboard_packed_items(mime_data):
+    """
+    :param mime_data: QMimeData from the clipboard or a drop
+    :return: pack_items output copied in a json tree window, or None
+    """
+    if mime_data is None or not mime_data.hasFormat(lk.clipboard_mime_type):
+        return None
+    if isinstance(mime_data, ItemMimeData):
+        try:
+            return mime_data.get_packed_items()  # copied in this process, no need to encode it
+        except ValueError:
+            return None
+
+    try:
+        format_version, python_version, packed_items = marshal.loads(bytes(mime_data.data(lk.clipboard_mime_type)))
+    except (ValueError, TypeError, EOFError):
+        return None
+    if format_version != lk.clipboard_format_version or tuple(python_version) != tuple(sys.version_info[:2]):
+        return None
+    return packed_items
+
+
+class ValueViewerDialog(QtWidgets.QDialog):
+    def __init__(self, value_text, title="", parent=None):
+        super(ValueViewerDialog, self).__init__(parent)
+        self.setWindowTitle("Value - {}".format(title))
+
+        self.text_edit = QtWidgets.QPlainTextEdit()
+        self.text_edit.setLineWrapMode(QtWidgets.QPlainTextEdit.WidgetWidth)
+        self.text_edit.setPlainText(value_text)
+
+        button_box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+
+        main_layout = QtWidgets.QVBoxLayout()
+        main_layout.addWidget(self.text_edit)
+        main_layout.addWidget(button_box)
+        self.setLayout(main_layout)
+        self.resize(800, 600)
+
+    def get_value_text(self):
+        return self.text_edit.toPlainText()
+
+
+class DataItemDelegate(QtWidgets.QStyledItemDelegate):
+    """
+    Paints key/value/type text directly, with font metrics cached once instead of per cell.
+
+    Editing is left to QStyledItemDelegate.
+    """
+
+    def __init__(self, parent=None):
+        super(DataItemDelegate, self).__init__(parent)
+        self.text_margin = 4
+        self._font_metrics = None
+        self._row_height = 0
+        if parent is not None:
+            self.set_font(parent.font())
+
+    def set_font(self, font):
+        self._font_metrics = QtGui.QFontMetrics(font)
+        self._row_height = self._font_metrics.height() + 4
+
+    def sizeHint(self, option, index):
+        if self._font_metrics is None:
+            self.set_font(option.font)
+        return QtCore.QSize(self._font_metrics.averageCharWidth() * 20, self._row_height)
+
+    def paint(self, painter, option, index):
+        if self._font_metrics is None:
+            self.set_font(option.font)
+
+        widget = option.widget
+        style = widget.style() if widget else QtWidgets.QApplication.style()
+
+        background = index.data(QtCore.Qt.BackgroundRole)
+        if background is not None:
+            painter.fillRect(option.rect, background)
+        style.drawPrimitive(QtWidgets.QStyle.PE_PanelItemViewItem, option, painter, widget)
+
+        text = index.data(QtCore.Qt.DisplayRole)
+        if not text:
+            return
+
+        text_rect = option.rect.adjusted(self.text_margin, 0, -self.text_margin, 0)
+        text = self._font_metrics.elidedText(text, QtCore.Qt.ElideRight, text_rect.width())
+
+        alignment = index.data(QtCore.Qt.TextAlignmentRole)
+        if alignment is None:
+            alignment = QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter
+
+        painter.setPen(self.get_text_color(option, index))
+        painter.drawText(text_rect, int(alignment), text)
+
+    def get_text_color(self, option, index):
+        """Color from the ForegroundRole of the model, like the red of items with schema errors, unless selected"""
+        if option.state & QtWidgets.QStyle.State_Selected:
+            return option.palette.color(QtGui.QPalette.HighlightedText)
+
+        foreground = index.data(QtCore.Qt.ForegroundRole)
+        if foreground is None:
+            return option.palette.color(QtGui.QPalette.Text)
+        if isinstance(foreground, QtGui.QBrush):
+            return foreground.color()
+        return foreground
@@ -0,0 +1,205 @@
+"""
+Structural diff between two DataModelItem trees.
+
+Every item gets a subtree hash, a sha1 digest computed once and cached on the item until it's edited,
+so identical subtrees are skipped with a single comparison instead of being walked.
+Dict children are matched by key, list children by position and then by subtree hash.
+"""
+import hashlib
+from collections import OrderedDict, deque
+
+DIFF_ADDED = "added"
+DIFF_REMOVED = "removed"
+DIFF_CHANGED = "changed"
+
+_dict_type_names = ("dict", "OrderedDict")
+_list_type_names = ("list", "tuple")
+
+_max_value_hash_size = 64  # longer values are hashed with sha1, which is 20 bytes
+_hash_sizes = [bytes(bytearray([size])) for size in range(_max_value_hash_size + 1)]
+
+
+class DiffResult(object):
+    def __init__(self):
+        self.added = []  # items only in the new tree
+        self.removed = []  # items only in the old tree
+        self.changed = []  # (old_item, new_item) pairs with differing values
+
+    def has_changes(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def summary(self):
+        return "{} added, {} removed, {} changed".format(len(self.added), len(self.removed), len(self.changed))
+
+
+def get_subtree_hash(item):
+    """
+    Get a sha1 digest of item value and all its children, cached on the item until DataModelItem.mark_dirty()
+
+    A digest instead of hash(), which gives the same value for -1 and -2 and would hide changes between them.
+    Values that aren't objects or arrays get their text as the hash if it's short, see get_value_hash.
+
+    :param item: DataModelItem
+    :return: bytes
+    """
+    if item._subtree_hash is not None:
+        return item._subtree_hash
+
+    data_type = item.data_type
+    if data_type in _dict_type_names or data_type in _list_type_names:
+        is_dict = data_type in _dict_type_names
+        hash_sizes = _hash_sizes
+        parts = [data_type.encode("utf-8")]
+        for child in item.children:
+            child_hash = child._subtree_hash
+            if child_hash is None:
+                if child.children or child.data_type in _dict_type_names or child.data_type in _list_type_names:
+                    child_hash = get_subtree_hash(child)
+                else:
+                    # inlined for leaf values, which make up most of a document
+                    child_hash = child._subtree_hash = get_value_hash(child.data_type, child.data_value)
+
+            if is_dict:
+                parts.append(get_value_text(child.data_key))
+            # hashes of values differ in length, with the length in front they can't run into each other
+            parts.append(hash_sizes[len(child_hash)])
+            parts.append(child_hash)
+        subtree_hash = hashlib.sha1(b"".join(parts)).digest()
+    else:
+        subtree_hash = get_value_hash(data_type, item.data_value)
+
+    item._subtree_hash = subtree_hash
+    return subtree_hash
+
+
+def get_value_hash(data_type, data_value):
+    """Type and text of a value, short values are used as they are instead of hashing them"""
+    value_hash = data_type.encode("utf-8") + b":" + get_value_text(data_value)
+    if len(value_hash) > _max_value_hash_size:
+        value_hash = hashlib.sha1(value_hash).digest()
+    return value_hash
+
+
+def get_value_text(data_value):
+    """
+    Text that is only the same for equal values, as bytes. repr() quotes strings, so it can't run into the next value.
+    Floats that keep their json text (1.10) are compared as the float they are, NaN is equal to NaN.
+    """
+    if isinstance(data_value, float):
+        data_value = float(data_value)
+    return repr(data_value).encode("utf-8", "surrogatepass")
+
+
+def diff_items(old_item, new_item, mark_items=True):
+    """
+    Compare two item trees.
+
+    :param old_item: DataModelItem
+    :param new_item: DataModelItem
+    :param mark_items: set diff_state on items in both trees, for highlighting in the view
+    :return: DiffResult
+    """
+    if mark_items:
+        clear_diff_states(old_item)
+        clear_diff_states(new_item)
+
+    result = DiffResult()
+    if get_subtree_hash(old_item) != get_subtree_hash(new_item):
+        _diff_items(old_item, new_item, result, mark_items)
+    return result
+
+
+def clear_diff_states(item):
+    # every marked item has marked parents, so unmarked branches can be skipped
+    items = [item]
+    while items:
+        item = items.pop()
+        if item.diff_state is None:
+            continue
+        item.diff_state = None
+        items.extend(item.children)
+
+
+def _diff_items(old_item, new_item, result, mark_items):
+    if mark_items:
+        old_item.diff_state = DIFF_CHANGED
+        new_item.diff_state = DIFF_CHANGED
+
+    if old_item.data_type != new_item.data_type:
+        result.changed.append((old_item, new_item))
+        return
+
+    if old_item.data_type in _dict_type_names:
+        _diff_dict_children(old_item, new_item, result, mark_items)
+    elif old_item.data_type in _list_type_names:
+        _diff_list_children(old_item, new_item, result, mark_items)
+    else:
+        result.changed.append((old_item, new_item))
+
+
+def _diff_dict_children(old_item, new_item, result, mark_items):
+    old_children = OrderedDict()
+    for old_child in old_item.children:
+        old_children.setdefault(old_child.data_key, old_child)
+
+    for new_child in new_item.children:
+        old_child = old_children.pop(new_child.data_key, None)
+        if old_child is None:
+            _add_result(result.added, new_child, DIFF_ADDED, mark_items)
+        elif get_subtree_hash(old_child) != get_subtree_hash(new_child):
+            _diff_items(old_child, new_child, result, mark_items)
+
+    for old_child in old_children.values():
+        _add_result(result.removed, old_child, DIFF_REMOVED, mark_items)
+
+
+def _diff_list_children(old_item, new_item, result, mark_items):
+    old_children = old_item.children
+    new_children = new_item.children
+
+    # fast path, most list edits keep the majority of items in place
+    unmatched_old = []
+    unmatched_new = []
+    for old_child, new_child in zip(old_children, new_children):
+        if get_subtree_hash(old_child) != get_subtree_hash(new_child):
+            unmatched_old.append(old_child)
+            unmatched_new.append(new_child)
+    unmatched_old.extend(old_children[len(new_children):])
+    unmatched_new.extend(new_children[len(old_children):])
+
+    # items that moved position but are otherwise identical
+    old_by_hash = {}
+    for old_child in unmatched_old:
+        old_by_hash.setdefault(get_subtree_hash(old_child), deque()).append(old_child)
+
+    matched = set()
+    remaining_new = []
+    for new_child in unmatched_new:
+        candidates = old_by_hash.get(get_subtree_hash(new_child))
+        if candidates:
+            matched.add(id(candidates.popleft()))
+        else:
+            remaining_new.append(new_child)
+    remaining_old = [c for c in unmatched_old if id(c) not in matched]
+
+    # whatever is left gets paired up in order
+    for old_child, new_child in zip(remaining_old, remaining_new):
+        _diff_items(old_child, new_child, result, mark_items)
+
+    for old_child in remaining_old[len(remaining_new):]:
+        _add_result(result.removed, old_child, DIFF_REMOVED, mark_items)
+
+    for new_child in remaining_new[len(remaining_old):]:
+        _add_result(result.added, new_child, DIFF_ADDED, mark_items)
+
+
+def _add_result(result_list, item, diff_state, mark_items):
+    result_list.append(item)
+    if not mark_items:
+        return
+
+    items = [item]
+    while items:
+        item = items.pop()
+        item.diff_state = diff_state
+        items.extend(item.children)
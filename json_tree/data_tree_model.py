@@ -1,6 +1,8 @@
 import json
 import os
+import re
 import sys
+import time
 
 if sys.version_info.major > 2:
     import builtins
@@ -9,7 +11,10 @@ else:
 
 from collections import OrderedDict
 
-from json_tree.ui_utils import QtCore, QtWidgets
+from json_tree import data_tree_diff
+from json_tree import json_backends
+from json_tree import json_schema
+from json_tree.ui_utils import QtCore, QtGui, QtWidgets
 
 Qt = QtCore.Qt  # create shortcut to Qt
 
@@ -19,6 +24,12 @@ class LocalConstants:
     col_value = 1
     col_type = 2
 
+    # statistics columns, see DataModel.set_show_stats
+    col_item_count = 3
+    col_byte_size = 4
+    col_depth = 5
+    stats_header_names = ("Items", "Size", "Depth")
+
     add_types = (str, int, float, bool, dict, list)
     default_add_values = {
         str: "STRING",
@@ -28,6 +39,9 @@ class LocalConstants:
 
     default_key_name = "KEY"
 
+    max_display_length = 200  # longer values are truncated in the view, see DataModelItem.get_display_value
+    populate_slice_seconds = 0.016  # time spent adding items per event loop iteration, see DataModel.set_data
+
     list_types = (list, tuple)
     dict_types = (dict, OrderedDict)
     list_type_names = (list.__name__, tuple.__name__)
@@ -36,47 +50,78 @@ class LocalConstants:
     supports_children_type_names = list_type_names + dict_type_names
     none_type_name = str(type(None).__name__)
 
+    # types that can be restored from a packed item tree, see pack_item_tree
+    packed_types = dict((t.__name__, t) for t in (type(None), bool, int, float, str, dict, OrderedDict, list, tuple))
+    packed_number_type_name = "JsonNumber"  # packed as the number text, marshal can't write float subclasses
+
+    diff_state_colors = {
+        data_tree_diff.DIFF_ADDED: QtGui.QColor(40, 160, 40, 90),
+        data_tree_diff.DIFF_REMOVED: QtGui.QColor(200, 40, 40, 90),
+        data_tree_diff.DIFF_CHANGED: QtGui.QColor(200, 160, 0, 70),
+    }
+    schema_error_color = QtGui.QColor(230, 60, 60)
+
+    items_mime_type = "application/x-json-tree-items"  # copied and dragged items, see data_tree.ItemMimeData
+
 
 lk = LocalConstants
 
 
 class DataModelItem(object):
+    # cached per item, cleared by mark_dirty()
+    _subtree_hash = None
+    _display_value = None
+    _sort_keys = None  # (key, value, type) column sort keys, see get_sort_key
+    _stats = None  # ItemStats, see get_item_stats
+    _snapshot = None  # read-only data of containers, see get_item_snapshot
+
+    # key -> child, built on the first lookup and kept up to date after that, see get_children_by_key
+    _children_by_key = None
+    _duplicate_key_count = 0  # children that share a key with an earlier child
+
+    is_modified = False  # edited since loading or saving, set on the edited item and all its parents
+
+    diff_state = None  # set by data_tree_diff.diff_items
+    schema_errors = None  # list of (keyword, message), see DataModel.validate_items
+    source_index = None  # index of the value in DataModel.json_source, see DataModel.set_json_source
+
     def __init__(self, data_key=None, data_value=None, parent=None, key_safety=False):
         self.data_key = data_key
         self.data_value = data_value
-        self.raw_data_type = type(data_value)
+        self.raw_data_type = get_value_type(data_value)
         self.data_type = self.raw_data_type.__name__
 
+        self.row = 0
+        self.children = []
+
         self.parent = parent  # type: DataModelItem
         if parent:
-            parent.add_child(self)
+            parent.add_child(self, mark_modified=False)
 
         if key_safety:
-            self.data_key = self.get_unique_key(data_key)
-
-        self.row = 0
-        self.children = []
+            self.set_key(self.get_unique_key(data_key))
 
     def get_unique_key(self, target_name=""):
         if self.parent.raw_data_type in lk.list_types:
-            return "[{}]".format(self.parent.children.index(self))
-
-        # make sure this value isn't blank
-        if target_name == "":
-            target_name = lk.default_key_name
-
-        output_name = target_name
-        key_names = self.parent.get_child_keys()
+            return "[{}]".format(self.row)
 
-        while output_name in key_names:
-            output_name = "{}_1".format(output_name)
+        children_by_key = self.parent.get_children_by_key()
+        if target_name and children_by_key.get(target_name) is self:
+            return target_name  # the key of this item isn't taken by another child
+        return UniqueKeyResolver(children_by_key).get_unique_key(target_name)
 
-        return output_name
+    def set_key(self, data_key):
+        """Rename this item, keeping the key lookup of the parent up to date"""
+        if self.parent is not None:
+            self.parent._remove_child_key(self, self.data_key)
+        self.data_key = data_key
+        if self.parent is not None:
+            self.parent._add_child_key(self)
 
     def child_count(self):
         return len(self.children)
 
-    def add_child(self, child_item, list_index=None):
+    def add_child(self, child_item, list_index=None, mark_modified=True):
         child_item.parent = self
         if list_index is None:
             child_item.row = self.child_count()
@@ -85,56 +130,418 @@ class DataModelItem(object):
             self.children.insert(list_index, child_item)
             for i, item in enumerate(self.children):
                 item.row = i  # update row mapping
+        self._add_child_key(child_item)
+
+        self._display_value = None
+        self._sort_keys = None
+        if mark_modified:
+            self.mark_dirty()
 
     def remove_child(self, item):
         self.children.remove(item)
+        for i in range(item.row, self.child_count()):
+            self.children[i].row = i  # update row mapping
+        self._remove_child_key(item, item.data_key)
+        self.mark_dirty()
+
+    def insert_children(self, row, items, mark_modified=True):
+        for child_item in items:
+            child_item.parent = self
+        self.children[row:row] = items
+        self.update_rows(row)
+        for child_item in items:
+            self._add_child_key(child_item)
+        self.on_children_changed(mark_modified)
+
+    def remove_children(self, row, count, mark_modified=True):
+        for child_item in self.children[row:row + count]:
+            self._remove_child_key(child_item, child_item.data_key)
+        del self.children[row:row + count]
+        self.update_rows(row)
+        self.on_children_changed(mark_modified)
+
+    def move_children(self, row, count, destination_row, mark_modified=True):
+        """
+        Move a block of children, only the rows between the old and new position are renumbered
+
+        :param row: first child to move
+        :param count: number of children to move
+        :param destination_row: row to move the children in front of, counted before the move
+        """
+        moved_items = self.children[row:row + count]
+        if destination_row > row:
+            self.children[row:destination_row] = self.children[row + count:destination_row] + moved_items
+            self.update_rows(row, destination_row)
+        else:
+            self.children[destination_row:row + count] = moved_items + self.children[destination_row:row]
+            self.update_rows(destination_row, row + count)
+        self.on_children_changed(mark_modified)
+
+    def move_child(self, source_row, destination_row, mark_modified=True):
+        self.children.insert(destination_row, self.children.pop(source_row))
+        self.update_rows(min(source_row, destination_row), max(source_row, destination_row) + 1)
+        self.on_children_changed(mark_modified)
+
+    def update_rows(self, start=0, end=None):
+        if end is None:
+            end = self.child_count()
+        for i in range(start, end):
+            self.children[i].row = i
+
+    def on_children_changed(self, mark_modified=True):
+        if mark_modified:
+            self.mark_dirty()
+        else:
+            self.clear_cached_values()
+
+    def mark_dirty(self):
+        """Clear cached values on this item and its parents after an edit"""
+        self._display_value = None
+        self._sort_keys = None
+
+        # the edited item always has its caches cleared, it can have been marked before a cache was filled
+        self._subtree_hash = None
+        self._stats = None
+        self._snapshot = None
+        self.is_modified = True
+
+        # a parent is only cached after the containers under it, so a marked parent without caches has
+        # marked parents without caches as well
+        item = self.parent
+        while item is not None:
+            if item.is_modified and item._subtree_hash is None and item._stats is None and item._snapshot is None:
+                break
+            item._subtree_hash = None
+            item._stats = None
+            item._snapshot = None
+            item.is_modified = True
+            item = item.parent
+
+    def clear_cached_values(self):
+        """Clear cached values on this item and its parents, without marking them as modified"""
+        self._display_value = None
+        self._sort_keys = None
+
+        item = self
+        while item is not None:
+            item._subtree_hash = None
+            item._stats = None
+            item._snapshot = None
+            item = item.parent
+
+    def clear_modified(self):
+        """Reset is_modified after a save, parents of modified items are always modified so the rest can be skipped"""
+        items = [self]
+        while items:
+            item = items.pop()
+            if not item.is_modified:
+                continue
+            item.is_modified = False
+            items.extend(item.children)
+
+    def can_fetch_more(self):
+        """Item has children that haven't been loaded yet, see NdjsonRecordItem"""
+        return False
+
+    def get_key_path(self):
+        """Dict keys and list indices from the root to this item, see DataModel.get_item_from_key_path"""
+        key_path = []
+        item = self
+        while item.parent is not None:
+            key_path.append(item.row if item.parent.raw_data_type in lk.list_types else item.data_key)
+            item = item.parent
+        key_path.reverse()
+        return key_path
 
     def get_child_keys(self):
         return [child.data_key for child in self.children]
 
-    def set_value(self, new_value):
-        try:
-            type_cls = builtins.__dict__.get(self.data_type)
-
-            if type_cls == bool:
-                # I let you be really sloppy with typing here
-                if new_value.lower().startswith("t"):
-                    data_value = True
-                elif new_value.lower() in ["1", "y"]:
-                    data_value = True
-                elif new_value.lower().startswith("f"):
-                    data_value = False
+    def get_children_by_key(self):
+        """
+        Dict of key -> child, for constant time lookups in large dicts.
+        With duplicate keys only one of the children with that key is in the dict.
+        """
+        if self._children_by_key is None:
+            children_by_key = {}
+            duplicate_key_count = 0
+            for child in self.children:
+                if child.data_key in children_by_key:
+                    duplicate_key_count += 1
                 else:
-                    data_value = False
+                    children_by_key[child.data_key] = child
+            self._children_by_key = children_by_key
+            self._duplicate_key_count = duplicate_key_count
+        return self._children_by_key
+
+    def get_child(self, data_key):
+        """Child with data_key, or None"""
+        return self.get_children_by_key().get(data_key)
+
+    def has_child_key(self, data_key):
+        return data_key in self.get_children_by_key()
+
+    def _add_child_key(self, child_item):
+        if self._children_by_key is None:
+            return  # not built yet
+        if child_item.data_key in self._children_by_key:
+            self._duplicate_key_count += 1
+        else:
+            self._children_by_key[child_item.data_key] = child_item
 
-                data_value = data_value
+    def _remove_child_key(self, child_item, data_key):
+        if self._children_by_key is None:
+            return
+        if self._children_by_key.get(data_key) is not child_item:
+            self._duplicate_key_count -= 1
+        elif self._duplicate_key_count:
+            self._children_by_key = None  # another child may have the same key, rebuilt on the next lookup
+        else:
+            del self._children_by_key[data_key]
+
+    def get_display_value(self):
+        """Value column text, truncated for long values and cached until the item is edited"""
+        if self._display_value is None:
+            if self.raw_data_type in lk.supports_children_types:
+                self._display_value = "-------- {} items --------".format(self.child_count())
+            elif self.is_display_truncated():
+                self._display_value = "{} ... ({} characters)".format(
+                    self.data_value[:lk.max_display_length],
+                    len(self.data_value),
+                )
             else:
-                data_value = type_cls(new_value)
+                self._display_value = self.get_value_text()
+        return self._display_value
+
+    def get_sort_key(self, column):
+        """
+        Key for sorting siblings by a column, values sort by type first, then by value:
+        None, bools, numbers (numerically, NaN last), strings (case insensitive), containers (by item count)
+        """
+        if column >= lk.col_item_count:
+            stats = get_item_stats(self)
+            return (stats.descendant_count, stats.byte_size, stats.depth)[column - lk.col_item_count]
+
+        if column == lk.col_key and self.parent is not None and self.parent.raw_data_type in lk.list_types:
+            return 0, self.row  # rows change on insert/remove, so this isn't cached
+
+        if self._sort_keys is None:
+            self._sort_keys = (
+                (1, str(self.data_key).lower(), str(self.data_key)),
+                get_value_sort_key(self),
+                (self.data_type.lower(), self.data_type),
+            )
+        return self._sort_keys[column]
+
+    def get_value_text(self):
+        """Full value as text, for editing"""
+        if self.data_value is None:
+            return "None"
+        elif self.raw_data_type == bool:
+            return str(self.data_value).title()
+        return str(self.data_value)
+
+    def is_display_truncated(self):
+        return self.raw_data_type == str and len(self.data_value) > lk.max_display_length
+
+    def set_value(self, new_value, data_type=None):
+        """
+        :param new_value: value text
+        :param data_type: type name to convert the text to, the current type by default
+        :return: True if the text could be converted
+        """
+        if data_type is None:
+            data_type = self.data_type
+
+        try:
+            data_value = convert_value_text(new_value, data_type)
+        except (TypeError, ValueError):
+            print('Failed to convert "{}" to type "{}"'.format(new_value, data_type))
+            return False
+
+        self.data_value = data_value
+        self.raw_data_type = get_value_type(data_value)
+        self.data_type = data_type
+        self.mark_dirty()
+        return True
+
+
+class NdjsonRecordItem(DataModelItem):
+    """Record of a newline delimited json file, children are parsed from the file on the first fetchMore"""
+
+    def __init__(self, ndjson_file, record_index, parent=None):
+        self.ndjson_file = ndjson_file  # type: json_tree_system.NdjsonFile
+        self.record_index = record_index
+        self.is_loaded = False
+
+        preview_bytes = ndjson_file.read_record_bytes(record_index, max_bytes=lk.max_display_length + 1)
+        if preview_bytes.startswith(b"{"):
+            data_value = OrderedDict()
+        elif preview_bytes.startswith(b"["):
+            data_value = []
+        else:
+            data_value = ndjson_file.load_record(record_index)
+            self.is_loaded = True
+
+        super(NdjsonRecordItem, self).__init__(
+            data_key="[{}]".format(record_index),
+            data_value=data_value,
+            parent=parent,
+        )
+        if not self.is_loaded:
+            self._display_value = self.get_preview_text(preview_bytes)
+
+    def can_fetch_more(self):
+        return not self.is_loaded
+
+    def load_value(self):
+        return self.ndjson_file.load_record(self.record_index)
+
+    def get_preview_text(self, preview_bytes=None):
+        """Raw record text shown until the record is loaded"""
+        if preview_bytes is None:
+            preview_bytes = self.ndjson_file.read_record_bytes(self.record_index, max_bytes=lk.max_display_length + 1)
+        preview_text = preview_bytes[:lk.max_display_length].decode("utf-8", "replace")
+        if len(preview_bytes) > lk.max_display_length:
+            preview_text += " ..."
+        return preview_text
+
+    def get_display_value(self):
+        if self._display_value is None and not self.is_loaded:
+            self._display_value = self.get_preview_text()
+        return super(NdjsonRecordItem, self).get_display_value()
+
+
+class NdjsonRecordList(object):
+    """
+    Children of the root item for a newline delimited json file.
+
+    Record items are only created when they're first accessed.
+    Inserting, removing or moving rows of the root builds the full list, which reads every record of the file.
+    """
+
+    def __init__(self, parent_item, ndjson_file):
+        self.parent_item = parent_item
+        self.ndjson_file = ndjson_file  # type: json_tree_system.NdjsonFile
+        self._record_items = {}
+        self._items = None
+
+    def get_record_item(self, record_index):
+        item = self._record_items.get(record_index)
+        if item is None:
+            item = NdjsonRecordItem(self.ndjson_file, record_index)
+            item.parent = self.parent_item
+            item.row = record_index
+            self._record_items[record_index] = item
+        return item
+
+    def materialize(self):
+        if self._items is None:
+            self._items = [self.get_record_item(i) for i in range(len(self.ndjson_file))]
+            self._record_items = None
+        return self._items
+
+    def iter_records(self):
+        """(record_index, item) for each row, item is None if it hasn't been accessed yet"""
+        if self._items is None:
+            for record_index in range(len(self.ndjson_file)):
+                yield record_index, self._record_items.get(record_index)
+        else:
+            for item in self._items:
+                yield getattr(item, "record_index", None), item
 
-            self.data_value = data_value
+    def __len__(self):
+        if self._items is not None:
+            return len(self._items)
+        return len(self.ndjson_file)
 
-        except Exception as e:
-            print('Failed to convert "{}" to type "{}"'.format(new_value, self.data_type))
+    def __bool__(self):
+        return len(self) > 0
+
+    __nonzero__ = __bool__
+
+    def __getitem__(self, index):
+        if self._items is not None:
+            return self._items[index]
+
+        if isinstance(index, slice):
+            return [self.get_record_item(i) for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.get_record_item(index)
+
+    def __iter__(self):
+        if self._items is not None:
+            return iter(self._items)
+        return (self.get_record_item(i) for i in range(len(self)))
+
+    def append(self, item):
+        self.materialize().append(item)
+
+    def insert(self, index, item):
+        self.materialize().insert(index, item)
+
+    def remove(self, item):
+        self.materialize().remove(item)
+
+    def __setitem__(self, index, value):
+        self.materialize()[index] = value
+
+    def __delitem__(self, index):
+        del self.materialize()[index]
+
+    def index(self, item):
+        if self._items is None and isinstance(item, NdjsonRecordItem) and item.parent is self.parent_item:
+            return item.row
+        return self.materialize().index(item)
 
 
 class DataModel(QtCore.QAbstractItemModel):
+    populate_finished = QtCore.Signal()
+
     def __init__(self, *args, **kwargs):
         super(DataModel, self).__init__(*args, **kwargs)
 
         self.root_item = DataModelItem()
         self.header_names = ("Key", "Value", "Type")
+        self.ndjson_file = None  # type: json_tree_system.NdjsonFile
+
+        self.show_stats = False  # statistics columns, see get_item_stats
+        self.json_source = None  # type: json_tree_system.JsonSource
+        self.rewritten_source_items = set()  # items saved with different text than json_source has
+        self.schema = None  # type: json_schema.JsonSchema
+        self.invalid_items = set()  # items with schema_errors
+
+        self._populate_iter = None  # (key, value) of top level items that haven't been added yet
+        self._populated_callbacks = []
+        self._populate_timer = QtCore.QTimer(self)
+        self._populate_timer.setInterval(0)
+        self._populate_timer.timeout.connect(self.populate_next_chunk)
 
     ##########################################################################################
     # Overloads
 
     def flags(self, index):
+        if not index.isValid():
+            # dropping below the last item adds to the root
+            return Qt.ItemIsDropEnabled if self.root_item.raw_data_type in lk.supports_children_types else Qt.NoItemFlags
+
+        item = index.internalPointer()  # type: DataModelItem
+        item_flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsDragEnabled
+        if item.raw_data_type in lk.supports_children_types:
+            item_flags |= Qt.ItemIsDropEnabled
+        if index.column() == lk.col_value and item.is_display_truncated():
+            # editing multi-megabyte strings inline is unusable, those go through DataTreeWidget.action_view_full_value
+            return item_flags
         if index.column() < 3:
-            return Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsEditable
-        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+            item_flags |= Qt.ItemIsEditable
+        return item_flags
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
         if role == Qt.DisplayRole:
-            return self.header_names[section]
+            return self.get_header_names()[section]
 
         return super(DataModel, self).headerData(section, orientation, role)
 
@@ -154,7 +561,35 @@ class DataModel(QtCore.QAbstractItemModel):
             return self.root_item.child_count()
 
     def columnCount(self, *args):
-        return 3
+        return len(self.get_header_names())
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        if parent.isValid() and parent.internalPointer().can_fetch_more():
+            return True
+        return self.rowCount(parent) > 0
+
+    def canFetchMore(self, parent):
+        if not parent.isValid():
+            return False
+        return parent.internalPointer().can_fetch_more()
+
+    def fetchMore(self, parent):
+        if not parent.isValid():
+            return
+
+        item = parent.internalPointer()  # type: NdjsonRecordItem
+        if not item.can_fetch_more():
+            return
+
+        data = item.load_value()
+        item.is_loaded = True
+        data_length = get_data_length(data)
+        if not data_length:
+            return
+
+        self.beginInsertRows(parent, 0, data_length - 1)
+        self.add_data_to_model(data_value=data, parent_item=item, merge=True)
+        self.endInsertRows()
 
     def index(self, row, column, parent):
         if not self.hasIndex(row, column, parent):
@@ -180,22 +615,41 @@ class DataModel(QtCore.QAbstractItemModel):
 
             if column == lk.col_key:
                 if item.parent.raw_data_type in lk.list_types:
-                    return "[{}]".format(item.parent.children.index(item))
+                    return "[{}]".format(item.row)
 
                 return item.data_key
 
             if column == lk.col_value:
-                if item.data_value is None:
-                    return "None"
-                elif item.raw_data_type == bool:
-                    return str(item.data_value).title()
-                elif item.raw_data_type in lk.supports_children_types:
-                    return "-------- {} items --------".format(item.child_count())
-                return str(item.data_value)
+                if role == Qt.EditRole and item.raw_data_type not in lk.supports_children_types:
+                    return item.get_value_text()
+                return item.get_display_value()
 
             if column == lk.col_type:
                 return item.data_type
 
+            if column >= lk.col_item_count and role == Qt.DisplayRole:
+                return self.get_stats_text(item, column)
+
+        if role == Qt.TextAlignmentRole:
+            if index.column() >= lk.col_item_count:
+                return int(Qt.AlignRight | Qt.AlignVCenter)
+
+        if role == Qt.ToolTipRole:
+            if index.column() >= lk.col_item_count:
+                return self.get_stats_tooltip(item)
+            if item.schema_errors:
+                return "\n".join(message for keyword, message in item.schema_errors)
+            if index.column() == lk.col_value and item.is_display_truncated():
+                return "Value truncated, double click to view the full value"
+
+        if role == Qt.BackgroundRole:
+            if item.diff_state is not None:
+                return lk.diff_state_colors.get(item.diff_state)
+
+        if role == Qt.ForegroundRole:
+            if item.schema_errors:
+                return lk.schema_error_color
+
         return None
 
     def setData(self, index, value, role):
@@ -210,44 +664,100 @@ class DataModel(QtCore.QAbstractItemModel):
 
             column = index.column()
             if column == lk.col_key:
-                item.data_key = value
+                if value == item.data_key:
+                    return False
+                if item.parent is not None and item.parent.raw_data_type in lk.dict_types and item.parent.has_child_key(value):
+                    print('Key "{}" already exists'.format(value))
+                    return False
+                item.set_key(value)
+                item.mark_dirty()
 
             if column == lk.col_value:
-                if not item.set_value(value):
+                if not item.set_value(value, data_type=self.get_schema_value_type(item, value)):
                     return False
 
             if column == lk.col_type:
                 item.data_type = value
+                item.mark_dirty()
 
+            # whole row, the proxy model only moves the row if the sort column is in the changed range
+            self.dataChanged.emit(index.sibling(index.row(), lk.col_key), index.sibling(index.row(), lk.col_type))
+            self.emit_stats_changed(item)
+            self.validate_items([item])
             return True
 
     def removeRow(self, row, parent):
-        self.beginRemoveRows(parent, 0, 0)
         index = self.index(row, lk.col_key, parent)
         if not index.isValid():
-            self.endRemoveRows()
             return False
         item = index.internalPointer()  # type: DataModelItem
+        self.beginRemoveRows(parent, row, row)
         item.parent.remove_child(item)
         self.endRemoveRows()
+        self.emit_stats_changed(item.parent)
+        self.on_items_removed(item.parent)
         return True
 
     def moveRow(self, sourceParent, sourceRow, destinationParent, destinationChild):
-        self.beginMoveRows(sourceParent, sourceRow, sourceRow, destinationParent, destinationChild)
-        index = self.index(sourceRow, lk.col_key, sourceParent)
+        return self.moveRows(sourceParent, sourceRow, 1, destinationParent, destinationChild)
 
-        if not index.isValid():
-            self.endMoveRows()
+    def moveRows(self, sourceParent, sourceRow, count, destinationParent, destinationChild):
+        source_item = sourceParent.internalPointer() if sourceParent.isValid() else self.root_item
+        destination_item = destinationParent.internalPointer() if destinationParent.isValid() else self.root_item
+        if destination_item.raw_data_type not in lk.supports_children_types:
+            return False
+        if count < 1 or sourceRow < 0 or sourceRow + count > source_item.child_count():
+            return False
+        if not 0 <= destinationChild <= destination_item.child_count():
             return False
 
-        item = index.internalPointer()  # type: DataModelItem
+        moved_items = source_item.children[sourceRow:sourceRow + count]
+        if destination_item is not source_item:
+            # an item can't be moved into itself
+            parent_item = destination_item
+            while parent_item is not None:
+                if parent_item.parent is source_item and parent_item in moved_items:
+                    return False
+                parent_item = parent_item.parent
 
-        item.parent.remove_child(item)
-        item.parent.add_child(item, list_index=destinationChild)
+        # returns False for moves that don't change anything, like moving rows in front of themselves
+        if not self.beginMoveRows(sourceParent, sourceRow, sourceRow + count - 1, destinationParent, destinationChild):
+            return False
 
+        if destination_item is source_item:
+            source_item.move_children(sourceRow, count, destinationChild)
+        else:
+            source_item.remove_children(sourceRow, count)
+            if destination_item.raw_data_type in lk.list_types:
+                for i, item in enumerate(moved_items):
+                    item.data_key = "[{}]".format(destinationChild + i)
+            else:
+                key_resolver = UniqueKeyResolver(destination_item.get_children_by_key())
+                from_list = source_item.raw_data_type in lk.list_types
+                for item in moved_items:
+                    data_key = key_resolver.get_unique_key(item.data_key)
+                    if data_key != item.data_key or from_list:
+                        item.data_key = data_key
+                        item.mark_dirty()  # renamed, or an array value that now has a key
+            destination_item.insert_children(destinationChild, moved_items)
         self.endMoveRows()
+
+        if destination_item is not source_item:
+            self.emit_item_changed(source_item)  # child count in the value column
+            self.emit_item_changed(destination_item)
+            self.emit_stats_changed(source_item)
+            self.emit_stats_changed(destination_item)
+            self.on_items_removed(source_item)
+        self.validate_items(moved_items)  # key paths changed
         return True
 
+    def supportedDropActions(self):
+        return Qt.MoveAction | Qt.CopyAction
+
+    def mimeTypes(self):
+        # drags are started and dropped by DataTreeView, this lets the view accept them
+        return [lk.items_mime_type]
+
     ##########################################################################################
 
     def get_all_indices(self, index=None, persistent=False):
@@ -262,37 +772,446 @@ class DataModel(QtCore.QAbstractItemModel):
             for grand_child in self.get_all_indices(child, persistent=persistent):
                 yield grand_child
 
-    def set_data(self, data):
+    def set_data(self, data, chunked=False):
+        """
+        :param data:
+        :param chunked: add top level items in time slices from the event loop, so the first ones are shown
+            straight away, see populate_next_chunk
+        """
+        self.stop_populating()
         self.beginResetModel()
+        self.ndjson_file = None
+        self.json_source = None
         self.root_item = DataModelItem(data_key="root_item", data_value=type(data)())
-        if data is None:
+        self.invalid_items = set()
+        if data is not None and not (chunked and isinstance(data, lk.supports_children_types)):
+            self.add_data_to_model(data_value=data, parent_item=self.root_item, merge=True)
+        self.endResetModel()
+
+        if data is not None and chunked and isinstance(data, lk.supports_children_types):
+            if isinstance(data, lk.dict_types):
+                self._populate_iter = iter(data.items())
+            else:
+                self._populate_iter = (("[{}]".format(i), value) for i, value in enumerate(data))
+            self.populate_next_chunk()
+            if self._populate_iter is not None:
+                self._populate_timer.start()
+
+    def is_populating(self):
+        return self._populate_iter is not None
+
+    def populate_next_chunk(self):
+        if self._populate_iter is None:
+            self._populate_timer.stop()
+            return
+
+        items = []
+        end_time = time.time() + lk.populate_slice_seconds
+        for data_key, data_value in self._populate_iter:
+            items.append(self.create_item(data_key, data_value))
+            if time.time() >= end_time:
+                break
+        else:
+            self._populate_iter = None
+
+        self.add_populated_items(items)
+
+    def finish_populating(self):
+        """Add the rest of the items now, for anything that needs the whole tree"""
+        if self._populate_iter is None:
             return
-        self.add_data_to_model(data_value=data, parent_item=self.root_item, merge=True)
+        items = [self.create_item(data_key, data_value) for data_key, data_value in self._populate_iter]
+        self._populate_iter = None
+        self.add_populated_items(items)
+
+    def stop_populating(self):
+        self._populate_timer.stop()
+        self._populate_iter = None
+        self._populated_callbacks = []
+
+    def add_populated_items(self, items):
+        if items:
+            row = self.root_item.child_count()
+            self.beginInsertRows(QtCore.QModelIndex(), row, row + len(items) - 1)
+            self.root_item.insert_children(row, items, mark_modified=False)
+            self.endInsertRows()
+
+        if self._populate_iter is None:
+            self._populate_timer.stop()
+            callbacks = self._populated_callbacks
+            self._populated_callbacks = []
+            for callback in callbacks:
+                callback()
+            self.populate_finished.emit()
+
+    def call_when_populated(self, callback):
+        """Call callback once all items have been added, straight away if they already are"""
+        if self._populate_iter is None:
+            callback()
+        else:
+            self._populated_callbacks.append(callback)
+
+    def set_root_item(self, root_item):
+        """Show an already built item tree, see unpack_item_tree"""
+        self.stop_populating()
+        self.beginResetModel()
+        self.ndjson_file = None
+        self.json_source = None
+        self.root_item = root_item
+        self.invalid_items = set()
+        self.endResetModel()
+
+    def set_ndjson_file(self, ndjson_file):
+        """
+        Show records of a newline delimited json file as children of a root list,
+        records are parsed when they're expanded.
+
+        :param ndjson_file: json_tree_system.NdjsonFile
+        :return:
+        """
+        self.stop_populating()
+        self.beginResetModel()
+        self.ndjson_file = ndjson_file
+        self.json_source = None
+        self.root_item = DataModelItem(data_key="root_item", data_value=[])
+        self.invalid_items = set()
+        self.root_item.children = NdjsonRecordList(self.root_item, ndjson_file)
         self.endResetModel()
 
+    def save_ndjson(self, json_path=None):
+        """Save records back to a newline delimited json file, unmodified records are copied from the source file"""
+
+        def iter_records():
+            for i, (record_index, item) in enumerate(self.root_item.children.iter_records()):
+                if item is None or (record_index is not None and not item.is_modified):
+                    yield record_index, None
+                else:
+                    yield None, self.get_item_data(item)
+
+                if isinstance(item, NdjsonRecordItem):
+                    item.record_index = i  # position in the saved file
+
+        self.ndjson_file.save(iter_records(), json_path)
+
+        # iterating children of the root would create every record item, so only go through the accessed ones
+        for record_index, item in self.root_item.children.iter_records():
+            if item is not None:
+                item.clear_modified()
+        self.root_item.is_modified = False
+
     def get_index_from_item(self, item):
-        # TODO: improve this with UUIDs or something
-        for index in self.get_all_indices():
-            if index.internalPointer() is item:
-                return index
-        return QtCore.QModelIndex()
+        # rows are kept up to date by DataModelItem.add_child/remove_child
+        if item is None or item is self.root_item or item.parent is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(item.row, 0, item)
+
+    def get_item_from_key_path(self, key_path, fetch=True):
+        """
+        Find an item by the dict keys and list indices leading to it from the root
+
+        :param key_path: list of keys and indices
+        :param fetch: load lazily loaded items on the way, otherwise the first item that isn't loaded is returned
+        :return: DataModelItem or None
+        """
+        self.finish_populating()
+        item = self.root_item
+        for key in key_path:
+            if item.can_fetch_more():
+                if not fetch:
+                    return item
+                self.fetchMore(self.get_index_from_item(item))
+
+            if item.raw_data_type in lk.list_types:
+                if not isinstance(key, int) or not 0 <= key < item.child_count():
+                    return None
+                item = item.children[key]
+                continue
+
+            item = item.get_child(key)
+            if item is None:
+                return None
+
+        return item
 
     def add_data_to_indices(self, index_data_map, merge=True, key_safety=True):
+        inserts = []
         for index_data in index_data_map:
             index = index_data[0]  # type: QtCore.QModelIndex
             data = index_data[1]
 
-            item = index.internalPointer()  # type: DataModelItem # noqa
+            parent_item = index.internalPointer() if index.isValid() else self.root_item
+            inserts.append((parent_item, self.build_items(data, merge=merge)))
 
-            data_length = get_data_length(data)
-            start = item.child_count()
-            end = start + data_length - 1
+        return self.insert_items(inserts, key_safety=key_safety)
 
-            self.beginInsertRows(index, start, end)
+    def build_items(self, data, merge=True):
+        """
+        Items for data that aren't in the model yet, see insert_items.
+        Nothing in the model is touched, so this can run on a worker thread.
 
-            self.add_data_to_model(data_value=data, parent_item=item, merge=merge, key_safety=key_safety)
+        :param data:
+        :param merge: add the keys or values of a dict or list, instead of data as a single item
+        :return: list of DataModelItem
+        """
+        if merge and isinstance(data, lk.dict_types):
+            key_values = data.items()
+        elif merge and isinstance(data, lk.list_types):
+            key_values = (("[{}]".format(i), value) for i, value in enumerate(data))
+        else:
+            key_values = [("", data)]
+
+        with json_backends.paused_gc():
+            return [self.create_item(key, value) for key, value in key_values]
+
+    def insert_items(self, inserts, key_safety=True, row=None):
+        """
+        Add items to the end of their parent's children, with one insert notification per parent
+
+        :param inserts: list of (parent_item, items)
+        :param key_safety: rename items with keys that are already taken in the parent
+        :param row: insert the items in front of this row instead of at the end
+        :return: list of inserted items
+        """
+        self.finish_populating()  # new items go after all the items of the file
+        items_by_parent = OrderedDict()
+        for parent_item, items in inserts:
+            items_by_parent.setdefault(parent_item, []).extend(items)
+
+        inserted_items = []
+        for parent_item, items in items_by_parent.items():
+            start_row = parent_item.child_count() if row is None else min(row, parent_item.child_count())
+            if parent_item.raw_data_type in lk.list_types:
+                for i, item in enumerate(items):
+                    item.data_key = "[{}]".format(start_row + i)
+            elif key_safety:
+                key_resolver = UniqueKeyResolver(parent_item.get_children_by_key())
+                for item in items:
+                    item.data_key = key_resolver.get_unique_key(item.data_key)
+
+            self.insert_item_rows(parent_item, start_row, items)
+            inserted_items.extend(items)
+
+        return inserted_items
+
+    def move_items(self, items, parent_item, row):
+        """
+        Move items in front of row of parent_item, with one moveRows per block of neighbouring rows.
+        Items inside other moved items move along with them.
+
+        :param items: list of DataModelItem
+        :param parent_item: DataModelItem
+        :param row: row of parent_item to move the items in front of, counted before the move
+        :return: True if any items were moved
+        """
+        parent_index = self.get_index_from_item(parent_item)
+        moved = False
+        for block_items in iter_item_blocks([item for item in items if self.is_item_in_model(item)]):
+            first_item = block_items[0]
+            if self.moveRows(
+                self.get_index_from_item(first_item.parent),
+                first_item.row,
+                len(block_items),
+                parent_index,
+                row,
+            ):
+                moved = True
+            elif first_item.parent is not parent_item:
+                continue  # moving an item into itself
+
+            # the next block goes after this one
+            row = block_items[-1].row + 1
+        return moved
+
+    def is_item_in_model(self, item):
+        # removed items keep their parent, so check that each parent still has the item as a child
+        while item.parent is not None:
+            parent = item.parent
+            if item.row >= parent.child_count() or parent.children[item.row] is not item:
+                return False
+            item = parent
+        return item is self.root_item
+
+    def create_item(self, data_key, data_value):
+        """Item for data_value, including its children, that isn't in the model yet"""
+        if isinstance(data_value, lk.dict_types):
+            item = DataModelItem(data_key=data_key, data_value={})
+        elif isinstance(data_value, lk.list_types):
+            item = DataModelItem(data_key=data_key, data_value=[])
+        else:
+            return DataModelItem(data_key=data_key, data_value=data_value)
 
-            self.endInsertRows()
+        self.add_data_to_model(data_value=data_value, parent_item=item, merge=True)
+        return item
+
+    def insert_item_rows(self, parent_item, row, items, mark_modified=True):
+        if not items:
+            return
+        self.beginInsertRows(self.get_index_from_item(parent_item), row, row + len(items) - 1)
+        parent_item.insert_children(row, items, mark_modified=mark_modified)
+        self.endInsertRows()
+        self.emit_item_changed(parent_item)  # child count in the value column
+        self.emit_stats_changed(parent_item)
+        self.validate_items(items)
+
+    def remove_item_rows(self, parent_item, row, count, mark_modified=True):
+        if not count:
+            return
+        self.beginRemoveRows(self.get_index_from_item(parent_item), row, row + count - 1)
+        parent_item.remove_children(row, count, mark_modified=mark_modified)
+        self.endRemoveRows()
+        self.emit_item_changed(parent_item)
+        self.emit_stats_changed(parent_item)
+        self.on_items_removed(parent_item)
+
+    def remove_items(self, items, in_tree_order=False):
+        """
+        Remove items with one removeRows per block of neighbouring rows, for removing many items at once.
+        Parents are updated once after all the blocks are removed.
+
+        :param items: list of DataModelItem, items inside other items are removed along with them
+        :param in_tree_order: see iter_item_blocks
+        """
+        parent_items = OrderedDict()
+        # last block first, so the rows of the blocks before it stay the same
+        for block_items in reversed(list(iter_item_blocks(items, in_tree_order=in_tree_order))):
+            parent_item = block_items[0].parent
+            row = block_items[0].row
+            self.beginRemoveRows(self.get_index_from_item(parent_item), row, row + len(block_items) - 1)
+            parent_item.remove_children(row, len(block_items))
+            self.endRemoveRows()
+            parent_items[parent_item] = None
+
+        if not parent_items:
+            return
+        emitted_items = set()
+        for parent_item in parent_items:
+            self.emit_item_changed(parent_item)
+            self.emit_stats_changed(parent_item, emitted_items=emitted_items)
+        self.invalid_items = set(item for item in self.invalid_items if self.is_item_in_model(item))
+        for parent_item in parent_items:
+            self.validate_container(parent_item)
+
+    def move_item_row(self, parent_item, source_row, destination_row, mark_modified=True):
+        parent_index = self.get_index_from_item(parent_item)
+        # destination is the row to insert before, in the rows as they are before the move
+        destination_child = destination_row + 1 if destination_row > source_row else destination_row
+        if not self.beginMoveRows(parent_index, source_row, source_row, parent_index, destination_child):
+            return
+        parent_item.move_child(source_row, destination_row, mark_modified=mark_modified)
+        self.endMoveRows()
+
+    def emit_item_changed(self, item):
+        index = self.get_index_from_item(item)
+        if index.isValid():
+            self.dataChanged.emit(index, index.sibling(index.row(), lk.col_type))
+
+    def update_data(self, data):
+        """
+        Change the model to match data, with inserts, removes and dataChanged for only the rows that differ,
+        so expanded and selected items stay as they are. Changed items are not marked as modified.
+
+        :param data:
+        :return: False if the model couldn't be updated in place, set_data has to be used instead
+        """
+        if self.ndjson_file is not None:
+            return False
+
+        self.finish_populating()
+        self.json_source = None  # changed items aren't marked as modified, so their source text can't be used
+        root_item = self.root_item
+        if isinstance(data, lk.dict_types) and root_item.raw_data_type in lk.dict_types:
+            self.update_dict_children(root_item, data)
+        elif isinstance(data, lk.list_types) and root_item.raw_data_type in lk.list_types:
+            self.update_list_children(root_item, data)
+        else:
+            return False
+        return True
+
+    def update_item(self, item, data_value):
+        is_dict = isinstance(data_value, lk.dict_types)
+        is_list = isinstance(data_value, lk.list_types)
+
+        if is_dict and item.raw_data_type in lk.dict_types:
+            self.update_dict_children(item, data_value)
+
+        elif is_list and item.raw_data_type in lk.list_types:
+            self.update_list_children(item, data_value)
+
+        elif is_dict or is_list or item.raw_data_type in lk.supports_children_types:
+            # value changed to or from a container, rebuild the children
+            self.remove_item_rows(item, 0, item.child_count(), mark_modified=False)
+            new_item = self.create_item(item.data_key, data_value)
+            item.data_value = new_item.data_value
+            item.raw_data_type = new_item.raw_data_type
+            item.data_type = new_item.data_type
+            self.insert_item_rows(item, 0, list(new_item.children), mark_modified=False)
+            item.clear_cached_values()
+            self.emit_item_changed(item)
+
+        elif (
+            item.raw_data_type is not get_value_type(data_value)
+            or item.data_value != data_value
+            or getattr(item.data_value, "text", None) != getattr(data_value, "text", None)  # 1.1 -> 1.10
+        ):
+            item.data_value = data_value
+            item.raw_data_type = get_value_type(data_value)
+            item.data_type = item.raw_data_type.__name__
+            item.clear_cached_values()
+            self.emit_item_changed(item)
+
+    def update_dict_children(self, item, data):
+        new_keys = list(data.keys())
+        new_key_set = set(new_keys)
+
+        # remove children with keys that are gone (or duplicated), in runs from the end so rows stay valid
+        seen_keys = set()
+        keep = []
+        for child in item.children:
+            keep.append(child.data_key in new_key_set and child.data_key not in seen_keys)
+            seen_keys.add(child.data_key)
+
+        row = len(keep) - 1
+        while row >= 0:
+            if keep[row]:
+                row -= 1
+                continue
+            run_end = row
+            while row >= 0 and not keep[row]:
+                row -= 1
+            self.remove_item_rows(item, row + 1, run_end - row, mark_modified=False)
+
+        # children before row match new_keys, the rest are all further down in new_keys
+        children_by_key = dict((child.data_key, child) for child in item.children)
+        row = 0
+        while row < len(new_keys):
+            child = children_by_key.get(new_keys[row])
+            if child is None:
+                run_end = row
+                while run_end < len(new_keys) and new_keys[run_end] not in children_by_key:
+                    run_end += 1
+                new_items = [self.create_item(key, data[key]) for key in new_keys[row:run_end]]
+                self.insert_item_rows(item, row, new_items, mark_modified=False)
+                row = run_end
+                continue
+
+            if child.row != row:
+                self.move_item_row(item, child.row, row, mark_modified=False)
+            self.update_item(child, data[new_keys[row]])
+            row += 1
+
+    def update_list_children(self, item, data):
+        old_count = item.child_count()
+        new_count = len(data)
+
+        if old_count > new_count:
+            self.remove_item_rows(item, new_count, old_count - new_count, mark_modified=False)
+
+        for row in range(min(old_count, new_count)):
+            self.update_item(item.children[row], data[row])
+
+        if new_count > old_count:
+            new_items = [self.create_item("[{}]".format(i), data[i]) for i in range(old_count, new_count)]
+            self.insert_item_rows(item, old_count, new_items, mark_modified=False)
 
     def add_data_to_model(self, data_key="", data_value=None, parent_item=None, merge=False, key_safety=False):
         if isinstance(data_value, lk.dict_types):
@@ -322,14 +1241,43 @@ class DataModel(QtCore.QAbstractItemModel):
             DataModelItem(data_key, data_value, parent=parent_item, key_safety=key_safety)
 
     def get_data(self):
+        self.finish_populating()
         output_obj = self.root_item.raw_data_type()  # create instance of root type
         self.recursive_fill_data(output_obj, item=self.root_item)
         return output_obj
 
+    def get_snapshot(self, item=None):
+        """
+        Read-only data of item, or of the whole tree, for reading it on worker threads while the tree is edited.
+        Unlike get_data, only the containers that were edited since the last snapshot are built again.
+
+        :param item: DataModelItem, the root item by default
+        :return: json data, see get_item_snapshot
+        """
+        if item is None or item is self.root_item:
+            self.finish_populating()
+            item = self.root_item
+        return get_item_snapshot(item)
+
+    def get_item_data(self, item):
+        """Value of a single item, including its children"""
+        if item is self.root_item:
+            self.finish_populating()
+        if item.can_fetch_more():
+            return item.load_value()
+        if item.data_type in lk.dict_type_names:
+            return self.recursive_fill_data(OrderedDict(), item)
+        if item.data_type in lk.list_type_names:
+            return self.recursive_fill_data([], item)
+        return item.data_value
+
     def recursive_fill_data(self, output_obj, item):
         for child in item.children:  # type:DataModelItem
 
-            if child.data_type in lk.dict_type_names:
+            if child.can_fetch_more():
+                data_value = child.load_value()
+
+            elif child.data_type in lk.dict_type_names:
                 data_value = self.recursive_fill_data(OrderedDict(), child)
 
             elif child.data_type in lk.list_type_names:
@@ -344,6 +1292,228 @@ class DataModel(QtCore.QAbstractItemModel):
 
         return output_obj
 
+    ##########################################################################################
+    # Statistics
+
+    def get_header_names(self):
+        if self.show_stats:
+            return self.header_names + lk.stats_header_names
+        return self.header_names
+
+    def set_show_stats(self, show_stats):
+        """Show item count, json size and depth of every item in extra columns"""
+        if show_stats == self.show_stats:
+            return
+
+        first_column = len(self.header_names)
+        last_column = first_column + len(lk.stats_header_names) - 1
+        if show_stats:
+            self.beginInsertColumns(QtCore.QModelIndex(), first_column, last_column)
+            self.show_stats = True
+            self.endInsertColumns()
+        else:
+            self.beginRemoveColumns(QtCore.QModelIndex(), first_column, last_column)
+            self.show_stats = False
+            self.endRemoveColumns()
+
+    def get_stats_text(self, item, column):
+        stats = get_item_stats(item)
+        if column == lk.col_byte_size:
+            return format_byte_size(stats.byte_size)
+        if item.raw_data_type not in lk.supports_children_types:
+            return ""
+        if column == lk.col_item_count:
+            return "{:,}".format(stats.descendant_count)
+        return str(stats.depth)
+
+    def get_stats_tooltip(self, item):
+        stats = get_item_stats(item)
+        root_size = get_item_stats(self.root_item).byte_size
+        lines = ["{} of json, {:.1f}% of the document".format(
+            format_byte_size(stats.byte_size),
+            100.0 * stats.byte_size / root_size if root_size else 100.0,
+        )]
+        if stats.type_counts:
+            lines.append("")
+            for data_type, count in sorted(stats.type_counts.items(), key=lambda type_count: -type_count[1]):
+                lines.append("{}: {:,}".format(data_type, count))
+        return "\n".join(lines)
+
+    def emit_stats_changed(self, item, emitted_items=None):
+        """
+        Stats of item and its parents include an edit of item
+
+        :param item:
+        :param emitted_items: set of items that were already emitted, for edits of many items, stops at these
+        """
+        if not self.show_stats:
+            return
+        while item is not None and item is not self.root_item:
+            if emitted_items is not None:
+                if item in emitted_items:
+                    break
+                emitted_items.add(item)
+            index = self.get_index_from_item(item)
+            self.dataChanged.emit(index.sibling(index.row(), lk.col_item_count), index.sibling(index.row(), lk.col_depth))
+            item = item.parent
+
+    ##########################################################################################
+    # Saving with the formatting of the file
+
+    def set_json_source(self, json_source):
+        """
+        Number the items by the values of the text they were parsed from, see get_source_json_bytes
+
+        :param json_source: json_tree_system.JsonSource, or None to stop using it
+        :return: False if the text doesn't match the items
+        """
+        self.json_source = None
+        self.rewritten_source_items = set()
+        if json_source is None or self.ndjson_file is not None:
+            return json_source is None
+
+        self.finish_populating()
+        if not set_source_indices(self.root_item, json_source):
+            print("Items don't match the file text, it will be saved without its formatting")
+            return False
+        self.json_source = json_source
+        return True
+
+    def get_source_json_bytes(self):
+        """Json text of the items, unedited values are copied from json_source"""
+        self.finish_populating()
+        return SourceJsonWriter(self.json_source, self.rewritten_source_items).get_json_bytes(self.root_item)
+
+    def on_source_saved(self):
+        """Edited items were saved with new text, call before clearing is_modified"""
+        items = [self.root_item]
+        while items:
+            item = items.pop()
+            if not item.is_modified:
+                continue
+            if item.source_index is not None:
+                self.rewritten_source_items.add(item)
+            items.extend(item.children)
+
+    ##########################################################################################
+    # Schema validation
+
+    def set_schema(self, schema):
+        """
+        :param schema: json_schema.JsonSchema or None, see DataTreeWidget.validate_tree for validating the whole tree
+        """
+        self.schema = schema
+        self.set_schema_errors([])
+
+    def get_schema_value_type(self, item, value_text):
+        """Type name the schema allows for item that value_text can be converted to, or None to keep its type"""
+        if self.schema is None:
+            return None
+
+        for data_type in self.schema.get_value_type_names(item.get_key_path(), item.data_type) or []:
+            try:
+                convert_value_text(value_text, data_type)
+            except (TypeError, ValueError):
+                continue
+            return data_type
+        return None
+
+    def validate_items(self, items):
+        """
+        Validate edited items with their children, and the keys and length of their parents.
+
+        Checks of other parents that depend on child values (enum, uniqueItems, anyOf, ...)
+        are updated by the next validation of the whole tree.
+        """
+        if self.schema is None:
+            return
+
+        parent_items = OrderedDict()
+        for item in items:
+            errors_by_item = {}
+            errors = self.schema.iter_errors(self.get_item_data(item), item.get_key_path())
+            for key_path, keyword, message in errors:
+                error_item = self.get_item_from_key_path(key_path, fetch=False)
+                if error_item is not None:
+                    errors_by_item.setdefault(error_item, []).append((keyword, message))
+
+            for invalid_item in self.get_invalid_items(item):
+                if invalid_item not in errors_by_item:
+                    self.set_item_schema_errors(invalid_item, None)
+            for error_item, item_errors in errors_by_item.items():
+                self.set_item_schema_errors(error_item, item_errors)
+
+            if item.parent is not None:
+                parent_items[item.parent] = None
+
+        for parent_item in parent_items:
+            self.validate_container(parent_item)
+
+    def validate_container(self, item):
+        """Check the keys and length of item again after children were added, removed or renamed"""
+        if self.schema is None:
+            return
+
+        if item.raw_data_type in lk.dict_types:
+            container_value = item.get_children_by_key()  # values are items, but only the keys are checked
+        elif item.raw_data_type in lk.list_types:
+            container_value = item.children
+        else:
+            return
+
+        errors = [error for error in item.schema_errors or [] if error[0] not in json_schema.CONTAINER_KEYWORDS]
+        errors.extend(self.schema.get_errors(
+            container_value,
+            item.get_key_path(),
+            keywords=json_schema.CONTAINER_KEYWORDS,
+        ))
+        self.set_item_schema_errors(item, errors)
+
+    def on_items_removed(self, parent_item):
+        self.invalid_items = set(item for item in self.invalid_items if self.is_item_in_model(item))
+        self.validate_container(parent_item)
+
+    def set_schema_errors(self, errors):
+        """
+        Flag items with the errors of a validation of the whole tree, replacing all earlier errors
+
+        :param errors: list of (key_path, keyword, message) from json_schema.JsonSchema.validate
+        """
+        errors_by_item = {}
+        for key_path, keyword, message in errors:
+            item = self.get_item_from_key_path(key_path, fetch=False)
+            if item is not None:
+                errors_by_item.setdefault(item, []).append((keyword, message))
+
+        for item in list(self.invalid_items):
+            if item not in errors_by_item:
+                self.set_item_schema_errors(item, None)
+        for item, item_errors in errors_by_item.items():
+            self.set_item_schema_errors(item, item_errors)
+
+    def set_item_schema_errors(self, item, errors):
+        errors = errors or None
+        if errors == item.schema_errors:
+            return
+
+        item.schema_errors = errors
+        if errors:
+            self.invalid_items.add(item)
+        else:
+            self.invalid_items.discard(item)
+        self.emit_item_changed(item)
+
+    def get_invalid_items(self, root_item):
+        """Items with schema errors in the tree under root_item, including root_item"""
+        invalid_items = []
+        for item in self.invalid_items:
+            parent = item
+            while parent is not None and parent is not root_item:
+                parent = parent.parent
+            if parent is root_item:
+                invalid_items.append(item)
+        return invalid_items
+
     def refresh_model(self):
         self.beginResetModel()
         self.endResetModel()
@@ -376,6 +1546,699 @@ class DataSortFilterProxyModel(QtCore.QSortFilterProxyModel):
                 return index
         return QtCore.QModelIndex()
 
+    def lessThan(self, source_left, source_right):
+        # cached typed sort keys, instead of comparing display text
+        left_item = source_left.internalPointer()  # type: DataModelItem
+        right_item = source_right.internalPointer()  # type: DataModelItem
+        column = source_left.column()
+        return left_item.get_sort_key(column) < right_item.get_sort_key(column)
+
+
+def pack_item_tree(root_item):
+    """
+    Flatten an item tree into plain lists, in depth first order, for marshal or other compact serialization.
+
+    :param root_item: DataModelItem
+    :return: (keys, values, type_names, child_counts)
+    """
+    keys = []
+    values = []
+    type_names = []
+    child_counts = []
+
+    items = [root_item]
+    while items:
+        item = items.pop()  # type: DataModelItem
+        if item.can_fetch_more():
+            raise ValueError("Can't pack items that haven't been loaded: {}".format(item.data_key))
+
+        is_container = item.raw_data_type in lk.supports_children_types
+        is_list_child = item.parent is not None and item.parent.raw_data_type in lk.list_types
+
+        keys.append(None if is_list_child else item.data_key)  # list keys are rebuilt from the row
+        if type(item.data_value) is json_backends.JsonNumber:
+            values.append(item.data_value.text)
+            type_names.append(lk.packed_number_type_name)
+        else:
+            values.append(None if is_container else item.data_value)
+            type_names.append(item.data_type)
+        child_counts.append(item.child_count())
+        items.extend(reversed(item.children))
+
+    return keys, values, type_names, child_counts
+
+
+def pack_json_data(json_data, root_key="root_item"):
+    """
+    Same output as pack_item_tree, for the item tree DataModel.set_data builds from json_data.
+    Only reads json_data, so it can run on a worker thread while the tree is edited.
+
+    :param json_data: dict or list
+    :param root_key: data_key of the root item
+    :return: (keys, values, type_names, child_counts)
+    """
+    dict_types = lk.dict_types
+    list_types = lk.list_types
+    dict_type_name = dict.__name__  # DataModel.add_data_to_model builds every container below the root as dict or list
+    list_type_name = list.__name__
+    number_type = json_backends.JsonNumber
+    number_type_name = lk.packed_number_type_name
+
+    keys = [root_key]
+    values = [None]
+    type_names = [type(json_data).__name__]
+    child_counts = [len(json_data)]
+
+    # (is_list_child, iterator of children) for the containers that are being packed
+    stack = [(False, iter(json_data.items()))] if isinstance(json_data, dict_types) else [(True, iter(json_data))]
+    while stack:
+        is_list_child, children = stack[-1]
+        child = next(children, stack)
+        if child is stack:
+            stack.pop()
+            continue
+
+        if is_list_child:
+            data_key, data_value = None, child
+        else:
+            data_key, data_value = child
+        keys.append(data_key)
+
+        if isinstance(data_value, dict_types):
+            values.append(None)
+            type_names.append(dict_type_name)
+            child_counts.append(len(data_value))
+            stack.append((False, iter(data_value.items())))
+        elif isinstance(data_value, list_types):
+            values.append(None)
+            type_names.append(list_type_name)
+            child_counts.append(len(data_value))
+            stack.append((True, iter(data_value)))
+        elif type(data_value) is number_type:
+            values.append(data_value.text)
+            type_names.append(number_type_name)
+            child_counts.append(0)
+        else:
+            values.append(data_value)
+            type_names.append(type(data_value).__name__)
+            child_counts.append(0)
+
+    return keys, values, type_names, child_counts
+
+
+def unpack_item_tree(packed_tree):
+    """
+    Rebuild an item tree from pack_item_tree output
+
+    :param packed_tree: (keys, values, type_names, child_counts)
+    :return: DataModelItem
+    """
+    keys, values, type_names, child_counts = packed_tree
+
+    with json_backends.paused_gc():
+        root_type = lk.packed_types.get(type_names[0])
+        if root_type in lk.supports_children_types:
+            root_item = DataModelItem(data_key=keys[0], data_value=root_type())
+        elif type_names[0] == lk.packed_number_type_name:
+            root_item = DataModelItem(data_key=keys[0], data_value=json_backends.JsonNumber(values[0]))
+        else:
+            root_item = DataModelItem(data_key=keys[0], data_value=values[0])
+            root_item.data_type = type_names[0]
+
+        parents = [root_item]
+        remaining_children = [child_counts[0]]
+        for i in range(1, len(keys)):
+            while not remaining_children[-1]:
+                parents.pop()
+                remaining_children.pop()
+            remaining_children[-1] -= 1
+            parent = parents[-1]
+
+            data_type = type_names[i]
+            data_value = values[i]
+            raw_data_type = lk.packed_types.get(data_type)
+            if raw_data_type is None:
+                if data_type == lk.packed_number_type_name:
+                    data_value = json_backends.JsonNumber(data_value)
+                    data_type = float.__name__
+                raw_data_type = get_value_type(data_value)
+
+            # __init__ is skipped, this runs once per node and restoring has to be faster than parsing
+            item = DataModelItem.__new__(DataModelItem)
+            item.data_key = keys[i]
+            item.raw_data_type = raw_data_type
+            item.data_type = data_type
+            item.row = len(parent.children)
+            item.children = []
+            item.parent = parent
+            parent.children.append(item)
+
+            if raw_data_type in lk.supports_children_types:
+                item.data_value = raw_data_type()
+                if child_counts[i]:
+                    parents.append(item)
+                    remaining_children.append(child_counts[i])
+            else:
+                item.data_value = data_value
+
+            if item.data_key is None:
+                item.data_key = "[{}]".format(item.row)
+
+    return root_item
+
+
+def set_source_indices(root_item, json_source):
+    """
+    Set source_index of the items, values of json_source are in the same depth first order as the items
+
+    :return: False if the items and values don't match up
+    """
+    value_count = len(json_source)
+    source_index = 0
+    items = [root_item]
+    while items:
+        item = items.pop()
+        if source_index >= value_count:
+            return False
+        if (item.raw_data_type in lk.supports_children_types) != json_source.is_container(source_index):
+            return False
+        item.source_index = source_index
+        source_index += 1
+        items.extend(reversed(item.children))
+    return source_index == value_count
+
+
+class SourceJsonWriter(object):
+    """
+    Json text of an item tree, with the text of json_tree_system.JsonSource for items that haven't changed.
+
+    Neighbouring unchanged items are copied as one block, new items get the indentation of the file.
+    """
+
+    def __init__(self, json_source, rewritten_items=()):
+        """
+        :param json_source: json_tree_system.JsonSource
+        :param rewritten_items: items that were saved with different text than json_source has
+        """
+        self.json_source = json_source
+        self.rewritten_items = rewritten_items
+        self.parts = []
+
+    def get_json_bytes(self, root_item):
+        json_source = self.json_source
+        json_bytes = json_source.json_bytes
+        self.parts = [json_bytes[:json_source.value_starts[0]]]  # whitespace around the root
+        self.write_value(root_item, b"")
+        self.parts.append(json_bytes[json_source.value_ends[0]:])
+        return b"".join(self.parts)
+
+    def is_unchanged(self, item):
+        return item.source_index is not None and not item.is_modified and item not in self.rewritten_items
+
+    def write_value(self, item, indent):
+        if self.is_unchanged(item):
+            self.parts.append(self.json_source.get_value_bytes(item.source_index))
+        elif item.data_type in lk.dict_type_names or item.data_type in lk.list_type_names:
+            self.write_container(item, indent)
+        else:
+            self.parts.append(json_backends.dumps_bytes(item.data_value, keep_number_text=True))
+
+    def get_layout(self, item, is_dict, indent):
+        """
+        :return: (text after the opening bracket, text between children, text before the closing bracket)
+        """
+        json_source = self.json_source
+        source_index = item.source_index
+        if source_index is not None and json_source.get_first_byte(source_index) == (b"{" if is_dict else b"["):
+            if not json_source.is_empty(source_index):
+                opening, separator, closing = json_source.get_layout(source_index)
+                if separator is None:
+                    # a single child, the separator is guessed from the opening
+                    separator = b"," + opening if b"\n" in opening else json_source.item_separator
+                return opening, separator, closing
+
+        if not json_source.is_indented:
+            return b"", json_source.item_separator, b""
+        opening = json_source.newline + indent + json_source.indent
+        return opening, b"," + opening, json_source.newline + indent
+
+    def write_container(self, item, indent):
+        json_source = self.json_source
+        json_bytes = json_source.json_bytes
+        member_starts = json_source.member_starts
+        value_starts = json_source.value_starts
+        value_ends = json_source.value_ends
+        parts = self.parts
+
+        is_dict = item.data_type in lk.dict_type_names
+        if not item.child_count():
+            parts.append(b"{}" if is_dict else b"[]")
+            return
+
+        opening, separator, closing = self.get_layout(item, is_dict, indent)
+        child_indent = opening[opening.rfind(b"\n") + 1:] if b"\n" in opening else indent
+
+        parts.append(b"{" if is_dict else b"[")
+        parts.append(opening)
+        run_start = run_end = None  # text of unchanged neighbouring children, copied in one go
+        for row, child in enumerate(item.children):
+            source_index = child.source_index
+            is_source_member = self.is_unchanged(child) and json_source.has_key(source_index) == is_dict
+            if is_source_member and run_end is not None:
+                if json_source.get_separator_end(previous_index) == member_starts[source_index]:
+                    run_end = value_ends[source_index]
+                    previous_index = source_index
+                    continue
+
+            if run_end is not None:
+                parts.append(json_bytes[run_start:run_end])
+                run_start = run_end = None
+            if row:
+                parts.append(separator)
+
+            if is_source_member:
+                run_start = member_starts[source_index]
+                run_end = value_ends[source_index]
+                previous_index = source_index
+                continue
+
+            if is_dict:
+                has_source_key = source_index is not None and json_source.has_key(source_index)
+                if has_source_key and json_source.get_key(source_index) == child.data_key:
+                    parts.append(json_bytes[member_starts[source_index]:value_starts[source_index]])
+                else:
+                    parts.append(json_backends.dumps_bytes(str(child.data_key)) + json_source.key_separator)
+            self.write_value(child, child_indent)
+
+        if run_end is not None:
+            parts.append(json_bytes[run_start:run_end])
+        parts.append(closing)
+        parts.append(b"}" if is_dict else b"]")
+
+
+class UniqueKeyResolver(object):
+    """Unique keys for many new children of a parent, without going through the sibling keys for each of them"""
+
+    def __init__(self, existing_keys):
+        """
+        :param existing_keys: keys that are already taken, a set or dict is used as is without copying it
+        """
+        self.existing_keys = existing_keys if isinstance(existing_keys, (set, dict)) else set(existing_keys)
+        self.keys = set()  # keys handed out by this resolver
+        self.counters = {}  # next suffix to try per key
+
+    def is_taken(self, key):
+        return key in self.existing_keys or key in self.keys
+
+    def get_unique_key(self, target_name=""):
+        # make sure this value isn't blank
+        if target_name == "":
+            target_name = lk.default_key_name
+
+        output_name = target_name
+        if self.is_taken(output_name):
+            counter = self.counters.get(target_name, 1)
+            output_name = "{}_{}".format(target_name, counter)
+            while self.is_taken(output_name):
+                counter += 1
+                output_name = "{}_{}".format(target_name, counter)
+            self.counters[target_name] = counter + 1
+
+        self.keys.add(output_name)
+        return output_name
+
+
+def get_value_type(data_value):
+    """Type of a value, numbers that keep their json text are floats"""
+    value_type = type(data_value)
+    if value_type is json_backends.JsonNumber:
+        return float
+    return value_type
+
+
+def convert_value_text(value_text, data_type):
+    """
+    :param value_text: edited text
+    :param data_type: type name, like DataModelItem.data_type
+    :return: value of type data_type, raises ValueError or TypeError if it can't be converted
+    """
+    if data_type == lk.none_type_name:
+        if value_text.strip() not in ("", "None", "null"):
+            raise ValueError("Not None: {}".format(value_text))
+        return None
+
+    type_cls = builtins.__dict__.get(data_type)
+    if type_cls is None:
+        raise TypeError("Unknown type: {}".format(data_type))
+
+    if type_cls == bool:
+        # I let you be really sloppy with typing here
+        value_text = value_text.lower()
+        return value_text.startswith("t") or value_text in ["1", "y"]
+
+    if type_cls == float and json_backends.is_json_float_text(value_text):
+        return json_backends.parse_float(value_text)  # typed as 1.50 is saved as 1.50
+
+    return type_cls(value_text)
+
+
+def get_row_path(item):
+    """Rows from the root to item, these sort in the order items are shown in the tree"""
+    row_path = []
+    while item.parent is not None:
+        row_path.append(item.row)
+        item = item.parent
+    row_path.reverse()
+    return row_path
+
+
+def iter_item_blocks(items, in_tree_order=False):
+    """
+    Lists of items with the same parent and neighbouring rows, in tree order, without items inside other items.
+    Rows are checked when each block is taken, so earlier blocks can be moved while iterating.
+
+    :param items: list of DataModelItem
+    :param in_tree_order: items are already in tree order without items inside other items, skips sorting them
+    """
+    if in_tree_order:
+        top_items = items
+    else:
+        item_set = set(items)
+        top_items = []
+        for item in items:
+            parent = item.parent
+            while parent is not None and parent not in item_set:
+                parent = parent.parent
+            if parent is None:
+                top_items.append(item)
+        top_items.sort(key=get_row_path)
+
+    i = 0
+    while i < len(top_items):
+        first_item = top_items[i]
+        count = 1
+        while i + count < len(top_items):
+            next_item = top_items[i + count]
+            if next_item.parent is not first_item.parent or next_item.row != first_item.row + count:
+                break
+            count += 1
+        yield top_items[i:i + count]
+        i += count
+
+
+def pack_items(items):
+    """
+    Pack items with their children, to be added somewhere else with unpack_items
+
+    :param items: list of DataModelItem
+    :return: list of (key, pack_item_tree output), the key is the row for children of a list
+    """
+    packed_items = []
+    for item in items:
+        is_list_child = item.parent is not None and item.parent.raw_data_type in lk.list_types
+        packed_items.append((item.row if is_list_child else item.data_key, pack_item_tree(item)))
+    return packed_items
+
+
+def unpack_items(packed_items):
+    """
+    :param packed_items: pack_items output
+    :return: list of DataModelItem that aren't in a model yet, see DataModel.insert_items
+    """
+    items = []
+    for key, packed_tree in packed_items:
+        item = unpack_item_tree(packed_tree)
+        item.data_key = str(key)  # keys of list children are replaced when they're added to a list
+        items.append(item)
+    return items
+
+
+def packed_tree_to_data(packed_tree):
+    """Plain data of pack_item_tree output, without creating items"""
+    keys, values, type_names, child_counts = packed_tree
+
+    def create_value(i):
+        value_type = lk.packed_types.get(type_names[i])
+        if value_type in lk.dict_types:
+            return OrderedDict()
+        if value_type in lk.list_types:
+            return []
+        if type_names[i] == lk.packed_number_type_name:
+            return json_backends.JsonNumber(values[i])
+        return values[i]
+
+    root_value = create_value(0)
+    parents = [root_value]
+    remaining_children = [child_counts[0]]
+    for i in range(1, len(keys)):
+        while not remaining_children[-1]:
+            parents.pop()
+            remaining_children.pop()
+        remaining_children[-1] -= 1
+        parent = parents[-1]
+
+        value = create_value(i)
+        if isinstance(parent, list):
+            parent.append(value)
+        else:
+            parent[keys[i]] = value
+
+        if child_counts[i]:
+            parents.append(value)
+            remaining_children.append(child_counts[i])
+
+    return root_value
+
+
+def get_value_sort_key(item):
+    data_value = item.data_value
+    raw_data_type = item.raw_data_type
+
+    if data_value is None:
+        return (0,)
+    if raw_data_type == bool:
+        return 1, data_value
+    if raw_data_type in (int, float):
+        if data_value != data_value:
+            return 2, 1, 0  # NaN
+        return 2, 0, data_value
+    if raw_data_type == str:
+        return 3, data_value.lower(), data_value
+    if raw_data_type in lk.supports_children_types:
+        return 4, item.child_count()
+    return 5, str(data_value)
+
+
+def count_items(root_item):
+    """Number of items in the tree, records of a lazily loaded ndjson file count once until they're loaded"""
+    item_count = 0
+    items = [root_item]
+    while items:
+        item = items.pop()
+        item_count += 1
+        if isinstance(item.children, NdjsonRecordList):
+            loaded_items = [record_item for _, record_item in item.children.iter_records() if record_item is not None]
+            item_count += len(item.children) - len(loaded_items)
+            items.extend(loaded_items)
+        else:
+            items.extend(item.children)
+    return item_count
+
+
+class ItemStats(object):
+    """Size of an item and everything under it, see get_item_stats"""
+    __slots__ = ("descendant_count", "byte_size", "depth", "type_counts")
+
+    def __init__(self, descendant_count=0, byte_size=0, depth=0, type_counts=None):
+        self.descendant_count = descendant_count
+        self.byte_size = byte_size  # compact json, without the key of the item
+        self.depth = depth  # levels of containers under the item
+        self.type_counts = type_counts  # type name -> count of descendants, None if there are none
+
+
+def get_item_stats(item):
+    """
+    Stats of item, computed in one post-order pass over the containers under it.
+
+    Stats are cached on containers and mark_dirty clears them on an edited item and its parents,
+    so after an edit only the containers on the way to the edit are computed again.
+    Values are cheap to measure, so they aren't cached to save memory.
+
+    :param item: DataModelItem
+    :return: ItemStats
+    """
+    if item._stats is not None:
+        return item._stats
+    if item.raw_data_type not in lk.supports_children_types:
+        return ItemStats(byte_size=get_json_value_size(item.data_value))
+
+    stack = [(item, False)]
+    while stack:
+        current, children_done = stack.pop()
+        if children_done:
+            current._stats = compute_container_stats(current)
+            continue
+
+        stack.append((current, True))
+        for child in iter_loaded_children(current):
+            if child._stats is None and child.raw_data_type in lk.supports_children_types:
+                stack.append((child, False))
+
+    return item._stats
+
+
+def compute_container_stats(item):
+    """Stats of a container item, from the cached stats of its child containers"""
+    if item.can_fetch_more():
+        return ItemStats(byte_size=item.ndjson_file.get_record_size(item.record_index))
+
+    supports_children_types = lk.supports_children_types
+    escaped_search = _json_escaped_characters.search
+    is_dict = item.raw_data_type in lk.dict_types
+    descendant_count = 0
+    byte_size = 2  # brackets
+    depth = 0
+    type_counts = {}
+
+    children = iter_loaded_children(item)
+    if is_dict:
+        byte_size += sum(get_json_value_size(str(child.data_key)) + 1 for child in children)  # keys and colons
+
+    for child in children:
+        descendant_count += 1
+        data_type = child.data_type
+        type_counts[data_type] = type_counts.get(data_type, 0) + 1
+
+        raw_data_type = child.raw_data_type
+        if raw_data_type not in supports_children_types:
+            if raw_data_type is str:
+                value = child.data_value
+                if escaped_search(value) is None:
+                    byte_size += len(value.encode("utf-8")) + 2
+                    continue
+            byte_size += get_json_value_size(child.data_value)
+            continue
+
+        child_stats = child._stats  # type: ItemStats
+        descendant_count += child_stats.descendant_count
+        byte_size += child_stats.byte_size
+        if child_stats.depth >= depth:
+            depth = child_stats.depth + 1
+        if child_stats.type_counts:
+            for data_type, count in child_stats.type_counts.items():
+                type_counts[data_type] = type_counts.get(data_type, 0) + count
+
+    if isinstance(item.children, NdjsonRecordList):
+        # records that haven't been accessed have no items, only their size is known
+        ndjson_file = item.children.ndjson_file
+        for record_index, record_item in item.children.iter_records():
+            if record_item is None:
+                descendant_count += 1
+                byte_size += ndjson_file.get_record_size(record_index)
+        depth = max(depth, 1)
+
+    byte_size += max(item.child_count() - 1, 0)  # commas
+    return ItemStats(descendant_count, byte_size, depth, type_counts or None)
+
+
+def get_item_snapshot(item):
+    """
+    Value of item as json data that is never changed after it's built, so worker threads can read it without locks.
+
+    Containers are cached on the items like get_item_stats, and mark_dirty clears them on an edited item and its
+    parents. A snapshot after an edit only builds the containers on the way to the edit again, everything else is
+    shared with the snapshots before it. Code reading a snapshot must not change it.
+
+    :param item: DataModelItem
+    :return: OrderedDict, list or value
+    """
+    if item._snapshot is not None:
+        return item._snapshot
+    if item.raw_data_type not in lk.supports_children_types:
+        return item.data_value
+    if item.can_fetch_more():
+        return item.load_value()  # not cached, records that weren't opened stay in the file
+
+    stack = [(item, False)]
+    while stack:
+        current, children_done = stack.pop()
+        if children_done:
+            current._snapshot = build_container_snapshot(current)
+            continue
+
+        stack.append((current, True))
+        for child in iter_loaded_children(current):
+            if (
+                child._snapshot is None
+                and child.raw_data_type in lk.supports_children_types
+                and not child.can_fetch_more()
+            ):
+                stack.append((child, False))
+
+    return item._snapshot
+
+
+def build_container_snapshot(item):
+    """Snapshot of a container item, from the cached snapshots of its child containers"""
+    supports_children_types = lk.supports_children_types
+
+    if isinstance(item.children, NdjsonRecordList):
+        # records that haven't been accessed have no items, they're read from the file
+        ndjson_file = item.children.ndjson_file
+        return [
+            ndjson_file.load_record(record_index) if record_item is None else get_item_snapshot(record_item)
+            for record_index, record_item in item.children.iter_records()
+        ]
+
+    values = []
+    for child in item.children:
+        value = child._snapshot
+        if value is None:
+            if child.raw_data_type in supports_children_types:
+                value = get_item_snapshot(child)
+            else:
+                value = child.data_value
+        values.append(value)
+
+    if item.raw_data_type in lk.dict_types:
+        return OrderedDict(zip([child.data_key for child in item.children], values))
+    return values
+
+
+def iter_loaded_children(item):
+    """Children of item, without creating the items of ndjson records that haven't been accessed"""
+    if isinstance(item.children, NdjsonRecordList):
+        return [record_item for _, record_item in item.children.iter_records() if record_item is not None]
+    return item.children
+
+
+_json_escaped_characters = re.compile(r'["\\\x00-\x1f]')
+
+
+def get_json_value_size(value):
+    """Bytes of value as compact json"""
+    if isinstance(value, str):
+        if _json_escaped_characters.search(value) is None:
+            return len(value.encode("utf-8")) + 2
+        return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    if value is None or value is True:
+        return 4
+    if value is False:
+        return 5
+    if isinstance(value, int):
+        return len(str(value))
+    if isinstance(value, json_backends.JsonNumber):
+        return len(value.text)
+    return len(json.dumps(value, default=str))
+
+
+def format_byte_size(byte_size):
+    for unit in ("B", "KB", "MB"):
+        if byte_size < 1024:
+            return "{:.0f} {}".format(byte_size, unit) if unit == "B" else "{:.1f} {}".format(byte_size, unit)
+        byte_size /= 1024.0
+    return "{:.1f} GB".format(byte_size)
+
 
 def get_data_length(data):
     if isinstance(data, lk.dict_types):
@@ -0,0 +1,359 @@
+"""
+Bulk transformations of a DataModelItem tree, for edits like scaling every "scale" value or removing keys by pattern.
+
+Operations are compiled once into a function per operation, then applied together in a single traversal of the tree.
+Removed items are taken out in blocks of neighbouring rows after the traversal, and a model gets one dataChanged
+per parent of the changed items, instead of one notification per edited value.
+
+Example, from the Maya script editor:
+    from json_tree import data_tree_transforms as transforms
+    transforms.transform_file("C:/data/rig.json", [
+        transforms.ScaleNumbers(0.01, key_pattern="scale"),
+        transforms.RemoveKeys("tmp_*"),
+        transforms.ConvertStringNumbers(),
+    ])
+"""
+import fnmatch
+import math
+import re
+from collections import OrderedDict
+
+from . import data_tree_model
+from . import json_tree_system
+
+CHANGED = "changed"
+REMOVED = "removed"
+
+_leaf_types = (str, int, float, bool, type(None))
+_number_text_regex = re.compile(r"\s*-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?\s*$")
+
+
+class TransformResult(object):
+    def __init__(self):
+        self.changed = []  # items with a new key or value
+        self.removed = []  # items that were taken out of the tree
+
+    def has_changes(self):
+        return bool(self.changed or self.removed)
+
+    def summary(self):
+        return "{} changed, {} removed".format(len(self.changed), len(self.removed))
+
+
+class Operation(object):
+    """
+    Base class of the transform operations.
+    Subclasses implement get_item_function, which is called once per transform and not for every item.
+    """
+    value_types = None  # types the operation applies to, all types if None
+
+    def __init__(self, key_pattern=None):
+        """
+        :param key_pattern: only change items with a key that matches this glob pattern, like "scale*"
+        """
+        self.key_pattern = key_pattern
+
+    def compile(self):
+        """
+        :return: function(item) -> CHANGED, REMOVED or None if the item was left as it is
+        """
+        item_function = self.get_item_function()
+        value_types = self.value_types
+        key_match = get_key_match(self.key_pattern)
+
+        if key_match is None and value_types is None:
+            return item_function
+
+        def transform_item(item):
+            if value_types is not None and item.raw_data_type not in value_types:
+                return None
+            if key_match is not None and not key_match(item.data_key):
+                return None
+            return item_function(item)
+
+        return transform_item
+
+    def get_item_function(self):
+        raise NotImplementedError
+
+
+class ScaleNumbers(Operation):
+    """Multiply int and float values"""
+    value_types = (int, float)
+
+    def __init__(self, factor, key_pattern=None):
+        super(ScaleNumbers, self).__init__(key_pattern=key_pattern)
+        self.factor = factor
+
+    def get_item_function(self):
+        factor = self.factor
+
+        def scale_item(item):
+            set_item_value(item, item.data_value * factor)
+            return CHANGED
+
+        return scale_item
+
+
+class RemoveKeys(Operation):
+    """Remove the members of objects with a key that matches a glob pattern, along with their children"""
+
+    def __init__(self, key_pattern):
+        super(RemoveKeys, self).__init__(key_pattern=key_pattern)
+
+    def get_item_function(self):
+        def remove_item(item):
+            if item.parent is None or item.parent.raw_data_type not in data_tree_model.lk.dict_types:
+                return None  # array values and the root have no key to match
+            return REMOVED
+
+        return remove_item
+
+
+class ConvertStringNumbers(Operation):
+    """Convert strings like "12" and "1.5" to numbers, strings that aren't json numbers are left as they are"""
+    value_types = (str,)
+
+    def __init__(self, key_pattern=None, integers_only=False):
+        """
+        :param key_pattern:
+        :param integers_only: leave strings with a fraction or exponent as they are
+        """
+        super(ConvertStringNumbers, self).__init__(key_pattern=key_pattern)
+        self.integers_only = integers_only
+
+    def get_item_function(self):
+        number_match = _number_text_regex.match
+        integers_only = self.integers_only
+
+        def convert_item(item):
+            match = number_match(item.data_value)
+            if match is None:
+                return None
+
+            if match.group(1) is None and match.group(2) is None:
+                set_item_value(item, int(item.data_value))
+            elif integers_only:
+                return None
+            else:
+                data_value = float(item.data_value)
+                if math.isinf(data_value):
+                    return None  # "1e400", infinity isn't valid json
+                set_item_value(item, data_value)
+            return CHANGED
+
+        return convert_item
+
+
+class ModifyText(Operation):
+    """Search and replace, then add a prefix and suffix, on keys of object members and on string values"""
+
+    def __init__(self, prefix="", suffix="", replacements=(), keys=True, values=True, key_pattern=None):
+        """
+        :param prefix:
+        :param suffix:
+        :param replacements: list of (search, replace)
+        :param keys: modify the keys of object members
+        :param values: modify string values
+        :param key_pattern:
+        """
+        super(ModifyText, self).__init__(key_pattern=key_pattern)
+        self.prefix = prefix
+        self.suffix = suffix
+        self.replacements = list(replacements)
+        self.keys = keys
+        self.values = values
+
+    def get_item_function(self):
+        prefix = self.prefix
+        suffix = self.suffix
+        replacements = [(search, replace) for search, replace in self.replacements if search]
+        modify_keys = self.keys
+        modify_values = self.values
+        dict_types = data_tree_model.lk.dict_types
+
+        def modify_string(input_string):
+            for search, replace in replacements:
+                input_string = input_string.replace(search, replace)
+            return "{}{}{}".format(prefix, input_string, suffix)
+
+        def modify_item(item):
+            result = None
+            if modify_keys and item.parent is not None and item.parent.raw_data_type in dict_types:
+                data_key = modify_string(item.data_key)
+                if data_key != item.data_key:
+                    if item.parent.has_child_key(data_key):
+                        data_key = item.get_unique_key(data_key)
+                    item.set_key(data_key)
+                    item.mark_dirty()
+                    result = CHANGED
+
+            if modify_values and item.raw_data_type is str:
+                data_value = modify_string(item.data_value)
+                if data_value != item.data_value:
+                    set_item_value(item, data_value)
+                    result = CHANGED
+            return result
+
+        return modify_item
+
+
+class MapValues(Operation):
+    """Replace values with the result of a function, for edits that the other operations don't cover"""
+
+    def __init__(self, function, key_pattern=None, value_types=None):
+        """
+        :param function: function(value) -> new value, which can't be an object or array
+        :param key_pattern:
+        :param value_types: types of the values to pass to function, all values that aren't objects or arrays if None
+        """
+        super(MapValues, self).__init__(key_pattern=key_pattern)
+        self.function = function
+        self.value_types = tuple(value_types) if value_types is not None else _leaf_types
+
+    def get_item_function(self):
+        function = self.function
+
+        def map_item(item):
+            data_value = function(item.data_value)
+            if type(data_value) is type(item.data_value) and data_value == item.data_value:
+                return None
+            if not isinstance(data_value, _leaf_types):
+                raise TypeError("MapValues can't set {} values, on {}".format(
+                    type(data_value).__name__,
+                    item.get_key_path(),
+                ))
+            set_item_value(item, data_value)
+            return CHANGED
+
+        return map_item
+
+
+def get_key_match(key_pattern):
+    """
+    :param key_pattern: glob pattern, or None
+    :return: function(key) -> match or None, or None if every key matches
+    """
+    if key_pattern is None:
+        return None
+    key_regex = re.compile(fnmatch.translate(key_pattern))
+
+    def key_match(data_key):
+        return data_key is not None and key_regex.match(data_key)
+
+    return key_match
+
+
+def set_item_value(item, data_value):
+    item.data_value = data_value
+    item.raw_data_type = data_tree_model.get_value_type(data_value)
+    item.data_type = item.raw_data_type.__name__
+    item.mark_dirty()
+
+
+def apply_transforms(items, operations, model=None, recursive=True):
+    """
+    Apply operations to items in a single traversal, each item goes through the operations in order.
+    Items that get removed aren't passed to the operations after the one that removed them.
+
+    :param items: list of DataModelItem, the root item for a whole document
+    :param operations: list of Operation
+    :param model: DataModel the items are in, gets batched notifications for the changes.
+        Records of ndjson files that weren't opened yet are loaded, without a model they're skipped.
+    :param recursive: also transform the children of items
+    :return: TransformResult
+    """
+    item_functions = [operation.compile() for operation in operations]
+    result = TransformResult()
+    if model is not None:
+        model.finish_populating()
+
+    # items inside other items would be transformed twice, reversed so items come off the stack in tree order
+    stack = [item for block_items in data_tree_model.iter_item_blocks(items) for item in block_items]
+    stack.reverse()
+    while stack:
+        item = stack.pop()
+        if item.can_fetch_more() and model is not None:
+            model.fetchMore(model.get_index_from_item(item))
+
+        item_result = None
+        for item_function in item_functions:
+            function_result = item_function(item)
+            if function_result is REMOVED:
+                item_result = REMOVED
+                break
+            if function_result is CHANGED:
+                item_result = CHANGED
+
+        if item_result is REMOVED:
+            result.removed.append(item)
+            continue
+        if item_result is CHANGED:
+            result.changed.append(item)
+
+        if recursive:
+            stack.extend(reversed(data_tree_model.iter_loaded_children(item)))
+
+    # children of removed items aren't visited, so the removed items are in tree order without nested items
+    if model is not None:
+        model.remove_items(result.removed, in_tree_order=True)
+        emit_items_changed(model, result.changed)
+    else:
+        # last block first, so the rows of earlier blocks stay the same
+        for block_items in reversed(list(data_tree_model.iter_item_blocks(result.removed, in_tree_order=True))):
+            block_items[0].parent.remove_children(block_items[0].row, len(block_items))
+    return result
+
+
+def emit_items_changed(model, items):
+    """One dataChanged per parent of the changed items, covering the rows from the first to the last changed item"""
+    rows_by_parent = OrderedDict()
+    for item in items:
+        if item.parent is None:
+            continue  # the root item isn't shown
+        rows_by_parent.setdefault(item.parent, []).append(item.row)
+
+    last_column = model.columnCount() - 1
+    for parent_item, rows in rows_by_parent.items():
+        parent_index = model.get_index_from_item(parent_item)
+        model.dataChanged.emit(
+            model.index(min(rows), data_tree_model.lk.col_key, parent_index),
+            model.index(max(rows), last_column, parent_index),
+        )
+
+    emitted_items = set()
+    for parent_item in rows_by_parent:
+        model.emit_stats_changed(parent_item, emitted_items=emitted_items)
+
+    if model.schema is not None:
+        # validation includes the children, so only the outermost changed items are needed
+        model.validate_items([item for block_items in data_tree_model.iter_item_blocks(items) for item in block_items])
+
+
+def transform_data(json_data, operations):
+    """
+    :param json_data: loaded json, which is left as it is
+    :param operations: list of Operation
+    :return: (transformed json data, TransformResult)
+    """
+    model = data_tree_model.DataModel()
+    model.set_data(json_data)
+    result = apply_transforms([model.root_item], operations, model=model)
+    return model.get_data(), result
+
+
+def transform_file(json_path, operations, output_path=None):
+    """
+    :param json_path:
+    :param operations: list of Operation
+    :param output_path: path to save the transformed json to, json_path by default
+    :return: TransformResult, or None if json_path doesn't exist
+    """
+    json_data = json_tree_system.load_json(json_path)
+    if json_data is None:
+        return None
+
+    json_data, result = transform_data(json_data, operations)
+    if result.has_changes() or output_path:
+        json_tree_system.save_json(json_data, output_path or json_path)
+    return result
@@ -0,0 +1,71 @@
+from . import data_tree
+from . import data_tree_diff
+from .ui_utils import QtCore, QtWidgets
+
+
+class DiffWidget(QtWidgets.QWidget):
+    def __init__(self, old_data=None, new_data=None, old_title="Old", new_title="New", *args, **kwargs):
+        super(DiffWidget, self).__init__(*args, **kwargs)
+
+        self.max_expanded_items = 200  # expanding every changed item on a huge diff would lay out the full tree
+
+        self.old_label = QtWidgets.QLabel(old_title)
+        self.new_label = QtWidgets.QLabel(new_title)
+        self.summary_label = QtWidgets.QLabel()
+
+        self.old_tree = data_tree.DataTreeWidget()
+        self.new_tree = data_tree.DataTreeWidget()
+
+        old_layout = QtWidgets.QVBoxLayout()
+        old_layout.setContentsMargins(0, 0, 0, 0)
+        old_layout.addWidget(self.old_label)
+        old_layout.addWidget(self.old_tree)
+        old_widget = QtWidgets.QWidget()
+        old_widget.setLayout(old_layout)
+
+        new_layout = QtWidgets.QVBoxLayout()
+        new_layout.setContentsMargins(0, 0, 0, 0)
+        new_layout.addWidget(self.new_label)
+        new_layout.addWidget(self.new_tree)
+        new_widget = QtWidgets.QWidget()
+        new_widget.setLayout(new_layout)
+
+        splitter = QtWidgets.QSplitter(QtCore.Qt.Horizontal)
+        splitter.addWidget(old_widget)
+        splitter.addWidget(new_widget)
+
+        self.main_layout = QtWidgets.QVBoxLayout()
+        self.main_layout.addWidget(splitter)
+        self.main_layout.addWidget(self.summary_label)
+        self.setLayout(self.main_layout)
+
+        if old_data is not None and new_data is not None:
+            self.set_diff_data(old_data, new_data)
+
+    def set_diff_data(self, old_data, new_data):
+        # the diff needs all items
+        self.old_tree.set_tree_data(old_data, chunked=False)
+        self.new_tree.set_tree_data(new_data, chunked=False)
+
+        diff_result = data_tree_diff.diff_items(
+            self.old_tree.tree_model.root_item,
+            self.new_tree.tree_model.root_item,
+        )
+        self.summary_label.setText(diff_result.summary())
+
+        self.old_tree.expand_to_items(diff_result.removed[:self.max_expanded_items])
+        self.new_tree.expand_to_items(diff_result.added[:self.max_expanded_items])
+        for old_item, new_item in diff_result.changed[:self.max_expanded_items]:
+            self.old_tree.expand_to_items([old_item])
+            self.new_tree.expand_to_items([new_item])
+
+        return diff_result
+
+
+class DiffWindow(QtWidgets.QMainWindow):
+    def __init__(self, old_data, new_data, old_title="Old", new_title="New", parent=None):
+        super(DiffWindow, self).__init__(parent)
+        self.setWindowTitle("Compare - {} | {}".format(old_title, new_title))
+        self.ui = DiffWidget(old_data, new_data, old_title=old_title, new_title=new_title)
+        self.setCentralWidget(self.ui)
+        self.resize(1400, 900)
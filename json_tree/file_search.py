@@ -0,0 +1,207 @@
+"""
+Search the keys and values of every json file in a folder, using a process pool.
+
+Workers only get file paths and return key paths of matches, so very little is sent between processes.
+"""
+import multiprocessing
+import os
+import sys
+
+from . import json_backends
+from . import json_tree_system as system
+
+SEARCH_EXTENSIONS = tuple(
+    [".json"] + list(system.NDJSON_EXTENSIONS) + [
+        json_extension + compression_extension
+        for json_extension in [".json"] + list(system.NDJSON_EXTENSIONS)
+        for compression_extension in system.COMPRESSION_EXTENSIONS.keys()
+    ]
+)
+
+MAX_MATCHES_PER_FILE = 1000
+
+
+def iter_json_files(root_dir):
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(SEARCH_EXTENSIONS):
+                yield os.path.join(dir_path, file_name)
+
+
+class SearchQuery(object):
+    def __init__(self, text, match_keys=True, match_values=True, case_sensitive=False):
+        """
+        :param text: substring to find
+        :param match_keys: search dict keys
+        :param match_values: search values, containers are skipped
+        :param case_sensitive:
+        """
+        self.text = text
+        self.match_keys = match_keys
+        self.match_values = match_values
+        self.case_sensitive = case_sensitive
+
+    def get_prefilter_bytes(self):
+        """
+        Bytes that have to be in the file for it to have a match, or None if a file has to be parsed to know.
+
+        Json escapes quotes, backslashes, control and (optionally) non ascii characters, and can write / as \\/,
+        so text with those can be written differently in the file than in the parsed value.
+        """
+        if not self.text:
+            return None
+        if any(ord(c) < 32 or ord(c) > 126 or c in '"\\/' for c in self.text):
+            return None
+
+        text = self.text if self.case_sensitive else self.text.lower()
+        return text.encode("ascii")
+
+
+def search_file(json_path, query):
+    """
+    Find matching keys and values in a file
+
+    :param json_path:
+    :param query: SearchQuery
+    :return: (json_path, list of key paths), a key path is the list of dict keys and list indices to the match
+    """
+    try:
+        with system.open_json_file(json_path, "rb") as fp:
+            json_bytes = fp.read()
+    except (IOError, OSError) as e:
+        print("Can't read {}: {}".format(json_path, e))
+        return json_path, []
+
+    prefilter_bytes = query.get_prefilter_bytes()
+    if prefilter_bytes is not None:
+        search_bytes = json_bytes if query.case_sensitive else json_bytes.lower()
+        if prefilter_bytes not in search_bytes:
+            return json_path, []
+
+    try:
+        if system.is_ndjson_path(json_path):
+            json_data = list(system.iter_ndjson_records([json_bytes]))
+        else:
+            json_data = json_backends.loads(json_bytes)
+    except ValueError as e:
+        print("Can't parse {}: {}".format(json_path, e))
+        return json_path, []
+
+    return json_path, find_key_paths(json_data, query)
+
+
+def find_key_paths(json_data, query, max_matches=MAX_MATCHES_PER_FILE):
+    text = query.text if query.case_sensitive else query.text.lower()
+    case_sensitive = query.case_sensitive
+
+    key_paths = []
+    values = [((), json_data)]
+    while values and len(key_paths) < max_matches:
+        key_path, value = values.pop()
+
+        if isinstance(value, dict):
+            children = list(value.items())
+        elif isinstance(value, list):
+            children = list(enumerate(value))
+        else:
+            if query.match_values and key_path:
+                value_text = get_value_text(value)
+                if text in (value_text if case_sensitive else value_text.lower()):
+                    key_paths.append(list(key_path))
+            continue
+
+        for key, child_value in reversed(children):
+            child_key_path = key_path + (key,)
+            if query.match_keys and not isinstance(key, int):
+                if text in (key if case_sensitive else key.lower()):
+                    key_paths.append(list(child_key_path))
+            values.append((child_key_path, child_value))
+
+    return key_paths
+
+
+def get_value_text(value):
+    """Value as it's written in json, so the raw bytes prefilter can't skip a matching value"""
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _search_file_task(task):
+    return search_file(*task)
+
+
+def get_process_count():
+    return max(1, multiprocessing.cpu_count() - 1)
+
+
+def create_process_pool(process_count=None):
+    """
+    Pool of spawned processes, forking a process with Qt and worker threads can deadlock on locks held by other threads
+    """
+    process_count = process_count or get_process_count()
+    if not hasattr(multiprocessing, "get_context"):
+        return multiprocessing.Pool(process_count)  # python 2, maya on windows, which always spawns
+    context = multiprocessing.get_context("spawn")
+
+    if "maya" not in os.path.basename(sys.executable).lower():
+        return context.Pool(process_count)
+
+    # child processes would start a new maya, use mayapy from the same folder instead
+    mayapy_path = os.path.join(os.path.dirname(sys.executable), "mayapy")
+    if sys.platform == "win32":
+        mayapy_path += ".exe"
+
+    # the executable of a context is shared by the whole session, so it's only changed while the workers start
+    from multiprocessing import spawn
+    previous_executable = spawn.get_executable()
+    context.set_executable(mayapy_path)
+    try:
+        return context.Pool(process_count)
+    finally:
+        context.set_executable(previous_executable)
+
+
+class FileSearch(object):
+    """
+    Searches files in a process pool, results are yielded as soon as a file has been searched.
+
+    cancel() can be called from another thread.
+    """
+
+    def __init__(self, root_dir, query, process_count=None):
+        self.root_dir = root_dir
+        self.query = query
+        self.process_count = process_count
+        self.searched_file_count = 0
+        self.is_cancelled = False
+
+    def iter_results(self):
+        """
+        Yields (json_path, key_paths) for every searched file, key_paths is empty when a file has no matches
+        """
+        pool = create_process_pool(self.process_count)
+        try:
+            tasks = ((json_path, self.query) for json_path in iter_json_files(self.root_dir))
+            # chunksize has to stay 1, larger chunks return a plain generator without next(timeout)
+            results = pool.imap_unordered(_search_file_task, tasks)
+            while not self.is_cancelled:
+                try:
+                    result = results.next(timeout=0.1)  # with a timeout, so cancel() doesn't wait for a slow file
+                except multiprocessing.TimeoutError:
+                    continue
+                except StopIteration:
+                    return
+                self.searched_file_count += 1
+                yield result
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def cancel(self):
+        self.is_cancelled = True
@@ -0,0 +1,90 @@
+"""
+Notices when the open file is changed by another program.
+"""
+import os
+
+from .ui_utils import QtCore
+
+
+def get_file_state(file_path):
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+class FileWatcher(QtCore.QObject):
+    file_changed = QtCore.Signal(str)
+
+    def __init__(self, parent=None, settle_interval=300):
+        """
+        Emits file_changed once a watched file has been written to and the writes have settled
+
+        :param parent: Qt Parent
+        :param settle_interval: milliseconds without changes before file_changed, tools often write in several steps
+        """
+        super(FileWatcher, self).__init__(parent)
+        self.file_path = None
+        self._known_state = None
+
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self.on_path_changed)
+        # a file replaced by a rename (like most save functions do) stops being watched, the folder catches that
+        self._watcher.directoryChanged.connect(self.on_path_changed)
+
+        self._settle_timer = QtCore.QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(settle_interval)
+        self._settle_timer.timeout.connect(self.check_for_change)
+
+    def watch(self, file_path):
+        """Watch file_path instead of the current file, changes of a file that's already watched are ignored"""
+        if file_path and self.file_path == os.path.abspath(file_path):
+            self.ignore_current_state()
+            return
+
+        self.stop()
+        if not file_path or not os.path.exists(file_path):
+            return
+
+        self.file_path = os.path.abspath(file_path)
+        self._known_state = get_file_state(self.file_path)
+        self._watcher.addPath(self.file_path)
+        self._watcher.addPath(os.path.dirname(self.file_path))
+
+    def stop(self):
+        self._settle_timer.stop()
+        watched_paths = self._watcher.files() + self._watcher.directories()
+        if watched_paths:
+            self._watcher.removePaths(watched_paths)
+        self.file_path = None
+        self._known_state = None
+
+    def ignore_current_state(self):
+        """Don't report the file as changed for writes made by this tool, like saving it"""
+        if self.file_path is None:
+            return
+        self._settle_timer.stop()
+        self._known_state = get_file_state(self.file_path)
+        self.ensure_watched()
+
+    def ensure_watched(self):
+        if self.file_path not in self._watcher.files() and os.path.exists(self.file_path):
+            self._watcher.addPath(self.file_path)
+
+    def on_path_changed(self, path):
+        if self.file_path is not None:
+            self._settle_timer.start()
+
+    def check_for_change(self):
+        if self.file_path is None:
+            return
+
+        self.ensure_watched()
+        file_state = get_file_state(self.file_path)
+        if file_state is None or file_state == self._known_state:
+            return  # deleted, or some other file in the folder changed
+
+        self._known_state = file_state
+        self.file_changed.emit(self.file_path)
@@ -0,0 +1,185 @@
+import os
+
+from . import file_search
+from . import json_backends
+from . import ui_utils
+from .ui_utils import QtCore, QtWidgets
+
+
+class LocalConstants:
+    role_json_path = QtCore.Qt.UserRole
+    role_key_path = QtCore.Qt.UserRole + 1  # key path as json text, see FindInFilesWidget.on_result_activated
+
+
+lk = LocalConstants
+
+
+class FileSearchSignals(QtCore.QObject):
+    file_searched = QtCore.Signal(str, object)
+    finished = QtCore.Signal()
+
+
+class FileSearchTask(QtCore.QRunnable):
+    def __init__(self, search):
+        super(FileSearchTask, self).__init__()
+        self.search = search  # type: file_search.FileSearch
+        self.signals = FileSearchSignals()
+
+    def run(self):
+        try:
+            for json_path, key_paths in self.search.iter_results():
+                self.signals.file_searched.emit(json_path, key_paths)
+        except Exception as e:
+            print("Find in files failed: {}".format(e))
+        finally:
+            self.signals.finished.emit()
+
+
+class FindInFilesWidget(QtWidgets.QWidget):
+    match_activated = QtCore.Signal(str, object)  # json path, key path or None for the file itself
+
+    def __init__(self, parent=None):
+        super(FindInFilesWidget, self).__init__(parent)
+
+        self._search = None  # type: file_search.FileSearch
+        self._search_signals = None
+        self._match_count = 0
+
+        self.dir_widget = ui_utils.QtPathWidget(
+            settings_name="JsonTreeFindInFiles",
+            use_directory_dialog=True,
+            recent_paths_amount=20,
+        )
+
+        self.search_line = QtWidgets.QLineEdit()
+        self.search_line.setPlaceholderText("find in files")
+        self.search_line.setClearButtonEnabled(True)
+        self.search_line.returnPressed.connect(self.start_search)
+
+        self.keys_checkbox = QtWidgets.QCheckBox("Keys")
+        self.keys_checkbox.setChecked(True)
+        self.values_checkbox = QtWidgets.QCheckBox("Values")
+        self.values_checkbox.setChecked(True)
+        self.case_checkbox = QtWidgets.QCheckBox("Match Case")
+
+        self.search_button = QtWidgets.QPushButton("Search")
+        self.search_button.clicked.connect(self.on_search_button_clicked)
+
+        self.status_label = QtWidgets.QLabel()
+
+        self.results_tree = QtWidgets.QTreeWidget()
+        self.results_tree.setHeaderHidden(True)
+        self.results_tree.setUniformRowHeights(True)
+        self.results_tree.itemActivated.connect(self.on_result_activated)
+
+        search_layout = QtWidgets.QHBoxLayout()
+        search_layout.setContentsMargins(0, 0, 0, 0)
+        search_layout.addWidget(self.search_line)
+        search_layout.addWidget(self.keys_checkbox)
+        search_layout.addWidget(self.values_checkbox)
+        search_layout.addWidget(self.case_checkbox)
+        search_layout.addWidget(self.search_button)
+
+        main_layout = QtWidgets.QVBoxLayout()
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        main_layout.addWidget(self.dir_widget)
+        main_layout.addLayout(search_layout)
+        main_layout.addWidget(self.status_label)
+        main_layout.addWidget(self.results_tree)
+        self.setLayout(main_layout)
+
+    def is_searching(self):
+        return self._search is not None
+
+    def on_search_button_clicked(self):
+        if self.is_searching():
+            self.cancel_search()
+        else:
+            self.start_search()
+
+    def start_search(self):
+        self.cancel_search()
+
+        root_dir = self.dir_widget.path()
+        text = self.search_line.text()
+        if not text or not os.path.isdir(root_dir):
+            self.status_label.setText("Choose a folder and enter text to find")
+            return
+
+        query = file_search.SearchQuery(
+            text,
+            match_keys=self.keys_checkbox.isChecked(),
+            match_values=self.values_checkbox.isChecked(),
+            case_sensitive=self.case_checkbox.isChecked(),
+        )
+
+        self.results_tree.clear()
+        self._match_count = 0
+        self._search = file_search.FileSearch(root_dir, query)
+
+        task = FileSearchTask(self._search)
+        task.signals.file_searched.connect(self.on_file_searched)
+        task.signals.finished.connect(self.on_search_finished)
+        self._search_signals = task.signals
+        QtCore.QThreadPool.globalInstance().start(task)
+
+        self.search_button.setText("Cancel")
+        self.status_label.setText("Searching...")
+
+    def cancel_search(self):
+        if self._search is None:
+            return
+        self._search.cancel()
+        self.status_label.setText("Cancelled after {} files, {} matches".format(
+            self._search.searched_file_count,
+            self._match_count,
+        ))
+        self.stop_listening()
+
+    def stop_listening(self):
+        """Ignore anything else from the current search, it can still send results while it shuts down"""
+        if self._search_signals is not None:
+            self._search_signals.file_searched.disconnect(self.on_file_searched)
+            self._search_signals.finished.disconnect(self.on_search_finished)
+        self._search = None
+        self._search_signals = None
+        self.search_button.setText("Search")
+
+    def on_file_searched(self, json_path, key_paths):
+        if key_paths:
+            self.add_file_result(json_path, key_paths)
+        self.status_label.setText("Searched {} files, {} matches".format(
+            self._search.searched_file_count,
+            self._match_count,
+        ))
+
+    def on_search_finished(self):
+        self.status_label.setText("Done, searched {} files, {} matches".format(
+            self._search.searched_file_count,
+            self._match_count,
+        ))
+        self.stop_listening()
+
+    def add_file_result(self, json_path, key_paths):
+        file_item = QtWidgets.QTreeWidgetItem(["{} ({})".format(json_path, len(key_paths))])
+        file_item.setData(0, lk.role_json_path, json_path)
+        file_item.setToolTip(0, json_path)
+
+        for key_path in key_paths:
+            match_item = QtWidgets.QTreeWidgetItem([format_key_path(key_path)])
+            match_item.setData(0, lk.role_json_path, json_path)
+            match_item.setData(0, lk.role_key_path, json_backends.dumps(key_path))
+            file_item.addChild(match_item)
+
+        self.results_tree.addTopLevelItem(file_item)
+        self._match_count += len(key_paths)
+
+    def on_result_activated(self, tree_item, column=0):
+        json_path = tree_item.data(0, lk.role_json_path)
+        key_path_text = tree_item.data(0, lk.role_key_path)
+        key_path = json_backends.loads(key_path_text) if key_path_text else None
+        self.match_activated.emit(json_path, key_path)
+
+
+def format_key_path(key_path):
+    return " > ".join("[{}]".format(key) if isinstance(key, int) else key for key in key_path)
@@ -0,0 +1,388 @@
+"""
+Json parse/encode backends.
+
+The fastest installed backend is picked automatically, set the JSON_TREE_BACKEND environment variable to force one.
+Every backend has to give the same result as the stdlib json module (key order, int vs float),
+anything a backend can't handle identically is passed on to the stdlib backend.
+
+With keep_number_text, floats that repr() would write differently (1.10, 1e5, 1e400) are parsed as JsonNumber,
+and written back with the text they were parsed from.
+"""
+import collections
+import gc
+import json
+import os
+import re
+import uuid
+from contextlib import contextmanager
+
+BACKEND_ENV_VAR = "JSON_TREE_BACKEND"
+
+
+@contextmanager
+def paused_gc():
+    """
+    Disable the cyclic garbage collector while creating lots of objects.
+
+    Parsing allocates millions of containers, which triggers a full collection over and over.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+class JsonNumber(float):
+    """Float that keeps the text it was parsed from, see parse_float"""
+    __slots__ = ("text",)
+
+    def __new__(cls, text):
+        number = super(JsonNumber, cls).__new__(cls, text)
+        number.text = text
+        return number
+
+    def __repr__(self):
+        return self.text
+
+    __str__ = __repr__
+
+    def __reduce__(self):
+        return JsonNumber, (self.text,)
+
+
+def parse_float(number_text):
+    """
+    Float for number text from a json file, numbers that repr() writes the same way stay plain floats
+
+    :param number_text: str
+    :return: float or JsonNumber
+    """
+    if (
+        len(number_text) < 16
+        and "e" not in number_text
+        and "E" not in number_text
+        and (number_text[-1] != "0" or number_text[-2] == ".")
+        and not number_text.startswith(("0.0000", "-0.0000"))
+    ):
+        # 14 digits at most, without trailing zeros or an exponent, repr() writes these the same way.
+        # repr() is most of the time this takes, so it's only used for the rest
+        return float(number_text)
+
+    number = float(number_text)
+    if repr(number) == number_text:
+        return number
+    return JsonNumber(number_text)
+
+
+_json_float_text = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+(?:[eE][-+]?[0-9]+)?|[eE][-+]?[0-9]+)\Z")
+
+
+def is_json_float_text(text):
+    """True if text is written the way a float can be in json, with a fraction or exponent"""
+    return _json_float_text.match(text) is not None
+
+
+class StdlibBackend(object):
+    name = "json"
+
+    def is_available(self):
+        return True
+
+    def loads(self, json_text, keep_number_text=False):
+        if isinstance(json_text, bytes) and not isinstance(json_text, str):
+            json_text = json_text.decode("utf-8")
+        return json.loads(
+            json_text,
+            object_pairs_hook=collections.OrderedDict,
+            parse_float=parse_float if keep_number_text else None,
+        )
+
+    def dumps(self, json_data, indent=None):
+        return json.dumps(json_data, indent=indent)
+
+    def dumps_bytes(self, json_data, indent=None):
+        return self.dumps(json_data, indent=indent).encode("utf-8")
+
+
+class OrjsonBackend(object):
+    """
+    orjson is a lot faster, but parses integers above 64 bit as floats and only supports an indent of 2.
+
+    Non-finite floats (NaN, Infinity) aren't valid json, orjson writes them as null where the stdlib writes NaN,
+    so data with nulls in the output is checked for them and written by the stdlib if it has any.
+    orjson writes non-ascii characters as utf-8, they're escaped afterwards like the stdlib does.
+    orjson has no hook for parsing floats, so with keep_number_text documents that might have floats that repr()
+    writes differently go to the stdlib, see has_number_text.
+    """
+    name = "orjson"
+
+    # maps digits to "0", the characters after the digits of a float to "." and everything else to " ",
+    # so digit runs and floats can be found with bytes.find which is a lot faster than a regex search on large documents
+    digit_translation = bytes(bytearray(
+        48 if 48 <= i <= 57 else 46 if i in b".eE" else 32 for i in range(256)
+    ))
+    # integers this long might not fit in 64 bits, the space in front leaves out the digits of fractions and exponents
+    long_number = b" " + b"0" * 19
+
+    # maps 0 to "0", other digits to "1", "." to "." and "eE" to "e", for finding floats that repr() writes differently
+    float_translation = bytes(bytearray(
+        48 if i == 48 else 49 if 49 <= i <= 57 else 46 if i == 46 else 101 if i in b"eE" else 32 for i in range(256)
+    ))
+    float_run_translation = bytes(bytearray(48 if i in b"01." else 32 for i in range(256)))
+    exponents = (b"0e", b"1e")
+    small_float = b" 0.0000"  # repr() writes numbers below 0.0001 with an exponent
+    long_float = b"0" * 16  # digits and the "." of floats with more than 14 digits, these might need 17 digits
+    trailing_zero_regex = re.compile(br"\.[01]+0(?![01])")  # 1.10, but not 1.0
+
+    def __init__(self):
+        self.fallback = StdlibBackend()
+        self._orjson = None
+
+    def is_available(self):
+        try:
+            import orjson
+        except ImportError:
+            return False
+        self._orjson = orjson
+        return True
+
+    def loads(self, json_text, keep_number_text=False):
+        json_bytes = json_text if isinstance(json_text, bytes) else json_text.encode("utf-8")
+        translated_bytes = json_bytes.translate(self.digit_translation)
+        if self.has_long_integer(translated_bytes):
+            return self.fallback.loads(json_text, keep_number_text=keep_number_text)
+        if keep_number_text and self.has_number_text(json_bytes):
+            return self.fallback.loads(json_text, keep_number_text=keep_number_text)
+
+        try:
+            return self._orjson.loads(json_bytes)
+        except ValueError:
+            # NaN, Infinity, lone surrogates, etc. the stdlib decides if it's valid
+            return self.fallback.loads(json_text, keep_number_text=keep_number_text)
+
+    def has_long_integer(self, translated_bytes):
+        """
+        :param translated_bytes: json bytes translated with digit_translation
+        :return: True if there's a run of 19 or more digits that isn't part of a float
+        """
+        if translated_bytes.startswith(self.long_number[1:]):
+            translated_bytes = b" " + translated_bytes  # a document that is only a number
+
+        position = translated_bytes.find(self.long_number)
+        while position != -1:
+            # 12345678901234567890.5 is a float, orjson parses that the same as the stdlib
+            end = _digit_run.match(translated_bytes, position + 1).end()
+            if translated_bytes[end:end + 1] != b".":
+                return True
+            position = translated_bytes.find(self.long_number, end)
+        return False
+
+    def has_number_text(self, json_bytes):
+        """
+        True if json_bytes might have floats that repr() writes differently, which parse_float keeps as JsonNumber.
+        Numbers in strings, like "v1.10", count too.
+
+        Floats with 14 digits or less, without an exponent or trailing zeros, are always written the same by repr(),
+        because no shorter text gives the same float.
+        """
+        translated_bytes = json_bytes.translate(self.float_translation)
+        if translated_bytes.translate(self.float_run_translation).find(self.long_float) != -1:
+            return True
+        for exponent in self.exponents:
+            if translated_bytes.find(exponent) != -1:
+                return True
+        if translated_bytes.find(self.small_float) != -1 or translated_bytes.startswith(self.small_float[1:]):
+            return True
+        return self.trailing_zero_regex.search(translated_bytes) is not None
+
+    def dumps(self, json_data, indent=None):
+        return self.dumps_bytes(json_data, indent=indent).decode("utf-8")
+
+    def dumps_bytes(self, json_data, indent=None):
+        if indent is None:
+            option = 0
+        elif indent == 2:
+            option = self._orjson.OPT_INDENT_2
+        else:
+            return self.fallback.dumps_bytes(json_data, indent=indent)
+
+        try:
+            json_bytes = self._orjson.dumps(json_data, option=option)
+        except TypeError:
+            # integers above 64 bit, non-str keys, lone surrogates
+            return self.fallback.dumps_bytes(json_data, indent=indent)
+
+        if json_bytes.find(b"null") != -1 and has_non_finite_floats(json_data):
+            return self.fallback.dumps_bytes(json_data, indent=indent)
+        if not is_ascii(json_bytes):
+            json_bytes = escape_non_ascii(json_bytes)
+        return json_bytes
+
+
+_digit_run = re.compile(b"0+")
+_non_ascii_bytes = re.compile(b"[\x80-\xff]")
+_non_ascii_characters = re.compile(u"[^\x00-\x7f]")
+_infinity = float("inf")
+
+
+def is_ascii(json_bytes):
+    return _non_ascii_bytes.search(json_bytes) is None
+
+
+def escape_non_ascii(json_bytes):
+    """
+    Write non-ascii characters of utf-8 json as \\u escapes, the same way json.dumps does with ensure_ascii.
+    Non-ascii bytes can only be in strings, so every one of them is escaped.
+    """
+    return _non_ascii_characters.sub(_escape_character, json_bytes.decode("utf-8")).encode("ascii")
+
+
+def _escape_character(match):
+    code = ord(match.group())
+    if code > 0xffff:
+        # surrogate pair
+        code -= 0x10000
+        return "\\u{:04x}\\u{:04x}".format(0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff))
+    return "\\u{:04x}".format(code)
+
+
+def has_non_finite_floats(json_data):
+    """True if json_data has NaN or Infinity values anywhere"""
+    stack = [json_data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, float) and (value != value or value in (_infinity, -_infinity)):
+            return True
+    return False
+
+
+class BackendCache:
+    backends = [OrjsonBackend(), StdlibBackend()]  # order of preference
+    active_backend = None
+
+
+def register_backend(backend, preferred=True):
+    """
+    Add a backend to pick from
+
+    :param backend: object with the same methods as StdlibBackend
+    :param preferred: try this backend before the built in ones
+    :return:
+    """
+    if preferred:
+        BackendCache.backends.insert(0, backend)
+    else:
+        BackendCache.backends.insert(-1, backend)
+    BackendCache.active_backend = None
+
+
+def get_available_backends():
+    return [backend for backend in BackendCache.backends if backend.is_available()]
+
+
+def get_backend(name=None):
+    """
+    Get a backend by name, or the preferred available one
+
+    :param name: backend name, defaults to JSON_TREE_BACKEND or the first available backend
+    :return:
+    """
+    if name is None and BackendCache.active_backend is not None:
+        return BackendCache.active_backend
+
+    requested_name = name or os.environ.get(BACKEND_ENV_VAR)
+    available_backends = get_available_backends()
+
+    backend = available_backends[0]
+    if requested_name:
+        for available_backend in available_backends:
+            if available_backend.name == requested_name:
+                backend = available_backend
+                break
+        else:
+            print('Json backend "{}" is not available, using "{}"'.format(requested_name, backend.name))
+
+    if name is None:
+        BackendCache.active_backend = backend
+    return backend
+
+
+def loads(json_text, keep_number_text=False):
+    """
+    :param json_text: str or bytes
+    :param keep_number_text: parse floats with parse_float, so dumps can write them as they were
+    """
+    with paused_gc():
+        return get_backend().loads(json_text, keep_number_text=keep_number_text)
+
+
+def dumps(json_data, indent=None, keep_number_text=False):
+    return dumps_bytes(json_data, indent=indent, keep_number_text=keep_number_text).decode("utf-8")
+
+
+def dumps_bytes(json_data, indent=None, keep_number_text=False):
+    """
+    :param json_data:
+    :param indent:
+    :param keep_number_text: write JsonNumber values with the text they were parsed from
+    """
+    if not keep_number_text:
+        return get_backend().dumps_bytes(json_data, indent=indent)
+
+    # backends write floats with repr(), so numbers are dumped as placeholder strings and swapped afterwards
+    placeholder_prefix = "json-tree-number-{}-".format(uuid.uuid4().hex)
+    json_data, number_texts = replace_json_numbers(json_data, placeholder_prefix)
+    json_bytes = get_backend().dumps_bytes(json_data, indent=indent)
+    if not number_texts:
+        return json_bytes
+
+    placeholder_pattern = re.compile(b'"' + placeholder_prefix.encode("utf-8") + b'([0-9]+)"')
+    return placeholder_pattern.sub(lambda match: number_texts[int(match.group(1))].encode("utf-8"), json_bytes)
+
+
+def replace_json_numbers(json_data, placeholder_prefix):
+    """
+    Replace JsonNumber values with placeholder strings, containers without numbers are kept instead of copied
+
+    :param json_data:
+    :param placeholder_prefix: prefix of the placeholders, followed by the index of the number text
+    :return: (json_data, list of number texts)
+    """
+    number_texts = []
+
+    def replace_value(value):
+        value_type = type(value)
+        if value_type is JsonNumber:
+            number_texts.append(value.text)
+            return "{}{}".format(placeholder_prefix, len(number_texts) - 1)
+
+        if value_type is dict or value_type is collections.OrderedDict:
+            replaced_value = None
+            for key, child_value in value.items():
+                replaced_child = replace_value(child_value)
+                if replaced_child is not child_value:
+                    if replaced_value is None:
+                        replaced_value = collections.OrderedDict(value)
+                    replaced_value[key] = replaced_child
+            return value if replaced_value is None else replaced_value
+
+        if value_type is list or value_type is tuple:
+            replaced_value = None
+            for i, child_value in enumerate(value):
+                replaced_child = replace_value(child_value)
+                if replaced_child is not child_value:
+                    if replaced_value is None:
+                        replaced_value = list(value)
+                    replaced_value[i] = replaced_child
+            return value if replaced_value is None else replaced_value
+
+        return value
+
+    return replace_value(json_data), number_texts
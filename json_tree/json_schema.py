@@ -0,0 +1,526 @@
+"""
+Validate json data against a JSON Schema.
+
+A schema is compiled once into a SchemaNode per sub-schema, each with a list of check closures for its own value
+and a lookup of the nodes for its children. Validating an edited item only needs the node at its key path,
+so a single item can be checked without going through the whole document, see DataModel.validate_items.
+
+Supported keywords:
+type, enum, const, minimum, maximum, exclusiveMinimum, exclusiveMaximum, multipleOf, minLength, maxLength, pattern,
+properties, patternProperties, additionalProperties, required, minProperties, maxProperties,
+items, prefixItems, additionalItems, minItems, maxItems, uniqueItems, allOf, anyOf, oneOf, not, and local $ref.
+Other keywords (format, dependencies, if/then/else, ...) are ignored.
+"""
+import fractions
+import re
+
+from . import json_backends
+from . import json_tree_system as system
+
+# checks that only use the keys or length of a dict or list, not the child values,
+# these can be checked again when children are added or removed without getting the data of the parent
+CONTAINER_KEYWORDS = ("required", "additionalProperties", "minProperties", "maxProperties", "minItems", "maxItems")
+
+# json type name -> python type name used for DataModelItem.data_type, for converting edited text
+VALUE_TYPE_NAMES = {
+    "null": type(None).__name__,
+    "boolean": bool.__name__,
+    "integer": int.__name__,
+    "number": float.__name__,
+    "string": str.__name__,
+}
+
+
+def get_json_type(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, (list, tuple)):
+        return "array"
+    return type(value).__name__
+
+
+def is_json_type(value, json_type):
+    value_type = get_json_type(value)
+    if value_type == json_type:
+        return True
+    if json_type == "number":
+        return value_type == "integer"
+    if json_type == "integer":
+        return value_type == "number" and value.is_integer()
+    return False
+
+
+def json_equal(a, b):
+    """== that doesn't treat True as 1, like json does"""
+    if isinstance(a, bool) != isinstance(b, bool):
+        return False
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(json_equal(a[key], b[key]) for key in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def format_value(value, max_length=50):
+    value_text = json_backends.dumps(value)
+    if len(value_text) > max_length:
+        value_text = value_text[:max_length] + "..."
+    return value_text
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def is_multiple_of(value, limit):
+    """
+    Compared as the decimal text of the numbers, 0.3 is a multiple of 0.1 even though 0.3 / 0.1 is 2.9999999999999996
+    """
+    if isinstance(value, int) and isinstance(limit, int):
+        return value % limit == 0
+    try:
+        return fractions.Fraction(str(value)) % fractions.Fraction(str(limit)) == 0
+    except (ValueError, OverflowError):
+        return False  # NaN and Infinity
+
+
+def compile_regex(pattern):
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise SchemaError("Invalid pattern {}: {}".format(pattern, e))
+
+
+class SchemaNode(object):
+    """Compiled sub-schema, see JsonSchema.compile_node"""
+
+    def __init__(self):
+        self.checks = []  # (keyword, check function), a check returns an error message or None
+        self.types = None  # allowed json types, None allows all
+        self.properties = {}  # key -> SchemaNode
+        self.pattern_properties = []  # (compiled regex, SchemaNode)
+        self.additional_properties = None  # SchemaNode for keys not in properties, None allows anything
+        self.prefix_items = []  # SchemaNode per list index
+        self.items = None  # SchemaNode for list values after prefix_items
+        self.sub_nodes = []  # nodes from $ref and allOf, their checks and children apply as well
+
+    def get_errors(self, value, keywords=None):
+        """
+        Errors of this value, without going into its children
+
+        :param value:
+        :param keywords: only run checks for these keywords
+        :return: list of (keyword, message)
+        """
+        errors = []
+        for keyword, check in self.checks:
+            if keywords is not None and keyword not in keywords:
+                continue
+            message = check(value)
+            if message is not None:
+                errors.append((keyword, message))
+
+        for sub_node in self.sub_nodes:
+            errors.extend(sub_node.get_errors(value, keywords))
+        return errors
+
+    def get_child_nodes(self, key):
+        """
+        Nodes that apply to the child at key, a dict key or list index
+
+        :return: list of SchemaNode
+        """
+        child_nodes = []
+        if isinstance(key, int):
+            if key < len(self.prefix_items):
+                child_nodes.append(self.prefix_items[key])
+            elif self.items is not None:
+                child_nodes.append(self.items)
+        else:
+            child_node = self.properties.get(key)
+            if child_node is not None:
+                child_nodes.append(child_node)
+            for regex, pattern_node in self.pattern_properties:
+                if regex.search(key):
+                    child_nodes.append(pattern_node)
+            if not child_nodes and self.additional_properties is not None:
+                child_nodes.append(self.additional_properties)
+
+        for sub_node in self.sub_nodes:
+            child_nodes.extend(sub_node.get_child_nodes(key))
+        return child_nodes
+
+    def get_types(self):
+        """Allowed json types, including those of $ref and allOf, or None if any type is allowed"""
+        types = self.types
+        for sub_node in self.sub_nodes:
+            sub_types = sub_node.get_types()
+            if sub_types is not None:
+                types = sub_types if types is None else [t for t in types if t in sub_types]
+        return types
+
+
+class JsonSchema(object):
+    def __init__(self, schema, schema_path=""):
+        """
+        :param schema: parsed schema, dict or bool
+        :param schema_path: file the schema was loaded from, for display
+        """
+        self.schema = schema
+        self.schema_path = schema_path
+        self._compiled_nodes = {}  # id of schema dict -> SchemaNode, so shared and recursive $refs compile once
+        self.root_node = self.compile_node(schema)
+
+    ##########################################################################################
+    # Validation
+
+    def get_nodes(self, key_path):
+        """Nodes for the value at key_path, an empty list if nothing is known about it"""
+        nodes = [self.root_node]
+        for key in key_path:
+            child_nodes = []
+            for node in nodes:
+                child_nodes.extend(node.get_child_nodes(key))
+            nodes = child_nodes
+            if not nodes:
+                break
+        return nodes
+
+    def get_errors(self, value, key_path=(), keywords=None):
+        """Errors of the value at key_path, without going into its children"""
+        errors = []
+        for node in self.get_nodes(key_path):
+            errors.extend(node.get_errors(value, keywords))
+        return errors
+
+    def iter_errors(self, value, key_path=()):
+        """
+        Validate value and all its children
+
+        :param value: data at key_path
+        :param key_path: dict keys and list indices from the root of the document to value
+        :return: generator of (key_path, keyword, message), key_path is a tuple
+        """
+        return iter_node_errors(self.get_nodes(key_path), value, key_path)
+
+    def validate(self, value):
+        """:return: list of (key_path, keyword, message)"""
+        return list(self.iter_errors(value))
+
+    def is_valid(self, value):
+        return is_node_valid(self.root_node, value)
+
+    def get_value_type_names(self, key_path, data_type):
+        """
+        Types edited text should be converted to, so a number typed into a field the schema says is a number
+        becomes a number even if the field currently holds a string
+
+        :param key_path:
+        :param data_type: current type name of the value
+        :return: python type names to try in order, or None if the schema doesn't say
+        """
+        types = None
+        for node in self.get_nodes(key_path):
+            node_types = node.get_types()
+            if node_types is not None:
+                types = node_types if types is None else [t for t in types if t in node_types]
+        if not types:
+            return None
+
+        value_type_names = []
+        for json_type in types:
+            if json_type == "number":
+                value_type_names.append(int.__name__)  # keep whole numbers as ints
+            if json_type in VALUE_TYPE_NAMES:
+                value_type_names.append(VALUE_TYPE_NAMES[json_type])
+
+        if data_type in value_type_names:
+            value_type_names.remove(data_type)
+            value_type_names.insert(0, data_type)
+        return value_type_names or None
+
+    ##########################################################################################
+    # Compiling
+
+    def resolve_ref(self, ref):
+        if not ref.startswith("#"):
+            raise SchemaError("Only local $ref is supported: {}".format(ref))
+
+        target = self.schema
+        for part in ref[1:].split("/")[1:]:
+            part = part.replace("~1", "/").replace("~0", "~")
+            try:
+                target = target[int(part)] if isinstance(target, list) else target[part]
+            except (KeyError, IndexError, ValueError, TypeError):
+                raise SchemaError("Can't resolve $ref: {}".format(ref))
+        return target
+
+    def compile_node(self, schema):
+        node = self._compiled_nodes.get(id(schema))
+        if node is not None:
+            return node
+
+        node = SchemaNode()
+        self._compiled_nodes[id(schema)] = node
+
+        if schema is True:
+            return node
+        if schema is False:
+            node.checks.append(("false", lambda value: "No value is allowed here"))
+            return node
+        if not isinstance(schema, dict):
+            raise SchemaError("Schema must be an object or a bool, not: {}".format(format_value(schema)))
+
+        if "$ref" in schema:
+            node.sub_nodes.append(self.compile_node(self.resolve_ref(schema["$ref"])))
+        for sub_schema in schema.get("allOf", []):
+            node.sub_nodes.append(self.compile_node(sub_schema))
+
+        self.compile_value_checks(node, schema)
+        self.compile_object_checks(node, schema)
+        self.compile_array_checks(node, schema)
+        self.compile_combined_checks(node, schema)
+        return node
+
+    def compile_value_checks(self, node, schema):
+        checks = node.checks
+
+        if "type" in schema:
+            types = schema["type"]
+            node.types = [types] if isinstance(types, str) else list(types)
+            types_text = " or ".join(node.types)
+
+            def check_type(value):
+                if not any(is_json_type(value, t) for t in node.types):
+                    return "Expected {}, got {}".format(types_text, get_json_type(value))
+            checks.append(("type", check_type))
+
+        if "enum" in schema:
+            enum = schema["enum"]
+
+            def check_enum(value):
+                if not any(json_equal(value, option) for option in enum):
+                    return "Must be one of: {}".format(", ".join(format_value(option) for option in enum))
+            checks.append(("enum", check_enum))
+
+        if "const" in schema:
+            const = schema["const"]
+
+            def check_const(value):
+                if not json_equal(value, const):
+                    return "Must be {}".format(format_value(const))
+            checks.append(("const", check_const))
+
+        number_limits = [
+            ("minimum", lambda value, limit: value >= limit, "Must be at least {}"),
+            ("maximum", lambda value, limit: value <= limit, "Must be at most {}"),
+            ("exclusiveMinimum", lambda value, limit: value > limit, "Must be more than {}"),
+            ("exclusiveMaximum", lambda value, limit: value < limit, "Must be less than {}"),
+            ("multipleOf", is_multiple_of, "Must be a multiple of {}"),
+        ]
+        for keyword, is_within_limit, message in number_limits:
+            limit = schema.get(keyword)
+            if isinstance(limit, bool) or not isinstance(limit, (int, float)):
+                continue  # draft 4 boolean exclusiveMinimum/Maximum aren't supported
+            if keyword == "multipleOf" and not limit > 0:
+                raise SchemaError("multipleOf must be more than 0, not: {}".format(format_value(limit)))
+            checks.append((keyword, self.create_limit_check(
+                limit, is_within_limit, message, lambda value: is_json_type(value, "number"), lambda value: value,
+            )))
+
+        for keyword, is_within_limit, message in [
+            ("minLength", lambda length, limit: length >= limit, "Must be at least {} characters"),
+            ("maxLength", lambda length, limit: length <= limit, "Must be at most {} characters"),
+        ]:
+            if keyword in schema:
+                checks.append((keyword, self.create_limit_check(
+                    schema[keyword], is_within_limit, message, lambda value: isinstance(value, str), len,
+                )))
+
+        if "pattern" in schema:
+            pattern = schema["pattern"]
+            regex = compile_regex(pattern)
+
+            def check_pattern(value):
+                if isinstance(value, str) and not regex.search(value):
+                    return "Must match pattern: {}".format(pattern)
+            checks.append(("pattern", check_pattern))
+
+    def compile_object_checks(self, node, schema):
+        checks = node.checks
+
+        for key, property_schema in schema.get("properties", {}).items():
+            node.properties[key] = self.compile_node(property_schema)
+        for pattern, property_schema in schema.get("patternProperties", {}).items():
+            node.pattern_properties.append((compile_regex(pattern), self.compile_node(property_schema)))
+
+        additional_properties = schema.get("additionalProperties", True)
+        if additional_properties is False:
+            properties = node.properties
+            pattern_properties = node.pattern_properties
+
+            def check_additional_properties(value):
+                if not isinstance(value, dict):
+                    return None
+                extra_keys = [
+                    key for key in value
+                    if key not in properties and not any(regex.search(key) for regex, _ in pattern_properties)
+                ]
+                if extra_keys:
+                    return "Keys are not allowed: {}".format(", ".join(extra_keys))
+            checks.append(("additionalProperties", check_additional_properties))
+        elif additional_properties is not True:
+            node.additional_properties = self.compile_node(additional_properties)
+
+        if schema.get("required"):
+            required = schema["required"]
+
+            def check_required(value):
+                if not isinstance(value, dict):
+                    return None
+                missing_keys = [key for key in required if key not in value]
+                if missing_keys:
+                    return "Missing required keys: {}".format(", ".join(missing_keys))
+            checks.append(("required", check_required))
+
+        for keyword, is_within_limit, message in [
+            ("minProperties", lambda length, limit: length >= limit, "Must have at least {} keys"),
+            ("maxProperties", lambda length, limit: length <= limit, "Must have at most {} keys"),
+        ]:
+            if keyword in schema:
+                checks.append((keyword, self.create_limit_check(
+                    schema[keyword], is_within_limit, message, lambda value: isinstance(value, dict), len,
+                )))
+
+    def compile_array_checks(self, node, schema):
+        checks = node.checks
+
+        items = schema.get("items")
+        if isinstance(items, list):
+            # tuple validation before draft 2020-12, additionalItems applies to the rest
+            node.prefix_items = [self.compile_node(item_schema) for item_schema in items]
+            items = schema.get("additionalItems")
+        elif "prefixItems" in schema:
+            node.prefix_items = [self.compile_node(item_schema) for item_schema in schema["prefixItems"]]
+        if items is not None and items is not True:
+            node.items = self.compile_node(items)
+
+        for keyword, is_within_limit, message in [
+            ("minItems", lambda length, limit: length >= limit, "Must have at least {} items"),
+            ("maxItems", lambda length, limit: length <= limit, "Must have at most {} items"),
+        ]:
+            if keyword in schema:
+                checks.append((keyword, self.create_limit_check(
+                    schema[keyword], is_within_limit, message, lambda value: isinstance(value, (list, tuple)), len,
+                )))
+
+        if schema.get("uniqueItems"):
+            def check_unique_items(value):
+                if not isinstance(value, (list, tuple)):
+                    return None
+                seen = set()
+                for item_value in value:
+                    hashable_value = get_hashable_value(item_value)
+                    if hashable_value in seen:
+                        return "Items must be unique, {} is in the list more than once".format(format_value(item_value))
+                    seen.add(hashable_value)
+            checks.append(("uniqueItems", check_unique_items))
+
+    def compile_combined_checks(self, node, schema):
+        checks = node.checks
+
+        if "anyOf" in schema:
+            any_of = [self.compile_node(sub_schema) for sub_schema in schema["anyOf"]]
+
+            def check_any_of(value):
+                if not any(is_node_valid(sub_schema, value) for sub_schema in any_of):
+                    return "Doesn't match any of the allowed schemas"
+            checks.append(("anyOf", check_any_of))
+
+        if "oneOf" in schema:
+            one_of = [self.compile_node(sub_schema) for sub_schema in schema["oneOf"]]
+
+            def check_one_of(value):
+                match_count = sum(1 for sub_schema in one_of if is_node_valid(sub_schema, value))
+                if match_count != 1:
+                    return "Must match exactly one of the allowed schemas, matches {}".format(match_count)
+            checks.append(("oneOf", check_one_of))
+
+        if "not" in schema:
+            not_schema = self.compile_node(schema["not"])
+
+            def check_not(value):
+                if is_node_valid(not_schema, value):
+                    return "Matches a schema that isn't allowed"
+            checks.append(("not", check_not))
+
+    @staticmethod
+    def create_limit_check(limit, is_within_limit, message, applies_to, get_amount):
+        def check_limit(value):
+            if applies_to(value) and not is_within_limit(get_amount(value), limit):
+                return message.format(limit)
+        return check_limit
+
+
+def iter_node_errors(nodes, value, key_path=()):
+    """
+    Validate value and all its children against compiled nodes
+
+    :return: generator of (key_path, keyword, message)
+    """
+    stack = [(tuple(key_path), value, nodes)]
+    while stack:
+        value_key_path, value, nodes = stack.pop()
+        for node in nodes:
+            for keyword, message in node.get_errors(value):
+                yield value_key_path, keyword, message
+
+        if isinstance(value, dict):
+            children = value.items()
+        elif isinstance(value, (list, tuple)):
+            children = enumerate(value)
+        else:
+            continue
+
+        for key, child_value in children:
+            child_nodes = []
+            for node in nodes:
+                child_nodes.extend(node.get_child_nodes(key))
+            if child_nodes:
+                stack.append((value_key_path + (key,), child_value, child_nodes))
+
+
+def is_node_valid(node, value):
+    for _ in iter_node_errors([node], value):
+        return False
+    return True
+
+
+def get_hashable_value(value):
+    """Value that compares and hashes the way json values are equal, for uniqueItems"""
+    if isinstance(value, dict):
+        return "object", frozenset((key, get_hashable_value(child)) for key, child in value.items())
+    if isinstance(value, (list, tuple)):
+        return "array", tuple(get_hashable_value(child) for child in value)
+    return get_json_type(value) if isinstance(value, (bool, str)) or value is None else "number", value
+
+
+def load_schema(schema_path):
+    """
+    :param schema_path: schema json file
+    :return: JsonSchema
+    """
+    schema = system.load_json(schema_path)
+    if schema is None:
+        raise SchemaError("Can't load schema: {}".format(schema_path))
+    return JsonSchema(schema, schema_path=schema_path)
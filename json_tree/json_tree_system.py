@@ -1,17 +1,563 @@
-import collections
-import json
+import bz2
+import gzip
 import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from . import json_backends
+
+NDJSON_EXTENSIONS = (".jsonl", ".ndjson")
+
+COMPRESSION_EXTENSIONS = OrderedDict([
+    (".gz", "gzip"),
+    (".bz2", "bz2"),
+    (".xz", "lzma"),
+    (".lzma", "lzma"),
+    (".zst", "zstd"),
+])
+DEFAULT_COMPRESSION_LEVELS = {
+    "gzip": 6,
+    "bz2": 9,
+    "lzma": 6,
+    "zstd": 3,
+}
+
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+READ_AHEAD_CHUNKS = 4  # decompressed chunks buffered by the reader thread
 
 
 def load_json(json_path):
     if not os.path.exists(json_path):
         return
 
-    with open(json_path, "r") as fp:
-        json_data = json.load(fp, object_pairs_hook=collections.OrderedDict)
+    if is_ndjson_path(json_path):
+        with json_backends.paused_gc():
+            return list(iter_ndjson_records(iter_file_chunks(json_path)))
+
+    if get_compression(json_path) is not None:
+        return json_backends.loads(b"".join(iter_file_chunks(json_path)), keep_number_text=True)
+
+    with open(json_path, "rb") as fp:
+        json_data = json_backends.loads(fp.read(), keep_number_text=True)
     return json_data
 
 
-def save_json(json_data, json_path):
-    with open(json_path, "w+") as fp:
-        json.dump(json_data, fp, indent=2)
+def load_json_source(json_path):
+    """
+    Load a json file along with its text, for saving it with its formatting, see JsonSource
+
+    :param json_path:
+    :return: (json_data, JsonSource), or (None, None) if the file doesn't exist
+    """
+    if not os.path.exists(json_path):
+        return None, None
+
+    json_bytes = b"".join(iter_file_chunks(json_path))
+    json_data = json_backends.loads(json_bytes, keep_number_text=True)
+    return json_data, JsonSource(json_bytes)
+
+
+def save_json(json_data, json_path, compression_level=None):
+    if is_ndjson_path(json_path):
+        save_ndjson(json_data, json_path, compression_level=compression_level)
+        return
+
+    json_bytes = json_backends.dumps_bytes(json_data, indent=2, keep_number_text=True)
+    if os.linesep != "\n":
+        json_bytes = json_bytes.replace(b"\n", os.linesep.encode())  # same line endings as a text mode write
+
+    write_json_bytes(json_bytes, json_path, compression_level=compression_level)
+
+
+def write_json_bytes(json_bytes, json_path, compression_level=None):
+    with open_json_file(json_path, "wb", compression_level=compression_level) as fp:
+        fp.write(json_bytes)
+
+
+def is_ndjson_path(json_path):
+    return strip_compression_extension(json_path).lower().endswith(NDJSON_EXTENSIONS)
+
+
+def save_ndjson(records, json_path, compression_level=None):
+    with open_json_file(json_path, "wb", compression_level=compression_level) as fp:
+        # small writes are slow on compressed files, so records are written in batches
+        batch = []
+        batch_size = 0
+        for record in records:
+            record_bytes = json_backends.dumps_bytes(record, keep_number_text=True)
+            batch.append(record_bytes)
+            batch_size += len(record_bytes)
+            if batch_size > READ_CHUNK_SIZE:
+                batch.append(b"")
+                fp.write(b"\n".join(batch))
+                batch = []
+                batch_size = 0
+
+        if batch:
+            batch.append(b"")
+            fp.write(b"\n".join(batch))
+
+
+def iter_ndjson_records(chunks):
+    """Parse records from an iterable of byte chunks, records can span chunks"""
+    leftover = b""
+    for chunk in chunks:
+        lines = (leftover + chunk).split(b"\n")
+        leftover = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield json_backends.get_backend().loads(line, keep_number_text=True)
+
+    if leftover.strip():
+        yield json_backends.get_backend().loads(leftover, keep_number_text=True)
+
+
+###################################################
+# Compression
+
+def get_compression(json_path):
+    lower_path = json_path.lower()
+    for extension, compression in COMPRESSION_EXTENSIONS.items():
+        if lower_path.endswith(extension):
+            return compression
+    return None
+
+
+def strip_compression_extension(json_path):
+    lower_path = json_path.lower()
+    for extension in COMPRESSION_EXTENSIONS.keys():
+        if lower_path.endswith(extension):
+            return json_path[:-len(extension)]
+    return json_path
+
+
+def is_compression_available(compression):
+    if compression == "lzma":
+        return lzma is not None
+    if compression == "zstd":
+        return zstandard is not None
+    return True
+
+
+def get_file_filter():
+    """File dialog filter for every readable json file"""
+    patterns = ["*.json", "*.jsonl", "*.ndjson"]
+    for extension, compression in COMPRESSION_EXTENSIONS.items():
+        if is_compression_available(compression):
+            patterns.append("*.json{}".format(extension))
+            patterns.append("*.jsonl{}".format(extension))
+    return "JSON ({})".format(" ".join(patterns))
+
+
+def open_json_file(json_path, mode="rb", compression_level=None):
+    """
+    Open a file in binary mode, compressed files are decompressed/compressed based on the file extension
+
+    :param json_path:
+    :param mode: "rb" or "wb"
+    :param compression_level: only used when writing, defaults to DEFAULT_COMPRESSION_LEVELS
+    :return: file object
+    """
+    compression = get_compression(json_path)
+    if compression is None:
+        return open(json_path, mode)
+
+    if not is_compression_available(compression):
+        raise IOError('"{}" compression is not available, can\'t open: {}'.format(compression, json_path))
+
+    if compression_level is None:
+        compression_level = DEFAULT_COMPRESSION_LEVELS[compression]
+    is_writing = "w" in mode
+
+    if compression == "gzip":
+        if is_writing:
+            return gzip.open(json_path, mode, compresslevel=compression_level)
+        return gzip.open(json_path, mode)
+
+    if compression == "bz2":
+        if is_writing:
+            return bz2.BZ2File(json_path, mode, compresslevel=compression_level)
+        return bz2.BZ2File(json_path, mode)
+
+    if compression == "lzma":
+        if is_writing:
+            return lzma.open(json_path, mode, preset=compression_level)
+        return lzma.open(json_path, mode)
+
+    if is_writing:
+        return zstandard.ZstdCompressor(level=compression_level).stream_writer(open(json_path, mode))
+    return zstandard.ZstdDecompressor().stream_reader(open(json_path, mode))
+
+
+def iter_file_chunks(json_path, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yield the decompressed content of a file in chunks.
+
+    Compressed files are read and decompressed on a separate thread, a few chunks ahead of the caller,
+    so the caller's parsing overlaps with decompression (zlib, bz2 and lzma release the GIL).
+    """
+    if get_compression(json_path) is None:
+        with open(json_path, "rb") as fp:
+            while True:
+                chunk = fp.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    chunk_queue = queue.Queue(maxsize=READ_AHEAD_CHUNKS)
+    stop_event = threading.Event()
+
+    def put_chunk(chunk):
+        while not stop_event.is_set():
+            try:
+                chunk_queue.put(chunk, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_chunks():
+        try:
+            with open_json_file(json_path, "rb") as fp:
+                while True:
+                    chunk = fp.read(chunk_size)
+                    if not put_chunk(chunk) or not chunk:
+                        return
+        except Exception as e:
+            put_chunk(e)
+
+    reader_thread = threading.Thread(target=read_chunks, name="json_tree_decompress")
+    reader_thread.daemon = True
+    reader_thread.start()
+
+    try:
+        while True:
+            chunk = chunk_queue.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        stop_event.set()  # in case the caller stopped early
+
+
+def replace_file(source_path, target_path):
+    if hasattr(os, "replace"):
+        os.replace(source_path, target_path)
+        return
+
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    os.rename(source_path, target_path)
+
+
+class NdjsonFile(object):
+    """
+    Newline delimited json file, with a byte offset index of its records.
+
+    Records are only read and parsed when asked for.
+    """
+
+    record_regex = re.compile(br"\S[^\n]*")  # skips blank lines and leading whitespace
+    index_chunk_size = 16 * 1024 * 1024
+    copy_chunk_size = 4 * 1024 * 1024
+
+    def __init__(self, json_path):
+        self.json_path = json_path
+        self.record_starts = array("q")
+        self.record_ends = array("q")  # exclusive, before the newline
+        self.file_size = 0
+        self._read_fp = None
+        self.build_index()
+
+    def __len__(self):
+        return len(self.record_starts)
+
+    def build_index(self):
+        self.close()
+        record_starts = array("q")
+        record_ends = array("q")
+
+        chunk_offset = 0
+        leftover = b""
+        with open(self.json_path, "rb") as fp:
+            while True:
+                data = fp.read(self.index_chunk_size)
+                chunk = leftover + data
+
+                if data:
+                    # only scan complete lines, the rest is carried over to the next chunk
+                    scan_end = chunk.rfind(b"\n") + 1
+                else:
+                    scan_end = len(chunk)
+
+                for match in self.record_regex.finditer(chunk, 0, scan_end):
+                    record_starts.append(chunk_offset + match.start())
+                    record_ends.append(chunk_offset + match.end())
+
+                if not data:
+                    break
+
+                leftover = chunk[scan_end:]
+                chunk_offset += scan_end
+
+        self.record_starts = record_starts
+        self.record_ends = record_ends
+        self.file_size = os.path.getsize(self.json_path)
+
+    def get_record_size(self, record_index):
+        return self.record_ends[record_index] - self.record_starts[record_index]
+
+    def read_record_bytes(self, record_index, max_bytes=None):
+        start = self.record_starts[record_index]
+        end = self.record_ends[record_index]
+        if max_bytes is not None:
+            end = min(end, start + max_bytes)
+
+        if self._read_fp is None:
+            self._read_fp = open(self.json_path, "rb")
+        self._read_fp.seek(start)
+        return self._read_fp.read(end - start).rstrip(b"\r")
+
+    def close(self):
+        if self._read_fp is not None:
+            self._read_fp.close()
+            self._read_fp = None
+
+    def load_record(self, record_index):
+        return json_backends.loads(self.read_record_bytes(record_index), keep_number_text=True)
+
+    def save(self, records, json_path=None):
+        """
+        Write records, copying unchanged ones straight from the source file.
+
+        :param records: iterable of (record_index, record_data),
+            record_index is the source record to copy, or None to write record_data
+        :param json_path: defaults to the source path, the file is replaced once everything is written
+        :return:
+        """
+        if json_path is None:
+            json_path = self.json_path
+        temp_path = json_path + ".tmp"
+
+        record_starts = array("q")
+        record_ends = array("q")
+        position = 0
+
+        copy_span = [None, None]  # pending contiguous byte range of the source file
+
+        with open(self.json_path, "rb") as source_fp, open(temp_path, "wb") as fp:
+
+            def flush_copy_span():
+                if copy_span[0] is None:
+                    return
+                source_fp.seek(copy_span[0])
+                remaining = copy_span[1] - copy_span[0]
+                while remaining > 0:
+                    chunk = source_fp.read(min(self.copy_chunk_size, remaining))
+                    if not chunk:
+                        fp.write(b"\n")  # last record of the source file had no trailing newline
+                        break
+                    fp.write(chunk)
+                    remaining -= len(chunk)
+                copy_span[0] = copy_span[1] = None
+
+            for record_index, record_data in records:
+                if record_index is None:
+                    flush_copy_span()
+                    record_bytes = json_backends.dumps_bytes(record_data, keep_number_text=True)
+                    fp.write(record_bytes)
+                    fp.write(b"\n")
+                    record_length = len(record_bytes)
+                else:
+                    start = self.record_starts[record_index]
+                    end = self.record_ends[record_index]
+                    if copy_span[1] != start:
+                        flush_copy_span()
+                        copy_span[0] = start
+                    copy_span[1] = end + 1  # including the newline
+                    record_length = end - start
+
+                record_starts.append(position)
+                record_ends.append(position + record_length)
+                position += record_length + 1
+
+            flush_copy_span()
+
+        self.close()
+        replace_file(temp_path, json_path)
+
+        self.json_path = json_path
+        self.record_starts = record_starts
+        self.record_ends = record_ends
+        self.file_size = position
+
+
+class JsonSource(object):
+    """
+    Text of a json file with the byte offsets of every value, for saving the file with its formatting.
+
+    Values are numbered in depth first order, the same order as the items of the parsed data.
+    Saving copies the text of unedited values, see data_tree_model.get_source_json_bytes
+    """
+
+    token_regex = re.compile(br'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}:,]|[^\s\[\]{}:,"]+')
+    separator_regex = re.compile(br"\s*,\s*")
+    key_regex = re.compile(br'"[^"\\]*(?:\\.[^"\\]*)*"')
+
+    def __init__(self, json_bytes):
+        self.json_bytes = json_bytes
+        self.member_starts = array("q")  # start of the key for values in an object, otherwise the value start
+        self.value_starts = array("q")
+        self.value_ends = array("q")  # exclusive
+        self.build_index()
+
+        # formatting for new values, taken from the first objects and arrays with children
+        self.newline = b"\r\n" if b"\r\n" in json_bytes[:self.value_ends[0] if len(self) else 0] else b"\n"
+        self.is_indented = True  # one child per line
+        self.indent = b"  "
+        self.item_separator = b", "  # between children on the same line
+        self.key_separator = b": "
+        self.find_formatting()
+
+    def __len__(self):
+        return len(self.value_starts)
+
+    def build_index(self):
+        json_bytes = self.json_bytes
+        member_starts = self.member_starts
+        value_starts = self.value_starts
+        value_ends = self.value_ends
+
+        open_values = []  # index of the objects and arrays the current value is in
+        open_objects = []  # True for the open values that are objects
+        in_object = False
+        expect_key = False
+        key_start = 0
+        for match in self.token_regex.finditer(json_bytes):
+            start = match.start()
+            first_byte = json_bytes[start:start + 1]
+
+            if first_byte == b"," or first_byte == b":":
+                expect_key = in_object and first_byte == b","
+                continue
+            if first_byte == b"}" or first_byte == b"]":
+                value_ends[open_values.pop()] = match.end()
+                open_objects.pop()
+                in_object = open_objects[-1] if open_objects else False
+                expect_key = False
+                continue
+            if expect_key:
+                key_start = start
+                continue
+
+            member_starts.append(key_start if in_object else start)
+            value_starts.append(start)
+            value_ends.append(match.end())
+            if first_byte == b"{" or first_byte == b"[":
+                open_values.append(len(value_starts) - 1)
+                in_object = first_byte == b"{"
+                open_objects.append(in_object)
+                expect_key = in_object
+
+        if open_values:
+            raise ValueError("Unclosed object or array at byte {}".format(value_starts[open_values[-1]]))
+
+    def find_formatting(self):
+        found_indent = found_key_separator = found_item_separator = False
+        for i in range(len(self) - 1):
+            if not self.is_container(i) or self.is_empty(i):
+                continue
+
+            opening, separator, closing = self.get_layout(i)
+            if not found_indent:
+                found_indent = True
+                self.is_indented = b"\n" in opening
+                if self.is_indented:
+                    self.indent = opening[opening.rfind(b"\n") + 1:] or self.indent
+            if not found_key_separator and self.has_key(i + 1):
+                found_key_separator = True
+                self.key_separator = self.get_key_separator(i + 1)
+            if not found_item_separator and separator is not None and b"\n" not in separator:
+                found_item_separator = True
+                self.item_separator = separator
+
+            if found_indent and found_key_separator and (found_item_separator or self.is_indented):
+                return
+
+    def get_value_bytes(self, index):
+        return self.json_bytes[self.value_starts[index]:self.value_ends[index]]
+
+    def get_member_bytes(self, index):
+        return self.json_bytes[self.member_starts[index]:self.value_ends[index]]
+
+    def get_first_byte(self, index):
+        start = self.value_starts[index]
+        return self.json_bytes[start:start + 1]
+
+    def is_container(self, index):
+        return self.get_first_byte(index) in (b"{", b"[")
+
+    def is_empty(self, index):
+        """True for an object or array without children"""
+        return index + 1 >= len(self) or self.value_starts[index + 1] >= self.value_ends[index]
+
+    def has_key(self, index):
+        return self.member_starts[index] != self.value_starts[index]
+
+    def get_key(self, index):
+        key_match = self.key_regex.match(self.json_bytes, self.member_starts[index])
+        return json_backends.loads(key_match.group(0))
+
+    def get_key_separator(self, index):
+        """Text between the key and the value, like b": " """
+        key_match = self.key_regex.match(self.json_bytes, self.member_starts[index])
+        return self.json_bytes[key_match.end():self.value_starts[index]]
+
+    def get_separator_end(self, index):
+        """End of the comma and whitespace after value index, or -1 if it's the last value of its parent"""
+        separator_match = self.separator_regex.match(self.json_bytes, self.value_ends[index])
+        return separator_match.end() if separator_match else -1
+
+    def get_layout(self, index):
+        """
+        Whitespace of an object or array
+
+        :param index: index of the object or array
+        :return: (text after the opening bracket, text between the first two children, text before the closing bracket)
+            the text between children is None if there's only one
+        """
+        json_bytes = self.json_bytes
+        start = self.value_starts[index] + 1
+        end = self.value_ends[index] - 1
+        if self.is_empty(index):
+            return json_bytes[start:end], None, b""
+
+        first_child_start = self.member_starts[index + 1]
+        closing_start = end
+        while closing_start > first_child_start and json_bytes[closing_start - 1:closing_start].isspace():
+            closing_start -= 1
+
+        separator = None
+        separator_end = self.get_separator_end(index + 1)
+        if separator_end != -1 and separator_end <= closing_start:
+            separator = json_bytes[self.value_ends[index + 1]:separator_end]
+        return json_bytes[start:first_child_start], separator, json_bytes[closing_start:end]
@@ -1,27 +1,133 @@
+import marshal
 import os.path
 import sys
+import time
+from collections import OrderedDict
+from functools import partial
 
-from . import batch_widget
 from . import data_tree
 from . import json_tree_system as system
 from . import ui_utils
-from .ui_utils import QtWidgets, QtGui
-
-# if running in standalone, create app
-EXISTING_QAPP = QtWidgets.QApplication.instance()
-STANDALONE_QAPP = None if EXISTING_QAPP else QtWidgets.QApplication(sys.argv)
-
-EXAMPLE_JSON_PATH = os.path.join(os.path.dirname(__file__), "resources", "example_json_data.json")
+from .ui_utils import QtCore, QtWidgets, QtGui
+
+
+class LocalConstants:
+    settings_key_compression_level = "compression_level"
+    compression_level_default = "Default"
+    compression_level_choices = [compression_level_default] + [str(i) for i in range(1, 10)]
+
+    settings_key_memory_budget = "memory_budget_mb"
+    memory_budget_unlimited = "Unlimited"
+    memory_budget_default = "2048"
+    memory_budget_choices = ["256", "512", "1024", "2048", "4096", "8192", memory_budget_unlimited]
+    estimated_item_size = 500  # bytes per DataModelItem, including its attribute dict, key and value
+
+    settings_key_show_stats = "show_stats"
+    settings_key_preserve_formatting = "preserve_formatting"
+
+
+lk = LocalConstants
+
+
+class JsonDocument(object):
+    """
+    File open in a tab of JsonTreeWidget.
+
+    Items of a document in an inactive tab can be unloaded to save memory,
+    see JsonTreeWidget.enforce_memory_budget
+    """
+
+    def __init__(self, tree_widget, json_path=""):
+        self.tree_widget = tree_widget  # type: data_tree.DataTreeWidget
+        self.json_path = json_path
+        self.file_state = None  # file modification time and size when it was loaded or saved
+        self.is_loaded = True
+        self.packed_tree = None  # marshal dump of pack_item_tree, for unloaded documents with unsaved changes
+        self.last_active_time = 0.0
+        self._item_count = None
+
+    def is_modified(self):
+        if not self.is_loaded:
+            return self.packed_tree is not None
+        return self.tree_widget.tree_model.root_item.is_modified
+
+    def get_title(self):
+        return os.path.basename(self.json_path) if self.json_path else "Untitled"
+
+    def on_loaded(self, json_path):
+        from . import file_watcher
+        self.json_path = json_path
+        self.file_state = file_watcher.get_file_state(json_path)
+        self.is_loaded = True
+        self.packed_tree = None
+        self._item_count = None
+
+    def get_memory_estimate(self):
+        """Rough size in bytes of the document's items, or of the packed tree if it's unloaded"""
+        if not self.is_loaded:
+            return len(self.packed_tree) if self.packed_tree is not None else 0
+
+        if self._item_count is None:
+            item_count = data_tree.data_tree_model.count_items(self.tree_widget.tree_model.root_item)
+            if self.tree_widget.tree_model.is_populating():
+                return item_count * lk.estimated_item_size  # still growing
+            self._item_count = item_count
+        return self._item_count * lk.estimated_item_size
+
+    def unload(self):
+        """
+        Free the items of the document, they're restored with JsonTreeWidget.restore_document
+
+        :return: False if the document can't be unloaded
+        """
+        from . import file_watcher
+        tree_model = self.tree_widget.tree_model
+        root_item = tree_model.root_item
+
+        is_unchanged_on_disk = (
+            self.json_path
+            and self.file_state is not None
+            and self.file_state == file_watcher.get_file_state(self.json_path)
+        )
+        if root_item.is_modified or not is_unchanged_on_disk:
+            tree_model.finish_populating()
+            try:
+                packed_tree = marshal.dumps(data_tree.data_tree_model.pack_item_tree(root_item))
+            except ValueError as e:
+                # records of a lazily loaded ndjson file that were never read, or values marshal can't write
+                print("Can't unload {}: {}".format(self.get_title(), e))
+                return False
+            self.packed_tree = packed_tree
+        else:
+            self.packed_tree = None  # read from disk again
+
+        if tree_model.ndjson_file is not None:
+            tree_model.ndjson_file.close()
+        self.tree_widget.set_tree_data(OrderedDict())
+        self.is_loaded = False
+        self._item_count = None
+        return True
 
 
 class JsonTreeWidget(QtWidgets.QWidget):
     def __init__(self, *args, **kwargs):
+        from . import batch_widget
+        from . import file_watcher
+        from . import snapshot_cache
+
         super(JsonTreeWidget, self).__init__(*args, **kwargs)
         self.main_layout = QtWidgets.QVBoxLayout()
 
+        self.settings = QtCore.QSettings(
+            QtCore.QSettings.IniFormat,
+            QtCore.QSettings.UserScope,
+            "JsonTree",
+            "JsonTreeSettings",
+        )
+
         self.path_widget = ui_utils.QtPathWidget(
             settings_name="JsonTree",
-            file_filter="JSON (*.json)",
+            file_filter=system.get_file_filter(),
             recent_paths_amount=100,
             only_show_existing_recent_paths=True,
         )
@@ -31,7 +137,25 @@ class JsonTreeWidget(QtWidgets.QWidget):
         self.filter_widget.setClearButtonEnabled(True)
         self.filter_widget.textEdited.connect(self.filter_data)
 
-        self.json_tree = data_tree.DataTreeWidget()
+        self.find_in_files_button = QtWidgets.QPushButton("Find in Files")
+        self.find_in_files_button.setCheckable(True)
+        self.find_in_files_widget = None  # created when it's first shown, see toggle_find_in_files
+
+        self.documents = []  # type: list[JsonDocument]
+        self.tab_widget = QtWidgets.QTabWidget()
+        self.tab_widget.setDocumentMode(True)
+        self.tab_widget.setTabsClosable(True)
+        self.tab_widget.setMovable(True)
+        self.tab_widget.setTabBarAutoHide(True)  # looks like a single document editor until a second tab is opened
+
+        self.snapshot_cache = snapshot_cache.SnapshotCache()
+        self._diff_windows = []
+
+        self.file_watcher = file_watcher.FileWatcher(self)
+        self.file_watcher.file_changed.connect(self.reload_changed_file)
+        self._reload_signals = None
+        self._reload_count = 0
+        self._snapshot_writes = {}  # json path -> signals of the background write
 
         self.batch_modify_widget = batch_widget.BatchModifyWidget()
 
@@ -43,10 +167,13 @@ class JsonTreeWidget(QtWidgets.QWidget):
         self.modify_type_chooser.addItems(["Keys & Values", "Keys", "Values"])
         self.modify_rename_button = QtWidgets.QPushButton("Rename")
         self.modify_duplicate_button = QtWidgets.QPushButton("Duplicate")
+        self.modify_transform_button = QtWidgets.QPushButton("Transform")
+        self.modify_transform_button.setToolTip("Apply the transform lines to the selected items, or the whole file")
 
         # connect signals
         self.modify_rename_button.clicked.connect(self.modify_rename)
         self.modify_duplicate_button.clicked.connect(self.modify_duplicate)
+        self.modify_transform_button.clicked.connect(lambda: self.modify_transform())
 
         modify_layout = QtWidgets.QHBoxLayout()
         modify_layout.setContentsMargins(0, 0, 0, 0)
@@ -54,38 +181,546 @@ class JsonTreeWidget(QtWidgets.QWidget):
         modify_layout.addWidget(self.modify_type_chooser)
         modify_layout.addWidget(self.modify_rename_button)
         modify_layout.addWidget(self.modify_duplicate_button)
+        modify_layout.addWidget(self.modify_transform_button)
         ###########################################################
 
+        filter_layout = QtWidgets.QHBoxLayout()
+        filter_layout.setContentsMargins(0, 0, 0, 0)
+        filter_layout.addWidget(self.filter_widget)
+        filter_layout.addWidget(self.find_in_files_button)
+
+        self.tree_splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical)
+        self.tree_splitter.addWidget(self.tab_widget)
+        self.tree_splitter.setStretchFactor(0, 1)
+
         self.main_layout.addWidget(self.path_widget)
-        self.main_layout.addWidget(self.filter_widget)
-        self.main_layout.addWidget(self.json_tree)
+        self.main_layout.addLayout(filter_layout)
+        self.main_layout.addWidget(self.tree_splitter)
         self.main_layout.addWidget(self.batch_modify_widget)
         self.main_layout.addLayout(modify_layout)
         self.setLayout(self.main_layout)
 
         # connect signals
         self.path_widget.path_changed.connect(self.load_json)
-        self.test_ui_save_load()
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
+        self.tab_widget.tabCloseRequested.connect(self.close_tab)
+        self.find_in_files_button.toggled.connect(self.toggle_find_in_files)
+
+        self.add_document()
+
+    @property
+    def json_tree(self):
+        """DataTreeWidget of the active tab"""
+        return self.tab_widget.currentWidget()  # type: data_tree.DataTreeWidget
+
+    @property
+    def current_document(self):
+        return self.get_document(self.tab_widget.currentWidget())
+
+    def get_document(self, tree_widget):
+        for document in self.documents:
+            if document.tree_widget is tree_widget:
+                return document
+
+    def find_document(self, json_path):
+        path_key = os.path.normcase(os.path.abspath(json_path))
+        for document in self.documents:
+            if document.json_path and os.path.normcase(os.path.abspath(document.json_path)) == path_key:
+                return document
+
+    def toggle_find_in_files(self, visible):
+        if self.find_in_files_widget is None:
+            if not visible:
+                return
+            from . import find_in_files_widget
+            self.find_in_files_widget = find_in_files_widget.FindInFilesWidget()
+            self.find_in_files_widget.match_activated.connect(self.open_search_match)
+            self.tree_splitter.insertWidget(0, self.find_in_files_widget)
+            self.tree_splitter.setStretchFactor(0, 0)
+            self.tree_splitter.setStretchFactor(1, 1)
+        self.find_in_files_widget.setVisible(visible)
 
     def filter_data(self):
         filter_text = self.filter_widget.text()
         self.json_tree.set_filter(filter_text)
 
+    ###########################################################
+    # Tabs
+
+    def add_document(self, json_path=""):
+        document = JsonDocument(data_tree.DataTreeWidget(), json_path=json_path)
+        self.documents.append(document)
+        self.tab_widget.addTab(document.tree_widget, document.get_title())
+        if self.is_stats_visible():
+            document.tree_widget.set_stats_visible(True)
+        return document
+
+    def new_tab(self):
+        document = self.add_document()
+        self.tab_widget.setCurrentWidget(document.tree_widget)
+        return document
+
+    def open_in_new_tab(self):
+        json_path = self.path_widget.get_dialog_path()
+        if not json_path:
+            return
+
+        document = self.find_document(json_path)
+        if document is None:
+            document = self.add_document()
+            self.load_document_file(document, json_path)
+        self.tab_widget.setCurrentWidget(document.tree_widget)
+
+    def close_tab(self, index=None):
+        if index is None:
+            index = self.tab_widget.currentIndex()
+        document = self.get_document(self.tab_widget.widget(index))
+
+        if document.is_modified():
+            answer = QtWidgets.QMessageBox.question(
+                self,
+                "Unsaved Changes",
+                "{} has unsaved changes.\n\nClose it anyway?".format(document.get_title()),
+            )
+            if answer != QtWidgets.QMessageBox.Yes:
+                return
+
+        if document.tree_widget.tree_model.ndjson_file is not None:
+            document.tree_widget.tree_model.ndjson_file.close()
+        self.documents.remove(document)
+        self.tab_widget.removeTab(index)
+        document.tree_widget.deleteLater()
+
+        if not self.documents:
+            self.add_document()
+
+    def on_tab_changed(self, index):
+        from . import file_watcher
+        document = self.current_document
+        if document is None:
+            return
+
+        document.last_active_time = time.time()
+        if not document.is_loaded:
+            self.restore_document(document)
+
+        self.set_displayed_path(document.json_path)
+        self.file_watcher.watch(document.json_path)
+        document.tree_widget.set_filter(self.filter_widget.text())
+
+        # changed on disk while the tab wasn't active
+        if document.file_state is not None and document.file_state != file_watcher.get_file_state(document.json_path):
+            self.reload_changed_file(document.json_path)
+
+        self.enforce_memory_budget()
+
+    def update_tab_title(self, document):
+        index = self.tab_widget.indexOf(document.tree_widget)
+        self.tab_widget.setTabText(index, document.get_title())
+        self.tab_widget.setTabToolTip(index, document.json_path)
+
+    def set_displayed_path(self, json_path):
+        """Show the path of the active document without loading it again"""
+        self.path_widget.blockSignals(True)
+        try:
+            if json_path:
+                self.path_widget.set_path(json_path)
+            else:
+                self.path_widget.path_CB.setCurrentText("")
+        finally:
+            self.path_widget.blockSignals(False)
+
+    def is_stats_visible(self):
+        return self.settings.value(lk.settings_key_show_stats, False) in (True, "true")
+
+    def set_stats_visible(self, visible):
+        """Item count, json size and depth columns in every tab, see data_tree_model.get_item_stats"""
+        self.settings.setValue(lk.settings_key_show_stats, visible)
+        for document in self.documents:
+            document.tree_widget.set_stats_visible(visible)
+
+    ###########################################################
+    # Memory budget
+
+    def is_formatting_preserved(self):
+        return self.settings.value(lk.settings_key_preserve_formatting, False) in (True, "true")
+
+    def set_formatting_preserved(self, preserve):
+        """Keep the text of files that are opened from now on, to save them with their own formatting"""
+        self.settings.setValue(lk.settings_key_preserve_formatting, preserve)
+
+    def get_memory_budget(self):
+        """Total bytes for the items of all tabs, or None for no limit"""
+        memory_budget = self.settings.value(lk.settings_key_memory_budget) or lk.memory_budget_default
+        if memory_budget == lk.memory_budget_unlimited:
+            return None
+        return int(memory_budget) * 1024 * 1024
+
+    def enforce_memory_budget(self):
+        """Unload the least recently active documents until all tabs fit in the memory budget"""
+        memory_budget = self.get_memory_budget()
+        if memory_budget is None:
+            return
+
+        total_size = sum(document.get_memory_estimate() for document in self.documents)
+        current_document = self.current_document
+        loaded_documents = [document for document in self.documents if document.is_loaded]
+
+        for document in sorted(loaded_documents, key=lambda d: d.last_active_time):
+            if total_size <= memory_budget:
+                break
+            if document is current_document:
+                continue
+
+            document_size = document.get_memory_estimate()
+            if document.unload():
+                total_size -= document_size - document.get_memory_estimate()
+
+    def restore_document(self, document):
+        if document.packed_tree is not None:
+            root_item = data_tree.data_tree_model.unpack_item_tree(marshal.loads(document.packed_tree))
+            root_item.is_modified = True
+            document.tree_widget.set_tree_root_item(root_item)
+            document.packed_tree = None
+            document.is_loaded = True
+            return
+
+        self.load_document_file(document, document.json_path)
+
+    ###########################################################
+
     def load_json(self, new_path):
-        json_data = system.load_json(new_path)
-        if json_data is None:
+        """Open a file, in the active tab if it's empty or unmodified"""
+        if not os.path.isfile(new_path):
             return
-        self.json_tree.set_tree_data(json_data)
 
-    def save_json(self):
-        json_path = self.path_widget.path()
-        data_from_ui = self.json_tree.get_tree_data()
-        system.save_json(data_from_ui, json_path)
+        document = self.find_document(new_path)
+        if document is None:
+            document = self.current_document
+            if document.is_modified():
+                document = self.add_document()
+            self.load_document_file(document, new_path)
+
+        if document is self.current_document:
+            self.on_tab_changed(self.tab_widget.currentIndex())
+        else:
+            self.tab_widget.setCurrentWidget(document.tree_widget)
+
+    def load_document_file(self, document, new_path):
+        self._reload_count += 1  # ignore reloads that are still running for the previous file
+        tree_widget = document.tree_widget
+
+        if document.tree_widget.tree_model.ndjson_file is not None:
+            document.tree_widget.tree_model.ndjson_file.close()
+
+        if system.is_ndjson_path(new_path) and system.get_compression(new_path) is None:
+            tree_widget.set_tree_ndjson(system.NdjsonFile(new_path))
+
+        else:
+            keep_source = self.is_formatting_preserved()
+            packed_tree = None
+            if not keep_source and not system.is_ndjson_path(new_path) and self.snapshot_cache.should_cache(new_path):
+                packed_tree = self.snapshot_cache.load(new_path)
+
+            if packed_tree is not None:
+                tree_widget.set_tree_root_item(data_tree.data_tree_model.unpack_item_tree(packed_tree))
+            else:
+                snapshot_header = self.get_snapshot_header(new_path)  # before reading, in case the file changes
+                json_data, json_source = load_json_file(new_path, keep_source)
+                if json_data is None:
+                    return
+                tree_widget.set_tree_data(json_data)
+                if json_source is not None:
+                    tree_widget.tree_model.call_when_populated(
+                        partial(tree_widget.tree_model.set_json_source, json_source)
+                    )
+                elif snapshot_header is not None:
+                    self.update_snapshot(new_path, json_data, snapshot_header)
+
+        document.on_loaded(new_path)
+        self.update_tab_title(document)
+
+    def open_search_match(self, json_path, key_path=None):
+        from . import find_in_files_widget
+        self.load_json(json_path)
+
+        document = self.find_document(json_path)
+        if document is None or key_path is None:
+            return
+        if not document.tree_widget.select_key_path(key_path):
+            print("Match is no longer in the file: {}".format(find_in_files_widget.format_key_path(key_path)))
+
+    def get_snapshot_header(self, json_path):
+        """Header for a snapshot of the file as it is now, or None if the file doesn't get snapshots"""
+        if system.is_ndjson_path(json_path) or not self.snapshot_cache.should_cache(json_path):
+            return None
+        return self.snapshot_cache.get_header(json_path)
+
+    def update_snapshot(self, json_path, json_data, snapshot_header):
+        """
+        Pack and write a snapshot on a worker thread, the tree can be edited in the meantime
+
+        :param json_path:
+        :param json_data: data of the file, that isn't changed afterwards, like parsed data or a model snapshot
+        :param snapshot_header: from get_snapshot_header, taken when the file had json_data
+        """
+        if not isinstance(json_data, data_tree.data_tree_model.lk.supports_children_types):
+            return
+
+        self._snapshot_writes[json_path] = ui_utils.run_in_background(
+            write_snapshot,
+            partial(self.on_snapshot_written, json_path),
+            on_failed=partial(self.on_snapshot_write_failed, json_path),
+            args=(self.snapshot_cache, json_path, json_data, snapshot_header),
+        )
+
+    def on_snapshot_written(self, json_path, result=None):
+        self._snapshot_writes.pop(json_path, None)
+
+    def on_snapshot_write_failed(self, json_path, error):
+        self._snapshot_writes.pop(json_path, None)
+        print("Failed to write snapshot for {}: {}".format(json_path, error))
+
+    def save_json(self, json_path=None):
+        document = self.current_document
+        if json_path is None:
+            json_path = document.json_path
+        if not json_path:
+            self.save_json_as()
+            return
+
+        tree_widget = document.tree_widget
+        tree_model = tree_widget.tree_model
+        if (tree_model.ndjson_file is not None
+                and system.is_ndjson_path(json_path)
+                and system.get_compression(json_path) is None):
+            tree_model.save_ndjson(json_path)
+            self.on_saved(document, json_path)
+            return
+
+        if tree_model.schema is None:
+            # files with their formatting are written from the items, so they don't need the data
+            json_data = None if is_saved_from_source(tree_model, json_path) else tree_model.get_snapshot()
+            self.write_json(document, json_path, json_data)
+            return
+
+        data_from_ui = tree_model.get_snapshot()
+
+        # no edits until the validated data is written, so clearing the modified state afterwards is correct
+        tree_widget.setEnabled(False)
+        tree_widget.validate_tree(data_from_ui, partial(self.on_save_validated, document, json_path, data_from_ui))
+
+    def on_save_validated(self, document, json_path, json_data, errors):
+        document.tree_widget.setEnabled(True)
+        if document not in self.documents:
+            return
+
+        if errors is None:
+            # the validation raised, the error is printed by DataTreeWidget.on_tree_validation_failed
+            answer = QtWidgets.QMessageBox.question(
+                self,
+                "Schema Validation Failed",
+                "{}\ncouldn't be validated against the schema, see the script editor for the error.\n\n"
+                "Save anyway?".format(json_path),
+            )
+            if answer != QtWidgets.QMessageBox.Yes:
+                return
+        elif errors:
+            answer = QtWidgets.QMessageBox.question(
+                self,
+                "Schema Errors",
+                "{}\nhas {} schema errors, the invalid items are shown in red.\n\nSave anyway?".format(
+                    json_path,
+                    len(errors),
+                ),
+            )
+            if answer != QtWidgets.QMessageBox.Yes:
+                return
+
+        self.write_json(document, json_path, json_data)
+
+    def write_json(self, document, json_path, json_data):
+        tree_model = document.tree_widget.tree_model
+        if is_saved_from_source(tree_model, json_path):
+            # unedited parts are written as they were in the file
+            json_bytes = tree_model.get_source_json_bytes()
+            system.write_json_bytes(json_bytes, json_path, compression_level=self.get_compression_level())
+            tree_model.on_source_saved()
+            self.snapshot_cache.remove(json_path)  # files are read with their text when formatting is preserved
+        else:
+            system.save_json(json_data, json_path, compression_level=self.get_compression_level())
+            tree_model.set_json_source(None)
+            snapshot_header = self.get_snapshot_header(json_path)
+            if snapshot_header is not None:
+                self.update_snapshot(json_path, json_data, snapshot_header)
+        tree_model.root_item.clear_modified()
+        self.on_saved(document, json_path)
+
+    def on_saved(self, document, json_path):
+        document.on_loaded(json_path)
+        self.update_tab_title(document)
+        if document is self.current_document:
+            self.set_displayed_path(json_path)
+            self.file_watcher.watch(json_path)  # the save isn't reported as a change by another program
         print("Saved Json to: {}".format(json_path))
 
+    def reload_changed_file(self, json_path):
+        """Parse a file that was changed by another program in the background, then update the tree to match"""
+        document = self.find_document(json_path)
+        if document is None or not document.is_loaded:
+            return
+
+        if document.tree_widget.tree_model.ndjson_file is not None:
+            # record offsets are out of date, the file has to be indexed again
+            if self.confirm_reload(document):
+                self.load_document_file(document, json_path)
+            return
+
+        self._reload_count += 1
+        self._reload_signals = ui_utils.run_in_background(
+            load_json_file,
+            partial(self.on_changed_file_loaded, document, self._reload_count),
+            args=(json_path, self.is_formatting_preserved()),
+        )
+
+    def on_changed_file_loaded(self, document, reload_count, loaded_file):
+        json_data, json_source = loaded_file
+        if reload_count != self._reload_count or json_data is None:
+            return
+        if document not in self.documents or not document.is_loaded:
+            return
+        if not self.confirm_reload(document):
+            return
+
+        tree_model = document.tree_widget.tree_model
+        document.tree_widget.update_tree_data(json_data)
+        if json_source is not None:
+            tree_model.call_when_populated(partial(tree_model.set_json_source, json_source))
+        tree_model.root_item.clear_modified()
+        document.on_loaded(document.json_path)
+        print("Reloaded changed file: {}".format(document.json_path))
+
+    def confirm_reload(self, document):
+        if not document.is_modified():
+            return True
+
+        answer = QtWidgets.QMessageBox.question(
+            self,
+            "File Changed",
+            "{}\nhas been changed by another program.\n\nReload it and lose unsaved changes?".format(
+                document.json_path
+            ),
+        )
+        return answer == QtWidgets.QMessageBox.Yes
+
+    def get_compression_level(self):
+        """Compression level for saving compressed files, None for the default of the compression type"""
+        compression_level = self.settings.value(lk.settings_key_compression_level)
+        if not compression_level or compression_level == lk.compression_level_default:
+            return None
+        return int(compression_level)
+
     def save_json_as(self):
-        if self.path_widget.open_dialog_and_set_path():
-            self.save_json()
+        json_path = self.path_widget.get_dialog_path()
+        if json_path:
+            self.save_json(json_path)
+
+    def choose_schema(self):
+        json_path = self.current_document.json_path
+        schema_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self,
+            "Validate With JSON Schema",
+            os.path.dirname(json_path) if json_path else "",
+            "JSON Schema (*.json)",
+        )
+        if schema_path:
+            self.set_schema(schema_path)
+
+    def set_schema(self, schema_path):
+        """Validate the active tab against a JSON Schema file, edited items are validated as they change"""
+        from . import json_schema
+        try:
+            schema = json_schema.load_schema(schema_path)
+        except (IOError, OSError, ValueError) as e:
+            print("Can't use schema {}: {}".format(schema_path, e))
+            return
+        self.json_tree.set_schema(schema)
+        print("Validating with schema: {}".format(schema_path))
+
+    def clear_schema(self):
+        self.json_tree.set_schema(None)
+
+    def validate_json(self):
+        if self.json_tree.tree_model.schema is None:
+            print("No schema to validate with, choose one in the Schema menu")
+            return
+        self.json_tree.validate_tree(on_validated=self.on_validated)
+
+    def on_validated(self, errors):
+        if errors is None:
+            return
+        if not errors:
+            print("No schema errors")
+            return
+        from . import find_in_files_widget
+        for key_path, keyword, message in errors[:50]:
+            print("{}: {}".format(find_in_files_widget.format_key_path(key_path) or "root", message))
+        print("{} schema errors".format(len(errors)))
+
+    def compare_with_disk(self):
+        json_path = self.current_document.json_path
+        disk_data = system.load_json(json_path) if json_path else None
+        if disk_data is None:
+            print("Nothing to compare, file does not exist: {}".format(json_path))
+            return
+        self.show_diff_window(disk_data, self.json_tree.get_tree_data(), old_title=json_path, new_title="Current")
+
+    def compare_with_tab(self):
+        current_document = self.current_document
+        other_documents = [document for document in self.documents if document is not current_document]
+        if not other_documents:
+            print("Nothing to compare, only one tab is open")
+            return
+
+        titles = ["{}: {}".format(i + 1, document.get_title()) for i, document in enumerate(other_documents)]
+        title, accepted = QtWidgets.QInputDialog.getItem(self, "Compare With Tab", "Compare with:", titles, 0, False)
+        if not accepted:
+            return
+
+        other_document = other_documents[titles.index(title)]
+        if not other_document.is_loaded:
+            self.restore_document(other_document)
+
+        self.show_diff_window(
+            other_document.tree_widget.get_tree_data(),
+            self.json_tree.get_tree_data(),
+            old_title=other_document.json_path or other_document.get_title(),
+            new_title=current_document.json_path or current_document.get_title(),
+        )
+        self.enforce_memory_budget()
+
+    def compare_files(self, old_path=None, new_path=None):
+        if old_path is None:
+            old_path = self.path_widget.get_dialog_path()
+        if new_path is None:
+            new_path = self.path_widget.get_dialog_path()
+        if not old_path or not new_path:
+            return
+
+        old_data = system.load_json(old_path)
+        new_data = system.load_json(new_path)
+        if old_data is None or new_data is None:
+            return
+        self.show_diff_window(old_data, new_data, old_title=old_path, new_title=new_path)
+
+    def show_diff_window(self, old_data, new_data, old_title="Old", new_title="New"):
+        from . import diff_widget
+        win = diff_widget.DiffWindow(old_data, new_data, old_title=old_title, new_title=new_title, parent=self)
+        win.setAttribute(QtCore.Qt.WA_DeleteOnClose, True)
+        win.destroyed.connect(lambda *args: self._diff_windows.remove(win))
+        self._diff_windows.append(win)
+        win.show()
+        return win
 
     def modify_rename(self, items=None, recursive=None):
         if items is None:
@@ -93,38 +728,65 @@ class JsonTreeWidget(QtWidgets.QWidget):
         if recursive is None:
             recursive = self.modify_hierarchy.isChecked()
 
+        from . import data_tree_transforms
         modify_keys = "keys" in self.modify_type_chooser.currentText().lower()
         modify_values = "value" in self.modify_type_chooser.currentText().lower()
 
-        for item in items:  # type: data_tree.data_tree_model.DataModelItem
-            rename_item(
-                item=item,
-                modify_string_func=self.batch_modify_widget.modify_string,
-                mod_key=modify_keys,
-                mod_values=modify_values,
-                recursive=recursive,
-            )
+        data_tree_transforms.apply_transforms(
+            items,
+            [self.batch_modify_widget.get_modify_text_operation(keys=modify_keys, values=modify_values)],
+            model=self.json_tree.tree_model,
+            recursive=recursive,
+        )
 
     def modify_duplicate(self):
         new_items = self.json_tree.action_duplicate_selected_item(return_new_items=True, key_safety=False)
         self.modify_rename(new_items, recursive=False)
 
-    def test_ui_save_load(self):
-        self.path_widget.set_path(EXAMPLE_JSON_PATH)
-        self.save_json()
+    def modify_transform(self, items=None, operations=None):
+        """
+        :param items: items to transform, the selected items by default, or the whole file if nothing is selected
+        :param operations: list of data_tree_transforms.Operation, the transform lines of the batch widget by default
+        :return: data_tree_transforms.TransformResult, or None if there was nothing to do
+        """
+        from . import data_tree_transforms
+        if operations is None:
+            operations = self.batch_modify_widget.get_transform_operations()
+        if not operations:
+            return None
+
+        tree_model = self.json_tree.tree_model
+        recursive = True
+        if items is None:
+            items = self.json_tree.get_selected_items()
+            recursive = self.modify_hierarchy.isChecked()
+        if not items:
+            items = [tree_model.root_item]
+            recursive = True
+
+        result = data_tree_transforms.apply_transforms(items, operations, model=tree_model, recursive=recursive)
+        print("Transformed: {}".format(result.summary()))
+        return result
+
 
+def is_saved_from_source(tree_model, json_path):
+    """True if the file is written with the formatting of the text it was loaded from, see DataModel.json_source"""
+    return tree_model.json_source is not None and not system.is_ndjson_path(json_path)
 
-def rename_item(item, modify_string_func, mod_key, mod_values, recursive=False):
-    if mod_key:
-        item.data_key = modify_string_func(item.data_key)
 
-    if mod_values:
-        if item.data_type == "str":
-            item.set_value(modify_string_func(item.data_value))
+def write_snapshot(cache, json_path, json_data, snapshot_header):
+    cache.save(json_path, data_tree.data_tree_model.pack_json_data(json_data), header=snapshot_header)
 
-    if recursive:
-        for child in item.children:  # type: data_tree.data_tree_model.DataModelItem
-            rename_item(child, modify_string_func, mod_key, mod_values, recursive=recursive)
+
+def load_json_file(json_path, keep_source=False):
+    """
+    :param json_path:
+    :param keep_source: also read the text of the file, for saving it with its formatting
+    :return: (json_data, json_tree_system.JsonSource or None)
+    """
+    if keep_source and not system.is_ndjson_path(json_path):
+        return system.load_json_source(json_path)
+    return system.load_json(json_path), None
 
 
 class JsonTreeWindow(ui_utils.ToolWindow):
@@ -137,46 +799,95 @@ class JsonTreeWindow(ui_utils.ToolWindow):
         menu_bar = QtWidgets.QMenuBar()
         file_menu = menu_bar.addMenu("File")
         file_menu.setTearOffEnabled(True)
+        file_menu.addAction("New Tab", self.ui.new_tab, QtGui.QKeySequence("Ctrl+T"))
         file_menu.addAction("Open", self.ui.path_widget.open_dialog_and_set_path, QtGui.QKeySequence("Ctrl+O"))
-        file_menu.addAction("Save", self.ui.save_json, QtGui.QKeySequence("Ctrl+S"))
+        file_menu.addAction("Open In New Tab...", self.ui.open_in_new_tab, QtGui.QKeySequence("Ctrl+Shift+O"))
+        file_menu.addAction("Close Tab", lambda: self.ui.close_tab(), QtGui.QKeySequence("Ctrl+W"))
+        file_menu.addAction("Save", lambda: self.ui.save_json(), QtGui.QKeySequence("Ctrl+S"))
         file_menu.addAction("Save As...", self.ui.save_json_as, QtGui.QKeySequence("Ctrl+Shift+S"))
 
+        compression_menu = file_menu.addMenu("Compression Level")
+        ui_utils.build_menu_from_action_list(
+            [{"RADIO_SETTING": {
+                "settings": self.ui.settings,
+                "settings_key": lk.settings_key_compression_level,
+                "choices": lk.compression_level_choices,
+                "default": lk.compression_level_default,
+                "on_trigger_command": lambda: None,
+            }}],
+            menu=compression_menu,
+            is_sub_menu=True,
+        )
+        preserve_formatting_action = file_menu.addAction("Preserve Formatting")
+        preserve_formatting_action.setCheckable(True)
+        preserve_formatting_action.setChecked(self.ui.is_formatting_preserved())
+        preserve_formatting_action.toggled.connect(self.ui.set_formatting_preserved)
+
+        memory_budget_menu = file_menu.addMenu("Tab Memory Budget (MB)")
+        ui_utils.build_menu_from_action_list(
+            [{"RADIO_SETTING": {
+                "settings": self.ui.settings,
+                "settings_key": lk.settings_key_memory_budget,
+                "choices": lk.memory_budget_choices,
+                "default": lk.memory_budget_default,
+                "on_trigger_command": self.ui.enforce_memory_budget,
+            }}],
+            menu=memory_budget_menu,
+            is_sub_menu=True,
+        )
+
+        file_menu.addSeparator()
+        file_menu.addAction("Compare With Disk", self.ui.compare_with_disk)
+        file_menu.addAction("Compare With Tab...", self.ui.compare_with_tab)
+        file_menu.addAction("Compare Files...", lambda: self.ui.compare_files())
+
+        view_menu = menu_bar.addMenu("View")
+        stats_action = view_menu.addAction("Show Statistics")
+        stats_action.setCheckable(True)
+        stats_action.setChecked(self.ui.is_stats_visible())
+        stats_action.toggled.connect(self.ui.set_stats_visible)
+
+        schema_menu = menu_bar.addMenu("Schema")
+        schema_menu.addAction("Validate With Schema...", self.ui.choose_schema)
+        schema_menu.addAction("Validate", self.ui.validate_json, QtGui.QKeySequence("F7"))
+        schema_menu.addAction("Stop Validating", self.ui.clear_schema)
+
         edit_menu = menu_bar.addMenu("Edit")
         edit_menu.setTearOffEnabled(True)
         edit_menu.addAction("Cut",
-                            self.ui.json_tree.action_cut_selected_items,
+                            lambda: self.ui.json_tree.action_cut_selected_items(),
                             QtGui.QKeySequence("Ctrl+X"),
                             )
 
         edit_menu.addAction("Copy",
-                            self.ui.json_tree.action_copy_selected_items,
+                            lambda: self.ui.json_tree.action_copy_selected_items(),
                             QtGui.QKeySequence("Ctrl+C"),
                             )
 
         edit_menu.addAction("Paste",
-                            self.ui.json_tree.action_paste_selected_items,
+                            lambda: self.ui.json_tree.action_paste_selected_items(),
                             QtGui.QKeySequence("Ctrl+V"),
                             )
 
         edit_menu.addAction("Duplicate",
-                            self.ui.json_tree.action_duplicate_selected_item,
+                            lambda: self.ui.json_tree.action_duplicate_selected_item(),
                             QtGui.QKeySequence("Ctrl+D"),
                             )
 
         edit_menu.addAction("Delete",
-                            self.ui.json_tree.action_delete_selected_items,
+                            lambda: self.ui.json_tree.action_delete_selected_items(),
                             QtGui.QKeySequence("DEL"),
                             )
 
         edit_menu.addSeparator()
 
         edit_menu.addAction("Move Up",
-                            self.ui.json_tree.action_move_selected_items_up,
+                            lambda: self.ui.json_tree.action_move_selected_items_up(),
                             QtGui.QKeySequence("Alt+Up"),
                             )
 
         edit_menu.addAction("Move Down",
-                            self.ui.json_tree.action_move_selected_items_down,
+                            lambda: self.ui.json_tree.action_move_selected_items_down(),
                             QtGui.QKeySequence("Alt+Down"),
                             )
 
@@ -184,11 +895,16 @@ class JsonTreeWindow(ui_utils.ToolWindow):
 
 
 def main(refresh=False):
+    # if running in standalone, create app
+    standalone_qapp = None
+    if not QtWidgets.QApplication.instance():
+        standalone_qapp = QtWidgets.QApplication(sys.argv)
+
     win = JsonTreeWindow()
     win.main(refresh=refresh)
 
-    if STANDALONE_QAPP:
-        sys.exit(STANDALONE_QAPP.exec_())
+    if standalone_qapp:
+        sys.exit(standalone_qapp.exec_())
 
     return win
 
@@ -0,0 +1,128 @@
+"""
+On disk cache of parsed documents, so reopening a large unchanged file skips parsing.
+
+Snapshots are marshal dumps of data_tree_model.pack_item_tree output,
+keyed by the source path and validated against its modification time and size.
+The least recently used snapshots are deleted once the cache grows past its size limit.
+"""
+import hashlib
+import marshal
+import os
+import sys
+import uuid
+
+from . import json_tree_system
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_EXTENSION = ".snapshot"
+
+
+def get_default_cache_dir():
+    if sys.platform == "win32":
+        base_dir = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base_dir, "JsonTree", "snapshot_cache")
+    return os.path.join(os.path.expanduser("~"), ".cache", "json_tree", "snapshot_cache")
+
+
+class SnapshotCache(object):
+    def __init__(self, cache_dir=None, max_cache_size=2 * 1024 ** 3, min_source_size=8 * 1024 ** 2):
+        """
+        :param cache_dir: folder for snapshot files
+        :param max_cache_size: total size in bytes to evict down to
+        :param min_source_size: smaller files parse fast enough that a snapshot isn't worth it
+        """
+        self.cache_dir = cache_dir or get_default_cache_dir()
+        self.max_cache_size = max_cache_size
+        self.min_source_size = min_source_size
+
+    def get_snapshot_path(self, json_path):
+        path_key = os.path.normcase(os.path.abspath(json_path))
+        file_name = hashlib.sha1(path_key.encode("utf-8")).hexdigest()
+        # marshal format differs between python versions
+        file_name += "_py{}{}".format(*sys.version_info[:2])
+        return os.path.join(self.cache_dir, file_name + SNAPSHOT_EXTENSION)
+
+    def get_header(self, json_path):
+        stat = os.stat(json_path)
+        return SNAPSHOT_VERSION, os.path.abspath(json_path), stat.st_mtime, stat.st_size
+
+    def should_cache(self, json_path):
+        return os.path.exists(json_path) and os.path.getsize(json_path) >= self.min_source_size
+
+    def load(self, json_path):
+        """
+        Get packed item tree for a file, if the file hasn't changed since it was cached
+
+        :param json_path:
+        :return: packed item tree or None
+        """
+        snapshot_path = self.get_snapshot_path(json_path)
+        if not os.path.exists(snapshot_path) or not os.path.exists(json_path):
+            return None
+
+        try:
+            with open(snapshot_path, "rb") as fp:
+                if marshal.load(fp) != self.get_header(json_path):
+                    return None
+                packed_tree = marshal.load(fp)
+        except (EOFError, ValueError, TypeError, IOError, OSError) as e:
+            print("Failed to read snapshot {}: {}".format(snapshot_path, e))
+            return None
+
+        os.utime(snapshot_path, None)  # mark as recently used
+        return packed_tree
+
+    def save(self, json_path, packed_tree, header=None):
+        """
+        Store packed item tree for a file, can be called from worker threads
+
+        :param json_path: source file
+        :param packed_tree: data_tree_model.pack_item_tree output
+        :param header: get_header of the file when it had the packed data, the file as it is now by default
+        :return:
+        """
+        snapshot_path = self.get_snapshot_path(json_path)
+        temp_path = "{}.{}.tmp".format(snapshot_path, uuid.uuid4().hex)  # writes for the same file can overlap
+        try:
+            if header is None:
+                header = self.get_header(json_path)
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(temp_path, "wb") as fp:
+                marshal.dump(header, fp)
+                marshal.dump(packed_tree, fp)
+            json_tree_system.replace_file(temp_path, snapshot_path)
+        except (ValueError, IOError, OSError) as e:
+            # unmarshallable value in the tree, full disk, no write access, source file deleted
+            print("Failed to write snapshot for {}: {}".format(json_path, e))
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        self.evict()
+
+    def remove(self, json_path):
+        snapshot_path = self.get_snapshot_path(json_path)
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+    def evict(self):
+        """Delete least recently used snapshots until the cache is below max_cache_size"""
+        if not os.path.exists(self.cache_dir):
+            return
+
+        snapshots = []
+        total_size = 0
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(SNAPSHOT_EXTENSION):
+                continue
+            snapshot_path = os.path.join(self.cache_dir, file_name)
+            stat = os.stat(snapshot_path)
+            snapshots.append((stat.st_mtime, stat.st_size, snapshot_path))
+            total_size += stat.st_size
+
+        snapshots.sort()
+        while snapshots and total_size > self.max_cache_size:
+            _, snapshot_size, snapshot_path = snapshots.pop(0)
+            os.remove(snapshot_path)
+            total_size -= snapshot_size
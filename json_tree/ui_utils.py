@@ -7,7 +7,6 @@ from functools import partial
 # except ImportError:
 from PySide2 import QtCore, QtGui
 from PySide2 import QtWidgets
-from shiboken2 import wrapInstance
 
 if sys.version_info.major >= 3:
     long = int
@@ -21,6 +20,7 @@ def get_app_window():
     app_window = None
     if active_dcc_is_maya:
         from maya import OpenMayaUI as omui
+        from shiboken2 import wrapInstance
         maya_main_window_ptr = omui.MQtUtil().mainWindow()
         app_window = wrapInstance(long(maya_main_window_ptr), QtWidgets.QMainWindow)
 
@@ -28,7 +28,9 @@ def get_app_window():
 
 
 class CoreToolWindow(QtWidgets.QMainWindow):
-    def __init__(self, parent=get_app_window()):
+    def __init__(self, parent=None):
+        if parent is None:
+            parent = get_app_window()
         super(CoreToolWindow, self).__init__(parent)
 
         self.ui = None
@@ -75,7 +77,9 @@ if active_dcc_is_maya:
 
 
     class ToolWindow(MayaQWidgetDockableMixin, CoreToolWindow):
-        def __init__(self, parent=get_app_window()):
+        def __init__(self, parent=None):
+            if parent is None:
+                parent = get_app_window()
             super(ToolWindow, self).__init__(parent=parent)
             self.setAttribute(QtCore.Qt.WA_DeleteOnClose, True)
 
@@ -186,6 +190,103 @@ def set_settings_value(settings_obj, key, value, post_set_command):
     post_set_command()
 
 
+class PathExistsCache:
+    results = {}  # path: exists, shared between widgets so each path is only checked once per session
+    thread_pool = None
+
+
+class PathExistsSignals(QtCore.QObject):
+    checked = QtCore.Signal(str, bool)
+
+
+class PathExistsTask(QtCore.QRunnable):
+    """Check if a path exists on a worker thread, slow network drives would block the ui"""
+
+    def __init__(self, path, signals):
+        super(PathExistsTask, self).__init__()
+        self.path = path
+        self.signals = signals
+
+    def run(self):
+        exists = os.path.exists(self.path)
+        PathExistsCache.results[self.path] = exists
+        self.signals.checked.emit(self.path, exists)
+
+
+def get_path_check_thread_pool():
+    if PathExistsCache.thread_pool is None:
+        thread_pool = QtCore.QThreadPool()
+        thread_pool.setMaxThreadCount(16)  # waiting on the file system, not the cpu
+        PathExistsCache.thread_pool = thread_pool
+    return PathExistsCache.thread_pool
+
+
+def check_paths_exist(paths, on_checked):
+    """
+    Check paths in parallel, off the ui thread
+
+    :param paths: paths to check, paths with a cached result are not checked again
+    :param on_checked: called with (path, exists) on the ui thread for each path that gets checked
+    :return: signals object, keep a reference to it until the checks are done
+    """
+    signals = PathExistsSignals()
+    signals.checked.connect(on_checked)
+
+    thread_pool = get_path_check_thread_pool()
+    for path in paths:
+        if path in PathExistsCache.results:
+            continue
+        thread_pool.start(PathExistsTask(path, signals))
+
+    return signals
+
+
+class BackgroundTaskSignals(QtCore.QObject):
+    finished = QtCore.Signal(object)
+    failed = QtCore.Signal(object)
+
+
+class BackgroundTask(QtCore.QRunnable):
+    def __init__(self, func, args=(), kwargs=None):
+        super(BackgroundTask, self).__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.signals = BackgroundTaskSignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(e)
+            return
+        self.signals.finished.emit(result)
+
+
+def print_task_error(error):
+    print("Background task failed: {}".format(error))
+
+
+def run_in_background(func, on_finished, on_failed=None, args=(), kwargs=None):
+    """
+    Run func on the global thread pool
+
+    :param func: function to run, it must not touch any widgets
+    :param on_finished: called with the return value of func, on the ui thread
+    :param on_failed: called with the exception raised by func, on the ui thread
+    :param args: arguments for func
+    :param kwargs: keyword arguments for func
+    :return: signals object, keep a reference to it until the task is done
+    """
+    task = BackgroundTask(func, args=args, kwargs=kwargs)
+    task.signals.finished.connect(on_finished)
+    task.signals.failed.connect(on_failed or print_task_error)
+
+    signals = task.signals
+    QtCore.QThreadPool.globalInstance().start(task)
+    return signals
+
+
 class QtPathWidget(QtWidgets.QWidget):
     path_changed = QtCore.Signal(str)
 
@@ -225,6 +326,8 @@ class QtPathWidget(QtWidgets.QWidget):
         self.relative_to_path_drive = os.path.splitdrive(self.relative_to_path)[0]
         self.use_directory_dialog = use_directory_dialog
         self.recent_paths_amount = recent_paths_amount
+        self.only_show_existing_recent_paths = only_show_existing_recent_paths
+        self._path_check_signals = None
 
         # settings object to store data between sessions
         self._settings = QtPathWidgetSettings(
@@ -238,7 +341,8 @@ class QtPathWidget(QtWidgets.QWidget):
 
         # surprise, it's a QComboBox for the path display
         self.path_CB = QtWidgets.QComboBox()
-        self.path_CB.addItems(self._settings.get_recent_paths(only_existing=only_show_existing_recent_paths))
+        self.path_CB.addItems(self._settings.get_recent_paths(only_existing=only_show_existing_recent_paths,
+                                                              only_checked=True))
         self.path_CB.setEditable(True)
         self.path_CB.setCurrentText("")
         self.path_CB.setSizePolicy(QtWidgets.QSizePolicy.Ignored, QtWidgets.QSizePolicy.Fixed)
@@ -254,13 +358,40 @@ class QtPathWidget(QtWidgets.QWidget):
 
         self.setLayout(main_layout)
 
-        # create path dialog instance for later use
-        self.path_dialog = QtWidgets.QFileDialog()
+        # path dialog is created on first use, QFileDialog is slow to construct
+        self.file_filter = file_filter
+        self._path_dialog = None
+
+        if only_show_existing_recent_paths:
+            self.check_recent_paths()
+
+    def check_recent_paths(self):
+        """Remove recent paths that don't exist, once the background checks finish"""
+        recent_paths = self._settings.get_recent_paths(full_paths=True)
+        self._path_check_signals = check_paths_exist(recent_paths, self.on_recent_path_checked)
 
-        if self.use_directory_dialog:
-            self.path_dialog.setFileMode(QtWidgets.QFileDialog.DirectoryOnly)
+    def on_recent_path_checked(self, path, exists):
+        if exists:
+            return
 
-        self.path_dialog.setNameFilter(file_filter)
+        display_path = self._settings.get_display_path(path)
+        if display_path == self.path_CB.currentText():
+            return
+
+        item_index = self.path_CB.findText(display_path)
+        if item_index != -1:
+            self.path_CB.removeItem(item_index)
+
+    @property
+    def path_dialog(self):
+        if self._path_dialog is None:
+            self._path_dialog = QtWidgets.QFileDialog()
+
+            if self.use_directory_dialog:
+                self._path_dialog.setFileMode(QtWidgets.QFileDialog.DirectoryOnly)
+
+            self._path_dialog.setNameFilter(self.file_filter)
+        return self._path_dialog
 
     def open_dialog_and_set_path(self):
         file_path = self.get_dialog_path()
@@ -292,11 +423,8 @@ class QtPathWidget(QtWidgets.QWidget):
         :return:
         """
         self._settings.add_recent_path(path)  # store full path in settings, then convert to relative if desired
-
-        # convert to relative path
-        path_drive = os.path.splitdrive(path)[0]
-        if self.relative_to_path and path_drive == self.relative_to_path_drive:
-            path = os.path.relpath(path, self.relative_to_path)
+        PathExistsCache.results.pop(path, None)  # might have been created since it was checked
+        path = self._settings.get_display_path(path)
 
         # if path has already been added to ComboBox, remove the old one
         path_index_map = {self.path_CB.itemText(i): i for i in range(self.path_CB.count())}
@@ -337,7 +465,8 @@ class QtPathWidgetSettings(QtCore.QSettings):
     key_recent_paths = "recent_paths"
     key_most_recent_dir = "most_recent_dir"
 
-    def __init__(self, identifier="_DefaultQtPathWidgetSettings", recent_paths_amount=30, relative_to_path=""):
+    def __init__(self, identifier="_DefaultQtPathWidgetSettings", recent_paths_amount=30, relative_to_path="",
+                 write_delay=500):
 
         # %appdata%\QtPathWidget\_DefaultQtPathWidgetSettings.ini
 
@@ -351,14 +480,18 @@ class QtPathWidgetSettings(QtCore.QSettings):
         self.relative_to_path = relative_to_path
         self.relative_to_path_drive = os.path.splitdrive(self.relative_to_path)[0]
 
-    def get_recent_paths(self, full_paths=False, only_existing=False):
-        """
-        Get recent paths from settings
+        # recent paths are read once and written back in batches, every write rewrites the whole .ini
+        self._recent_paths = None
+        self._write_timer = QtCore.QTimer(self)
+        self._write_timer.setSingleShot(True)
+        self._write_timer.setInterval(write_delay)
+        self._write_timer.timeout.connect(self.write_recent_paths)
 
-        :param full_paths: skip converting to relative paths
-        :param only_existing: only return full existing paths
-        :return:
-        """
+        app = QtCore.QCoreApplication.instance()
+        if app:
+            app.aboutToQuit.connect(self.write_recent_paths)
+
+    def read_recent_paths(self):
         paths = self.value(self.key_recent_paths)
         if not isinstance(paths, list):
             if paths:
@@ -366,22 +499,48 @@ class QtPathWidgetSettings(QtCore.QSettings):
                 paths = str(paths).split(", ")
             else:
                 paths = []
+        return paths
 
-        if only_existing:
-            paths = [p for p in paths if os.path.exists(p)]
+    def write_recent_paths(self):
+        """Write pending recent path changes to settings"""
+        self._write_timer.stop()
+        if self._recent_paths is not None:
+            self.setValue(self.key_recent_paths, self._recent_paths)
 
-        # convert to relative paths before returning
-        if not full_paths and self.relative_to_path:
-            relative_paths = []
+    def get_display_path(self, full_path):
+        """Convert to a path relative to relative_to_path, if possible"""
+        if not self.relative_to_path:
+            return full_path
+
+        if os.path.splitdrive(full_path)[0] != self.relative_to_path_drive:
+            # if the path is on a separate drive then we can't get a relative path
+            return full_path
+
+        return os.path.relpath(full_path, self.relative_to_path)
+
+    def get_recent_paths(self, full_paths=False, only_existing=False, only_checked=False):
+        """
+        Get recent paths from settings
+
+        :param full_paths: skip converting to relative paths
+        :param only_existing: only return full existing paths
+        :param only_checked: with only_existing, don't check the file system,
+            only leave out paths already known not to exist (see check_paths_exist)
+        :return:
+        """
+        if self._recent_paths is None:
+            self._recent_paths = self.read_recent_paths()
+        paths = list(self._recent_paths)
 
-            for full_path in paths:
-                if os.path.splitdrive(full_path)[0] != self.relative_to_path_drive:
-                    # if the path is on a separate drive then we can't get a relative path
-                    relative_paths.append(full_path)
-                else:
-                    relative_paths.append(os.path.relpath(full_path, self.relative_to_path))
+        if only_existing:
+            if only_checked:
+                paths = [p for p in paths if PathExistsCache.results.get(p) is not False]
+            else:
+                paths = [p for p in paths if os.path.exists(p)]
 
-            paths = relative_paths
+        # convert to relative paths before returning
+        if not full_paths:
+            paths = [self.get_display_path(full_path) for full_path in paths]
 
         return paths
 
@@ -403,4 +562,5 @@ class QtPathWidgetSettings(QtCore.QSettings):
         if len(recent_paths) > self.recent_paths_amount:  # clamp amount of paths
             recent_paths = recent_paths[:self.recent_paths_amount]
 
-        self.setValue(self.key_recent_paths, recent_paths)
+        self._recent_paths = recent_paths
+        self._write_timer.start()
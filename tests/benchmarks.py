@@ -0,0 +1,173 @@
+"""
+Manual performance benchmarks, not collected by unittest discover.
+
+Run from the repository root, with mayapy or a standalone python that has PySide2:
+
+    python tests/benchmarks.py scroll json_backends startup
+
+"""
+import os
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+tests_path = os.path.dirname(os.path.realpath(__file__))
+base_path = tests_path.rsplit(os.sep, 1)[0]
+if base_path not in sys.path:
+    sys.path.insert(0, base_path)
+
+
+def get_qapp():
+    from json_tree.ui_utils import QtWidgets
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+
+def print_frame_times(title, frame_times):
+    frame_times = sorted(frame_times)
+    print("{}: {} frames, median {:.2f} ms, p95 {:.2f} ms, max {:.2f} ms".format(
+        title,
+        len(frame_times),
+        frame_times[len(frame_times) // 2] * 1000,
+        frame_times[int(len(frame_times) * 0.95)] * 1000,
+        frame_times[-1] * 1000,
+    ))
+
+
+def benchmark_scroll(row_count=1000000, children_per_row=1000, frame_count=200):
+    """Scroll frame times on a fully expanded tree, with the fast delegate and with the stock delegate"""
+    from json_tree import data_tree
+    from json_tree.ui_utils import QtWidgets
+
+    app = get_qapp()
+
+    data = OrderedDict()
+    for i in range(row_count // children_per_row):
+        data["group_{}".format(i)] = OrderedDict(
+            ("key_{}".format(j), "value_{}".format(j)) for j in range(children_per_row)
+        )
+
+    for use_fast_delegate in (True, False):
+        widget = data_tree.DataTreeWidget()
+        if not use_fast_delegate:
+            widget.tree_view.setItemDelegate(QtWidgets.QStyledItemDelegate(widget.tree_view))
+            widget.tree_view.setUniformRowHeights(False)
+
+        widget.resize(1000, 1000)
+        widget.show()
+
+        start_time = time.time()
+        widget.set_tree_data(data)
+        widget.tree_view.expandAll()
+        app.processEvents()
+        print("set data and expand: {:.2f} s".format(time.time() - start_time))
+
+        scroll_bar = widget.tree_view.verticalScrollBar()
+        step = max(1, scroll_bar.maximum() // frame_count)
+
+        frame_times = []
+        for i in range(frame_count):
+            start_time = time.time()
+            scroll_bar.setValue(i * step)
+            widget.tree_view.viewport().repaint()
+            frame_times.append(time.time() - start_time)
+
+        print_frame_times("scroll, fast delegate={}".format(use_fast_delegate), frame_times)
+        widget.close()
+        widget.deleteLater()
+        app.processEvents()
+
+
+def benchmark_json_backends(record_count=200000, repeats=3):
+    """Parse and encode throughput of every available json backend"""
+    from json_tree import json_backends
+
+    stdlib_backend = json_backends.StdlibBackend()
+    data = [
+        OrderedDict([
+            ("name", "record_{}".format(i)),
+            ("index", i),
+            ("scale", i * 0.01),
+            ("enabled", i % 2 == 0),
+            ("tags", ["a", "b", None]),
+            ("transform", OrderedDict([("translate", [i, i + 0.5, -i]), ("rotate", [0.0, 90.0, 180.0])])),
+        ])
+        for i in range(record_count)
+    ]
+    json_bytes = stdlib_backend.dumps_bytes(data, indent=2)
+    megabytes = len(json_bytes) / (1024.0 * 1024.0)
+    print("document size: {:.1f} MB".format(megabytes))
+
+    for backend in json_backends.get_available_backends():
+        start_time = time.time()
+        for _ in range(repeats):
+            with json_backends.paused_gc():
+                backend.loads(json_bytes)
+        load_time = (time.time() - start_time) / repeats
+
+        start_time = time.time()
+        for _ in range(repeats):
+            backend.dumps_bytes(data, indent=2)
+        dump_time = (time.time() - start_time) / repeats
+
+        print("{:>10}: loads {:.3f} s ({:.1f} MB/s), dumps {:.3f} s ({:.1f} MB/s)".format(
+            backend.name,
+            load_time,
+            megabytes / load_time,
+            dump_time,
+            megabytes / dump_time,
+        ))
+
+
+STARTUP_SCRIPT = """
+import sys
+import time
+start_time = time.time()
+sys.path.insert(0, {base_path!r})
+
+from json_tree import json_tree_ui
+from json_tree.ui_utils import QtWidgets
+import_time = time.time()
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+win = json_tree_ui.JsonTreeWindow()
+construct_time = time.time()
+
+win.show()
+win.repaint()
+app.processEvents()
+paint_time = time.time()
+
+print("{{}} {{}} {{}}".format(import_time - start_time, construct_time - import_time, paint_time - construct_time))
+"""
+
+
+def benchmark_startup(repeats=5, budget=1.0):
+    """Import, window construction and first paint time, each run in a fresh interpreter"""
+    script = STARTUP_SCRIPT.format(base_path=base_path)
+
+    timings = []
+    for _ in range(repeats):
+        output = subprocess.check_output([sys.executable, "-c", script])
+        timings.append([float(value) for value in output.decode().strip().splitlines()[-1].split()])
+
+    timings.sort(key=sum)
+    import_time, construct_time, paint_time = timings[len(timings) // 2]
+    total_time = import_time + construct_time + paint_time
+    print("import {:.3f} s, construct {:.3f} s, first paint {:.3f} s".format(import_time, construct_time, paint_time))
+    print("total {:.3f} s, budget {:.3f} s: {}".format(total_time, budget, "OK" if total_time <= budget else "OVER"))
+
+
+BENCHMARKS = {
+    "scroll": benchmark_scroll,
+    "json_backends": benchmark_json_backends,
+    "startup": benchmark_startup,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or sorted(BENCHMARKS.keys())
+    for name in names:
+        print("#" * 40)
+        print(name)
+        BENCHMARKS[name]()
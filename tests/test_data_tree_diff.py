@@ -0,0 +1,57 @@
+from base import MayaBaseTestCase
+
+
+import json_tree.data_tree_diff as data_tree_diff
+import json_tree.data_tree_model as data_tree_model
+
+
+def get_root_item(data):
+    model = data_tree_model.DataModel()
+    model.set_data(data)
+    return model.root_item
+
+
+def get_keys(items):
+    return sorted(item.data_key for item in items)
+
+
+class TestDataTreeDiff(MayaBaseTestCase):
+
+    def diff(self, old_data, new_data):
+        return data_tree_diff.diff_items(get_root_item(old_data), get_root_item(new_data))
+
+    def test_dict_changes(self):
+        result = self.diff({"a": 1, "b": {"c": 2}, "d": 3}, {"a": 1, "b": {"c": 3}, "e": 4})
+        self.assertEqual(get_keys(result.added), ["e"])
+        self.assertEqual(get_keys(result.removed), ["d"])
+        self.assertEqual([(old.data_value, new.data_value) for old, new in result.changed], [(2, 3)])
+
+        old_item = get_root_item({"a": [1, 2]})
+        result = data_tree_diff.diff_items(old_item, get_root_item({"a": [1, 2]}))
+        self.assertFalse(result.has_changes())
+        self.assertIsNone(old_item.diff_state)
+
+    def test_list_matching(self):
+        # by position
+        result = self.diff([1, 2, 3], [1, 5, 3, 4])
+        self.assertEqual([(old.data_value, new.data_value) for old, new in result.changed], [(2, 5)])
+        self.assertEqual([item.data_value for item in result.added], [4])
+
+        # by hash, a moved item isn't a change
+        result = self.diff([{"x": 1}, {"y": 2}], [{"y": 2}, {"x": 1}])
+        self.assertFalse(result.has_changes())
+        result = self.diff([{"x": 1}, {"y": 2}], [{"y": 2}])
+        self.assertEqual(get_keys(result.removed[0].children), ["x"])
+        self.assertFalse(result.added or result.changed)
+
+    def test_hash_collisions(self):
+        # hash(-1) == hash(-2) in CPython
+        result = self.diff({"a": -1, "b": [1, -1]}, {"a": -2, "b": [1, -2]})
+        self.assertEqual(sorted((old.data_value, new.data_value) for old, new in result.changed), [(-1, -2), (-1, -2)])
+
+        result = self.diff({"a": 1, "b": True}, {"a": True, "b": 1.0})
+        self.assertEqual(len(result.changed), 2)
+
+    def test_nan(self):
+        result = self.diff({"a": float("nan")}, {"a": float("nan")})
+        self.assertFalse(result.has_changes())
@@ -0,0 +1,156 @@
+from base import MayaBaseTestCase
+
+
+import json_tree.data_tree as data_tree
+import json_tree.data_tree_model as data_tree_model
+import json_tree.json_backends as json_backends
+from json_tree.ui_utils import QtCore, QtWidgets
+
+
+class TestDataTreeModel(MayaBaseTestCase):
+
+    def test_snapshot(self):
+        model = data_tree_model.DataModel()
+        model.set_data({"a": {"b": [1, 2]}, "c": {"d": "e"}})
+        snapshot = model.get_snapshot()
+        self.assertEqual(snapshot, model.get_data())
+        self.assertIs(model.get_snapshot(), snapshot)
+
+        model.root_item.children[0].children[0].children[1].set_value("3")
+        new_snapshot = model.get_snapshot()
+        self.assertEqual(new_snapshot, {"a": {"b": [1, 3]}, "c": {"d": "e"}})
+        self.assertEqual(snapshot["a"]["b"], [1, 2])  # earlier snapshots don't change
+        self.assertIs(new_snapshot["c"], snapshot["c"])  # unedited containers are shared
+
+    def test_snapshot_after_repeated_edit(self):
+        model = data_tree_model.DataModel()
+        model.set_data({"a": {"b": [1, 2]}})
+        value_item = model.root_item.children[0].children[0].children[1]
+
+        value_item.set_value("3")
+        self.assertEqual(model.get_snapshot(), {"a": {"b": [1, 3]}})
+        self.assertEqual(data_tree_model.get_item_stats(model.root_item).byte_size, 17)  # {"a":{"b":[1,3]}}
+        value_item.set_value("40")  # the item is already modified, its parents still have to be cleared
+        self.assertEqual(model.get_snapshot(), {"a": {"b": [1, 40]}})
+        self.assertEqual(data_tree_model.get_item_stats(model.root_item).byte_size, 18)
+
+    def test_pack_json_data(self):
+        json_data = json_backends.loads('{"a": [1, 1.10, null, {"b": true}], "c": {}, "d": [[]]}', keep_number_text=True)
+        model = data_tree_model.DataModel()
+        model.set_data(json_data)
+        packed_tree = data_tree_model.pack_json_data(json_data)
+        self.assertEqual(packed_tree, data_tree_model.pack_item_tree(model.root_item))
+
+        model.set_root_item(data_tree_model.unpack_item_tree(packed_tree))
+        self.assertEqual(repr(model.get_data()), repr(json_data))
+
+    def move_rows(self, model, source_item, row, count, destination_item, destination_row):
+        return model.moveRows(
+            model.get_index_from_item(source_item), row, count, model.get_index_from_item(destination_item),
+            destination_row,
+        )
+
+    def assert_rows(self, item):
+        self.assertEqual([child.row for child in item.children], list(range(item.child_count())))
+
+    def test_move_rows_in_parent(self):
+        model = data_tree_model.DataModel()
+        model.set_data({"list": ["a", "b", "c", "d"], "dict": {"x": 1, "y": 2, "z": 3}})
+        list_item, dict_item = model.root_item.children
+
+        self.assertTrue(self.move_rows(model, list_item, 2, 1, list_item, 0))  # up
+        self.assertEqual(model.get_item_data(list_item), ["c", "a", "b", "d"])
+        self.assertTrue(self.move_rows(model, list_item, 0, 2, list_item, 4))  # down, past the end
+        self.assertEqual(model.get_item_data(list_item), ["b", "d", "c", "a"])
+        self.assert_rows(list_item)
+
+        self.assertTrue(self.move_rows(model, dict_item, 2, 1, dict_item, 0))
+        self.assertEqual(list(model.get_item_data(dict_item).items()), [("z", 3), ("x", 1), ("y", 2)])
+        self.assert_rows(dict_item)
+        self.assertTrue(model.root_item.is_modified)
+
+    def test_move_rows_across_parents(self):
+        model = data_tree_model.DataModel()
+        model.set_data({"list": ["a", {"b": 1}], "dict": {"x": 1, "[0]": 2}, "other": {"x": 3}})
+        list_item, dict_item, other_item = model.root_item.children
+
+        self.assertTrue(self.move_rows(model, list_item, 0, 1, dict_item, 1))
+        self.assertEqual(model.get_item_data(list_item), [{"b": 1}])
+        # array values get a key in an object, keys that are taken are made unique
+        self.assertEqual(list(model.get_item_data(dict_item).items()), [("x", 1), ("[0]_1", "a"), ("[0]", 2)])
+
+        self.assertTrue(self.move_rows(model, other_item, 0, 1, list_item, 0))
+        self.assertEqual(model.get_item_data(list_item), [3, {"b": 1}])
+        self.assertEqual(model.get_item_data(other_item), {})
+        for item in (list_item, dict_item, other_item):
+            self.assert_rows(item)
+
+        # an item can't go into its own children
+        self.assertFalse(self.move_rows(model, model.root_item, 0, 1, list_item.children[1], 0))
+        self.assertEqual(model.get_data()["list"], [3, {"b": 1}])
+
+    def test_update_data_keeps_items(self):
+        """Reloading a changed file keeps the items of unchanged rows, so expanded and selected rows stay as they are"""
+        model = data_tree_model.DataModel()
+        model.set_data({"a": {"b": [1, 2], "c": "x"}, "d": [{"e": 1}], "f": 1})
+        resets = []
+        model.modelReset.connect(lambda: resets.append(True))
+        a_item, d_item, f_item = model.root_item.children
+        b_item, c_item = a_item.children
+        e_parent_item = d_item.children[0]
+
+        self.assertTrue(model.update_data({"a": {"c": "y", "b": [1, 2, 3]}, "d": [{"e": 1}], "g": None}))
+        self.assertEqual(model.get_data(), {"a": {"c": "y", "b": [1, 2, 3]}, "d": [{"e": 1}], "g": None})
+        self.assertEqual(resets, [])
+
+        self.assertEqual(model.root_item.children[:2], [a_item, d_item])
+        self.assertEqual(a_item.children, [c_item, b_item])  # moved, not created again
+        self.assertIs(d_item.children[0], e_parent_item)
+        self.assertEqual(model.get_index_from_item(c_item).row(), 0)
+        self.assertIsNot(model.root_item.children[2], f_item)
+        self.assertFalse(model.root_item.is_modified)
+
+    def test_stats_after_repeated_edit(self):
+        model = data_tree_model.DataModel()
+        model.set_data({"a": ["x", {"b": 1}]})
+        value_item = model.root_item.children[0].children[1].children[0]
+
+        value_item.set_value("22")
+        stats = data_tree_model.get_item_stats(model.root_item)
+        self.assertEqual(stats.byte_size, 20)  # {"a":["x",{"b":22}]}
+        self.assertEqual(stats.descendant_count, 4)
+        value_item.set_value("333")
+        self.assertEqual(data_tree_model.get_item_stats(model.root_item).byte_size, 21)
+        self.assertEqual(data_tree_model.get_item_stats(model.root_item.children[0]).byte_size, 15)
+
+    def test_schema_error_color(self):
+        model = data_tree_model.DataModel()
+        model.set_data({"a": 1, "b": 2})
+        item = model.root_item.children[0]
+        model.set_item_schema_errors(item, [("type", "wrong type")])
+
+        index = model.get_index_from_item(item)
+        self.assertEqual(index.data(QtCore.Qt.ForegroundRole), data_tree_model.lk.schema_error_color)
+        option = QtWidgets.QStyleOptionViewItem()
+        delegate = data_tree.DataItemDelegate()
+        self.assertEqual(delegate.get_text_color(option, index), data_tree_model.lk.schema_error_color)
+
+    def test_unique_key(self):
+        model = data_tree_model.DataModel()
+        model.set_data({"a": 1, "a_1": 2, "b": 3})
+        item = model.root_item.children[2]
+        self.assertEqual(item.get_unique_key("a"), "a_2")
+        self.assertEqual(item.get_unique_key("b"), "b")
+        self.assertEqual(item.get_unique_key(""), data_tree_model.lk.default_key_name)
+
+    def test_filter_expands_once(self):
+        tree_widget = data_tree.DataTreeWidget()
+        expand_depths = []
+        tree_widget.expand_to_depth = expand_depths.append
+
+        tree_widget.set_filter("")  # switching to a tab without a filter
+        self.assertEqual(expand_depths, [])
+        tree_widget.set_filter("a")
+        tree_widget.set_filter("a")
+        tree_widget.set_filter("")  # cleared
+        self.assertEqual(expand_depths, [tree_widget.default_expand_depth])
@@ -0,0 +1,30 @@
+from base import MayaBaseTestCase
+
+
+import json_tree.data_tree_transforms as transforms
+
+
+class TestDataTreeTransforms(MayaBaseTestCase):
+
+    def test_transform_data(self):
+        json_data = {
+            "scale": 200,
+            "tmp_a": {"scale": 5},
+            "nodes": [{"scale": 1.5, "name": "12", "tmp_b": 1}, "3.5", "abc"],
+        }
+        result_data, result = transforms.transform_data(json_data, [
+            transforms.ScaleNumbers(0.01, key_pattern="scale"),
+            transforms.RemoveKeys("tmp_*"),
+            transforms.ConvertStringNumbers(),
+        ])
+        self.assertEqual(result_data, {"scale": 2.0, "nodes": [{"scale": 0.015, "name": 12}, 3.5, "abc"]})
+        self.assertEqual(len(result.removed), 2)
+        self.assertEqual(json_data["tmp_a"], {"scale": 5})  # input is left as it is
+
+    def test_modify_text(self):
+        result_data, result = transforms.transform_data({"a": "x", "b": ["a"], "pre_a": 1}, [
+            transforms.ModifyText(prefix="pre_", replacements=[("x", "y")]),
+        ])
+        self.assertEqual(list(result_data.keys()), ["pre_a_1", "pre_b", "pre_pre_a"])
+        self.assertEqual(result_data["pre_a_1"], "pre_y")
+        self.assertEqual(result_data["pre_b"], ["pre_a"])
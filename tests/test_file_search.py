@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+
+from base import MayaBaseTestCase
+
+
+import json_tree.file_search as file_search
+
+
+class TestFileSearch(MayaBaseTestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_file(self, file_name, text):
+        json_path = os.path.join(self.temp_dir, file_name)
+        with open(json_path, "w") as fp:
+            fp.write(text)
+        return json_path
+
+    def test_find_key_paths(self):
+        data = {"Needle": {"a": "hay needle"}, "list": [1, None, {"b": "NEEDLE"}]}
+
+        query = file_search.SearchQuery("needle")
+        self.assertEqual(
+            sorted(file_search.find_key_paths(data, query), key=str),
+            sorted([["Needle"], ["Needle", "a"], ["list", 2, "b"]], key=str),
+        )
+
+        query = file_search.SearchQuery("needle", match_keys=False, case_sensitive=True)
+        self.assertEqual(file_search.find_key_paths(data, query), [["Needle", "a"]])
+
+        # values are matched the way they're written in json
+        query = file_search.SearchQuery("null")
+        self.assertEqual(file_search.find_key_paths(data, query), [["list", 1]])
+
+    def test_search_file(self):
+        json_path = self.write_file("records.jsonl", '{"a": 1}\n{"b": "needle"}\n')
+        self.assertEqual(file_search.search_file(json_path, file_search.SearchQuery("needle")), (json_path, [[1, "b"]]))
+
+        # escaped in the file, so the raw bytes prefilter has to be skipped
+        json_path = self.write_file("escaped.json", '{"key": "caf\\u00e9"}')
+        self.assertEqual(file_search.search_file(json_path, file_search.SearchQuery(u"café")), (json_path, [["key"]]))
+
+        json_path = self.write_file("invalid.json", '{"needle"')
+        self.assertEqual(file_search.search_file(json_path, file_search.SearchQuery("needle")), (json_path, []))
+
+        # json can write / as \/
+        json_path = self.write_file("slash.json", '{"path": "a\\/b"}')
+        self.assertEqual(file_search.search_file(json_path, file_search.SearchQuery("a/b")), (json_path, [["path"]]))
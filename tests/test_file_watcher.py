@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+
+from base import MayaBaseTestCase
+
+
+import json_tree.file_watcher as file_watcher
+
+
+class TestFileWatcher(MayaBaseTestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        self.json_path = os.path.join(temp_dir, "data.json")
+        self.write_file(b"{}")
+
+        self.watcher = file_watcher.FileWatcher()
+        self.changed_paths = []
+        self.watcher.file_changed.connect(self.changed_paths.append)
+        self.watcher.watch(self.json_path)
+        self.addCleanup(self.watcher.stop)
+
+    def write_file(self, file_bytes):
+        with open(self.json_path, "wb") as fp:
+            fp.write(file_bytes)
+
+    def test_change_is_reported(self):
+        self.write_file(b'{"a": 1}')
+        self.watcher.check_for_change()
+        self.assertEqual(self.changed_paths, [os.path.abspath(self.json_path)])
+
+        self.watcher.check_for_change()  # only once per change
+        self.assertEqual(len(self.changed_paths), 1)
+
+    def test_own_save_is_ignored(self):
+        self.write_file(b'{"saved": 1}')
+        self.watcher.watch(self.json_path)  # called after saving
+        self.watcher.check_for_change()
+        self.assertEqual(self.changed_paths, [])
+
+        self.write_file(b'{"saved": 1, "other program": 2}')
+        self.watcher.check_for_change()
+        self.assertEqual(len(self.changed_paths), 1)
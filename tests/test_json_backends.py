@@ -0,0 +1,134 @@
+import json
+import os
+
+from base import MayaBaseTestCase
+
+
+import json_tree.json_backends as json_backends
+
+EXAMPLE_JSON_PATH = os.path.join(os.path.dirname(json_backends.__file__), "resources", "example_json_data.json")
+
+CONFORMANCE_DOCUMENTS = [
+    '{"b": 1, "a": 2, "c": {"z": [], "y": {}}}',
+    '[0, 0.0, -0.0, 1.0, 1.5e-300, 1e16, 1E5, 12345678901234567890123, -9223372036854775809]',
+    '[true, false, null, 1, 1.0, "1"]',
+    '{"unicode": "\\u00e9\\u4e2d \\ud83d\\ude00", "escapes": "\\"\\\\/\\b\\f\\n\\r\\t", "raw": "é"}',
+    '{"lone_surrogate": "\\ud800"}',
+    '{"dup": 1, "other": 2, "dup": 3}',
+    '{"nested": [[[[{"a": [1, [2, [3]]]}]]]]}',
+    '[NaN, Infinity, -Infinity, 1e400]',
+    '"just a string"',
+    '42',
+    '[]',
+]
+
+
+class TestJsonBackends(MayaBaseTestCase):
+
+    def assert_identical(self, expected, result):
+        """Equal values, with the same types and the same key order"""
+        if isinstance(expected, dict):
+            self.assertIsInstance(result, dict)
+            self.assertEqual(list(expected.keys()), list(result.keys()))
+            for key in expected:
+                self.assert_identical(expected[key], result[key])
+        elif isinstance(expected, list):
+            self.assertIsInstance(result, list)
+            self.assertEqual(len(expected), len(result))
+            for expected_value, value in zip(expected, result):
+                self.assert_identical(expected_value, value)
+        elif isinstance(expected, float) and expected != expected:
+            self.assertTrue(result != result, "expected NaN, got {!r}".format(result))
+        else:
+            self.assertIs(type(expected), type(result))
+            self.assertEqual(expected, result)
+            if isinstance(expected, float):
+                self.assertEqual(repr(expected), repr(result))  # catches -0.0
+
+    def test_loads_matches_stdlib(self):
+        stdlib_backend = json_backends.StdlibBackend()
+        for backend in json_backends.get_available_backends():
+            for document in CONFORMANCE_DOCUMENTS:
+                expected = stdlib_backend.loads(document)
+                self.assert_identical(expected, backend.loads(document))
+                self.assert_identical(expected, backend.loads(document.encode("utf-8")))
+
+    def test_round_trip(self):
+        stdlib_backend = json_backends.StdlibBackend()
+        for backend in json_backends.get_available_backends():
+            for document in CONFORMANCE_DOCUMENTS:
+                expected = stdlib_backend.loads(document)
+                for indent in (None, 2, 4):
+                    self.assert_identical(expected, backend.loads(backend.dumps(expected, indent=indent)))
+                    self.assert_identical(expected, backend.loads(backend.dumps_bytes(expected, indent=indent)))
+
+    def test_indent_output_matches_stdlib(self):
+        with open(EXAMPLE_JSON_PATH, "rb") as fp:
+            json_bytes = fp.read()
+
+        stdlib_backend = json_backends.StdlibBackend()
+        expected = stdlib_backend.dumps(stdlib_backend.loads(json_bytes), indent=2)
+        for backend in json_backends.get_available_backends():
+            self.assertEqual(expected, backend.dumps(backend.loads(json_bytes), indent=2))
+
+        # non-ascii characters are escaped, and non-finite floats aren't written as null
+        json_data = {"text": u"\u00e9\u4e2d \U0001f600", u"\u00e9": [float("nan"), float("inf"), None]}
+        for indent in (None, 2):
+            expected = stdlib_backend.dumps(json_data, indent=indent)
+            for backend in json_backends.get_available_backends():
+                self.assertEqual(expected, backend.dumps(json_data, indent=indent))
+                self.assertEqual(expected.encode("ascii"), backend.dumps_bytes(json_data, indent=indent))
+
+    def test_get_backend_by_name(self):
+        self.assertEqual(json_backends.get_backend("json").name, "json")
+        self.assertEqual(json_backends.get_backend("not_a_backend").name, json_backends.get_backend().name)
+
+    def get_orjson_fallback_calls(self):
+        """orjson backend and a list that gets the arguments of every call to its stdlib fallback"""
+        backend = json_backends.get_backend("orjson")
+        if backend.name != "orjson":
+            self.skipTest("orjson isn't installed")
+
+        calls = []
+        fallback_loads = backend.fallback.loads
+        backend.fallback.loads = lambda *args, **kwargs: calls.append(args) or fallback_loads(*args, **kwargs)
+        self.addCleanup(setattr, backend.fallback, "loads", fallback_loads)
+        return backend, calls
+
+    def test_long_fractions_use_orjson(self):
+        backend, calls = self.get_orjson_fallback_calls()
+        document = '[0.00023503710709915637, 1.2345678901234567890e-5, 12345678901234567890.5]'
+        self.assert_identical(json.loads(document), backend.loads(document))
+        self.assertEqual(calls, [])
+
+        for document in ('[1, 12345678901234567890]', '12345678901234567890', '{"a": -9223372036854775809}'):
+            self.assert_identical(json.loads(document), backend.loads(document))
+        self.assertEqual(len(calls), 3)
+
+    def test_keep_number_text_uses_orjson(self):
+        backend, calls = self.get_orjson_fallback_calls()
+        document = '{"a": [1.5, -0.25, 100.0, 0.0001, 3.1415926535898], "b": "1.2", "c": 10}'
+        self.assert_identical(json.loads(document), backend.loads(document, keep_number_text=True))
+        self.assertEqual(calls, [])
+
+        for number_text in ("1.10", "1e5", "0.00001", "0.1000000000000000055511151231257827", "1.10"):
+            json_data = backend.loads('{"a": [1.5, %s]}' % number_text, keep_number_text=True)
+            self.assertEqual(repr(json_data["a"][1]), number_text)
+        self.assertEqual(len(calls), 5)
+
+    def test_keep_number_text(self):
+        document = '{"a": 1.10, "b": [1e400, 2.5, 1E5, -0.0, 0.1000000000000000055511151231257827], "c": [3, "1.10"]}'
+        for backend in json_backends.get_available_backends():
+            json_data = backend.loads(document, keep_number_text=True)
+            self.assertIsInstance(json_data["a"], json_backends.JsonNumber)
+            self.assertIs(type(json_data["b"][1]), float)  # repr already gives the same text
+            self.assertEqual(json_data["a"], 1.1)
+
+            json_backends.BackendCache.active_backend = backend
+            try:
+                json_text = json_backends.dumps(json_data, indent=2, keep_number_text=True)
+            finally:
+                json_backends.BackendCache.active_backend = None
+            for number_text in ("1.10", "1e400", "1E5", "0.1000000000000000055511151231257827"):
+                self.assertIn(" {}".format(number_text), json_text)
+            self.assertEqual(repr(backend.loads(json_text, keep_number_text=True)), repr(json_data))
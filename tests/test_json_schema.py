@@ -0,0 +1,67 @@
+from base import MayaBaseTestCase
+
+
+import json_tree.json_schema as json_schema
+
+
+class TestJsonSchema(MayaBaseTestCase):
+
+    def setUp(self):
+        self.schema = json_schema.JsonSchema({
+            "type": "object",
+            "required": ["name"],
+            "additionalProperties": False,
+            "definitions": {
+                "node": {
+                    "type": "object",
+                    "properties": {
+                        "value": {"type": "integer", "minimum": 0},
+                        "children": {"type": "array", "items": {"$ref": "#/definitions/node"}},
+                    },
+                },
+            },
+            "properties": {
+                "name": {"type": "string", "minLength": 1},
+                "size": {"type": "number"},
+                "tags": {"type": "array", "uniqueItems": True, "items": {"enum": ["a", "b"]}},
+                "tree": {"$ref": "#/definitions/node"},
+            },
+        })
+
+    def test_valid(self):
+        data = {"name": "x", "size": 1.5, "tags": ["a", "b"], "tree": {"children": [{"value": 1}]}}
+        self.assertEqual(self.schema.validate(data), [])
+
+    def test_errors(self):
+        data = {"size": "1", "tags": ["a", "a", "c"], "extra": 1, "tree": {"children": [{"children": [{"value": -1}]}]}}
+        errors = set((key_path, keyword) for key_path, keyword, message in self.schema.validate(data))
+        self.assertEqual(errors, {
+            ((), "required"),
+            ((), "additionalProperties"),
+            (("size",), "type"),
+            (("tags",), "uniqueItems"),
+            (("tags", 2), "enum"),
+            (("tree", "children", 0, "children", 0, "value"), "minimum"),
+        })
+
+    def test_validate_subtree(self):
+        errors = list(self.schema.iter_errors({"value": True}, key_path=["tree"]))
+        self.assertEqual([(key_path, keyword) for key_path, keyword, message in errors], [(("tree", "value"), "type")])
+
+        # only the checks that use the keys of a dict
+        errors = self.schema.get_errors({"size": 1}, keywords=json_schema.CONTAINER_KEYWORDS)
+        self.assertEqual([keyword for keyword, message in errors], ["required"])
+
+    def test_value_type_names(self):
+        self.assertEqual(self.schema.get_value_type_names(["size"], "str"), ["int", "float"])
+        self.assertEqual(self.schema.get_value_type_names(["size"], "float"), ["float", "int"])
+        self.assertEqual(self.schema.get_value_type_names(["tags", 0], "str"), None)
+
+    def test_multiple_of(self):
+        schema = json_schema.JsonSchema({"type": "array", "items": {"multipleOf": 0.1}})
+        errors = schema.validate([0.3, 0, -0.6, 1e300, 0.35, 7])
+        self.assertEqual([(key_path, keyword) for key_path, keyword, message in errors], [((4,), "multipleOf")])
+
+        for limit in (0, -2):
+            with self.assertRaises(json_schema.SchemaError):
+                json_schema.JsonSchema({"multipleOf": limit}).validate(1)
@@ -1,9 +1,16 @@
+import os
+import shutil
+import tempfile
+
 from maya import cmds
 
 from base import MayaBaseTestCase
 
 
+import json_tree.data_tree_model as data_tree_model
+import json_tree.json_backends as json_backends
 import json_tree.json_tree_system as system
+from json_tree.ui_utils import QtCore
 
 
 class TestJsonTreeSystem(MayaBaseTestCase):
@@ -15,3 +22,108 @@ class TestJsonTreeSystem(MayaBaseTestCase):
 
 
 
+
+    def test_json_source(self):
+        json_bytes = b'{\n    "a" :  [1, 2 ,3],\n    "b": {"x": "y\\"", "e": {}},\n    "c": [ ]\n}\n'
+        json_source = system.JsonSource(json_bytes)
+        self.assertEqual(len(json_source), 9)
+        self.assertEqual(json_source.get_member_bytes(1), b'"a" :  [1, 2 ,3]')
+        self.assertEqual(json_source.get_value_bytes(6), b'"y\\""')
+        self.assertEqual(json_source.get_key(6), "x")
+        self.assertEqual(json_source.get_layout(0), (b"\n    ", b",\n    ", b"\n"))
+        self.assertEqual(json_source.get_layout(8), (b" ", None, b""))
+        self.assertEqual(json_source.indent, b"    ")
+        self.assertEqual(json_source.key_separator, b" :  ")
+
+    def write_temp_file(self, file_name, file_bytes):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        file_path = os.path.join(temp_dir, file_name)
+        with open(file_path, "wb") as fp:
+            fp.write(file_bytes)
+        return file_path
+
+    def test_ndjson_index(self):
+        ndjson_path = self.write_temp_file("records.ndjson", b'{"a": 1}\n\n  [1, 2]\n"text"\n{"b": {"c": null}}')
+        # records across the chunks the index is read in
+        self.addCleanup(setattr, system.NdjsonFile, "index_chunk_size", system.NdjsonFile.index_chunk_size)
+        system.NdjsonFile.index_chunk_size = 7
+
+        ndjson_file = system.NdjsonFile(ndjson_path)
+        self.addCleanup(ndjson_file.close)
+        self.assertEqual(len(ndjson_file), 4)
+        self.assertEqual(ndjson_file.read_record_bytes(1), b"[1, 2]")
+        self.assertEqual(ndjson_file.read_record_bytes(3), b'{"b": {"c": null}}')
+        self.assertEqual(ndjson_file.read_record_bytes(3, max_bytes=4), b'{"b"')
+        self.assertEqual(ndjson_file.load_record(2), "text")
+        self.assertEqual(list(system.load_json(ndjson_path)), [{"a": 1}, [1, 2], "text", {"b": {"c": None}}])
+
+    def test_ndjson_lazy_records(self):
+        ndjson_path = self.write_temp_file("records.ndjson", b'{"a": 1}\n{"b": [2, 3]}\n{"c": 4}\n')
+        ndjson_file = system.NdjsonFile(ndjson_path)
+        self.addCleanup(ndjson_file.close)
+        model = data_tree_model.DataModel()
+        model.set_ndjson_file(ndjson_file)
+
+        self.assertEqual(model.rowCount(QtCore.QModelIndex()), 3)
+        record_list = model.root_item.children
+        record_item = record_list[1]
+        self.assertEqual(list(record_list._record_items), [1])  # only accessed records get an item
+        self.assertTrue(record_item.can_fetch_more())
+        self.assertEqual(record_item.child_count(), 0)
+
+        model.fetchMore(model.get_index_from_item(record_item))
+        self.assertFalse(record_item.can_fetch_more())
+        self.assertEqual(model.get_item_data(record_item), {"b": [2, 3]})
+        self.assertEqual(model.get_data(), [{"a": 1}, {"b": [2, 3]}, {"c": 4}])
+
+    def test_ndjson_save_edited_record(self):
+        for newline in (b"\n", b"\r\n"):
+            records = [b'{"a":1,  "b": 1.50}', b'{"c": [1, 2]}', b'[ "unchanged" ]']
+            ndjson_path = self.write_temp_file("records.ndjson", newline.join(records) + newline)
+            ndjson_file = system.NdjsonFile(ndjson_path)
+            self.addCleanup(ndjson_file.close)
+            self.assertEqual(ndjson_file.read_record_bytes(0), records[0])  # without the \r
+
+            model = data_tree_model.DataModel()
+            model.set_ndjson_file(ndjson_file)
+            record_item = model.root_item.children[1]
+            model.fetchMore(model.get_index_from_item(record_item))
+            record_item.children[0].children[1].set_value("5")
+            model.save_ndjson()
+
+            with open(ndjson_path, "rb") as fp:
+                saved_bytes = fp.read()
+            # unedited records are copied with their formatting and line endings
+            edited_bytes = json_backends.dumps_bytes({"c": [1, 5]})
+            self.assertEqual(saved_bytes, records[0] + newline + edited_bytes + b"\n" + records[2] + newline)
+            self.assertEqual(len(ndjson_file), 3)
+            self.assertEqual(ndjson_file.read_record_bytes(2), records[2])
+            self.assertFalse(model.root_item.is_modified)
+
+    def test_compression_round_trip(self):
+        json_data = {"name": "é", "values": [1, 1.5, None, True], "nested": {"a": "x" * 1000}}
+        records = [{"a": 1}, [2, 3], "text"]
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+
+        for extension, compression in system.COMPRESSION_EXTENSIONS.items():
+            json_path = os.path.join(temp_dir, "data.json" + extension)
+            if not system.is_compression_available(compression):
+                with self.assertRaises(IOError):
+                    system.open_json_file(json_path, "wb")
+                continue
+
+            with self.subTest(compression=extension):
+                system.save_json(json_data, json_path, compression_level=1)
+                with open(json_path, "rb") as fp:
+                    self.assertFalse(fp.read().startswith(b"{"))  # written compressed
+                self.assertEqual(system.load_json(json_path), json_data)
+
+                with system.open_json_file(json_path) as fp:
+                    file_bytes = fp.read()
+                self.assertEqual(b"".join(system.iter_file_chunks(json_path, chunk_size=100)), file_bytes)
+
+                ndjson_path = os.path.join(temp_dir, "records.jsonl" + extension)
+                system.save_json(records, ndjson_path)
+                self.assertEqual(system.load_json(ndjson_path), records)